@@ -0,0 +1,72 @@
+"""
+Benchmark for parallel workout CSV parsing.
+
+Generates a synthetic workout CSV and measures how long parsing and validation take with
+the single-process csv backend and with the process pool at increasing worker counts.
+No database is needed; only the parse step is timed.
+
+Usage:
+    cd backend
+    python benchmarks/parallel_csv_parse.py --rows 1000000 --workers 1 2 4 8
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Add the backend directory to the path to import the ingest package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from db.ingest.parallel import iter_parallel_batches
+from db.ingest.parsers import get_parser
+
+EXERCISES = [
+    ('Squat', 'Strength'), ('Bench Press', 'Strength'), ('Deadlift', 'Strength'),
+    ('Overhead Press', 'Strength'), ('Pull-ups', 'Strength'), ('Running', 'Cardio'),
+    ('Rowing', 'Cardio'), ('Cycling', 'Cardio'),
+]
+
+def write_sample_csv(path, rows):
+    """Write a synthetic workout CSV with the given number of data rows."""
+    random.seed(42)
+    with open(path, 'w', newline='') as f:
+        f.write('date,exercise,category,weight,weight_unit,reps,distance,distance_unit,time,comment\n')
+        for i in range(rows):
+            exercise, category = random.choice(EXERCISES)
+            day = f"2024-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}"
+            if category == 'Cardio':
+                f.write(f"{day},{exercise},{category},,,,{random.uniform(1, 20):.2f},km,00:{random.randint(10, 59)}:00,\n")
+            else:
+                f.write(f"{day},{exercise},{category},{random.randint(20, 200)},kg,{random.randint(1, 12)},,,,\"set {i % 5 + 1}\"\n")
+
+def count_rows(batches):
+    return sum(len(batch) for batch in batches)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=500000, help='number of data rows to generate')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8], help='worker counts to test')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'workouts.csv')
+        write_sample_csv(path, args.rows)
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+        print(f"File: {args.rows} rows, {size_mb:.1f} MB, {os.cpu_count()} CPUs available")
+
+        start = time.perf_counter()
+        with open(path, 'rb') as f:
+            rows = count_rows(get_parser('csv').iter_batches(f))
+        baseline = time.perf_counter() - start
+        print(f"{'backend':<12}{'workers':>8}{'seconds':>10}{'rows/s':>12}{'speedup':>9}")
+        print(f"{'csv':<12}{1:>8}{baseline:>10.2f}{rows / baseline:>12,.0f}{1.0:>9.2f}")
+
+        for workers in args.workers:
+            start = time.perf_counter()
+            rows = count_rows(iter_parallel_batches(path, workers=workers))
+            elapsed = time.perf_counter() - start
+            print(f"{'parallel':<12}{workers:>8}{elapsed:>10.2f}{rows / elapsed:>12,.0f}{baseline / elapsed:>9.2f}")
+
+if __name__ == '__main__':
+    main()
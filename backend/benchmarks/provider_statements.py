@@ -0,0 +1,101 @@
+"""
+Benchmark for the statements behind the hot provider reads.
+
+Seeds a SQLite database with one user's workouts and times get_workout_records and
+get_user_by_email, which reuse a prebuilt statement per filter shape, against building
+the same query from scratch on every call as they used to. The database is small, so the
+time per call is mostly statement construction, compilation and result handling.
+
+Usage:
+    cd backend
+    python benchmarks/provider_statements.py --calls 5000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import select
+
+# Add the backend directory to the path to import the db package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from db.models import Base, User, WorkoutHistory
+from db.providers.database_provider import workout_history_filters
+from db.providers.local_database_provider import LocalDatabaseProvider
+
+class SqliteDatabaseProvider(LocalDatabaseProvider):
+    """Local provider backed by a SQLite file."""
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+
+    def get_connection_url(self):
+        return f"sqlite:///{self.path}"
+
+    def connect(self):
+        super().connect()
+        Base.metadata.create_all(self._engine)
+
+def rebuilt_workout_records(provider, user_id, start_date, exercise, limit):
+    """Build the workout history query on every call, as get_workout_records used to."""
+    stmt = select(WorkoutHistory).where(*workout_history_filters(user_id, start_date, exercise=exercise))
+    stmt = stmt.order_by(WorkoutHistory.date.desc(), WorkoutHistory.created_at.desc(),
+                         WorkoutHistory.id.desc()).limit(limit)
+    return provider._session.execute(stmt).scalars().all()
+
+def rebuilt_user_by_email(provider, email):
+    """Build the user lookup on every call, as get_user_by_email used to."""
+    return provider._session.query(User).filter(User.email == email).first()
+
+def time_calls(calls, call):
+    """Get the mean seconds per call of a function, after a warm-up call."""
+    call(0)
+    start = time.perf_counter()
+    for i in range(calls):
+        call(i)
+    return (time.perf_counter() - start) / calls
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=5000, help='calls to time for each query')
+    parser.add_argument('--rows', type=int, default=200, help='workouts to seed')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        provider = SqliteDatabaseProvider(os.path.join(tmp_dir, 'benchmark.db'))
+        provider.connect()
+        user_id = provider.create_user('alice', 'alice@example.com', 'hash').user_id
+        provider.bulk_create_workout_records(user_id, [
+            {'date': date(2024, 1, 1) + timedelta(days=i % 365), 'exercise': ('Squat', 'Bench Press')[i % 2],
+             'category': 'Strength', 'weight': 100.0, 'reps': 5}
+            for i in range(args.rows)
+        ])
+        provider._session.commit()
+
+        # Vary the values between calls so only the statement's shape repeats
+        starts = [date(2024, 1, 1) + timedelta(days=i) for i in range(30)]
+        exercises = ['Squat', 'Bench Press']
+        emails = ['alice@example.com', 'bob@example.com']
+        benchmarks = [
+            ('get_workout_records',
+             lambda i: rebuilt_workout_records(provider, user_id, starts[i % 30], exercises[i % 2], 20),
+             lambda i: provider.get_workout_records(user_id, start_date=starts[i % 30],
+                                                    exercise=exercises[i % 2], limit=20)),
+            ('get_user_by_email',
+             lambda i: rebuilt_user_by_email(provider, emails[i % 2]),
+             lambda i: provider.get_user_by_email(emails[i % 2])),
+        ]
+
+        print(f"{args.calls} calls each, {args.rows} workouts")
+        print(f"{'query':<22}{'rebuilt us':>12}{'cached us':>12}{'speedup':>9}")
+        for name, rebuilt, cached in benchmarks:
+            before = time_calls(args.calls, rebuilt)
+            after = time_calls(args.calls, cached)
+            print(f"{name:<22}{before * 1e6:>12.1f}{after * 1e6:>12.1f}{before / after:>9.2f}")
+        provider.disconnect()
+
+if __name__ == '__main__':
+    main()
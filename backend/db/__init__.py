@@ -2,8 +2,9 @@
 Database package for SwolePT backend.
 This package provides database functionality including models, migrations, and setup.
 """
-from .setup import setup_database
+from .setup import is_database_current, setup_database
 
 __all__ = [
+    'is_database_current',
     'setup_database',
 ] 
\ No newline at end of file
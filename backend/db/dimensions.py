@@ -0,0 +1,109 @@
+"""
+Exercise and category name interning for SwolePT backend.
+Workout history refers to exercises and categories by the id of a row in a small
+dimension table instead of repeating their names. NameInterner maps names to those ids,
+adding rows for new names, and caches them so ingest rarely has to look a name up.
+"""
+import threading
+from typing import Any, Dict, Iterable
+
+from sqlalchemy import event, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+# Session.info key of the names a session added, by interner, until its transaction ends
+PENDING_NAMES_KEY = 'interned_names'
+
+def _dialect_insert(dialect_name: str, model: Any):
+    """Build a dialect-specific INSERT for a model, which supports ON CONFLICT."""
+    dialects = {'postgresql': postgresql, 'sqlite': sqlite}
+    dialect = dialects.get(dialect_name)
+    if dialect is None:
+        raise RuntimeError(f"Unsupported database dialect: {dialect_name}")
+    return dialect.insert(model)
+
+def insert_ignoring_conflicts(dialect_name: str, model: Any):
+    """Build an INSERT for a model that skips rows violating a unique constraint."""
+    return _dialect_insert(dialect_name, model).on_conflict_do_nothing()
+
+def insert_updating_conflicts(dialect_name: str, model: Any, key: Iterable[str], columns: Iterable[str]):
+    """Build an INSERT for a model that updates ``columns`` of rows whose ``key`` already exists."""
+    stmt = _dialect_insert(dialect_name, model)
+    return stmt.on_conflict_do_update(index_elements=list(key),
+                                      set_={column: stmt.excluded[column] for column in columns})
+
+class NameInterner:
+    """
+    Maps names to the ids of their rows in a dimension table, such as Exercise.
+
+    Ids are cached for the life of the interner. The id of a row added in a transaction is
+    only cached once the transaction commits, so a rollback never leaves the cache holding
+    the id of a row that does not exist.
+    """
+
+    def __init__(self, model: Any):
+        """
+        Args:
+            model: Dimension model with ``id`` and unique ``name`` columns
+        """
+        self.model = model
+        self._ids: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def ids(self, session: Session, names: Iterable[str]) -> Dict[str, int]:
+        """
+        Get the ids of names, adding rows for names not stored yet in the session's transaction.
+
+        Args:
+            session (Session): Session whose transaction new rows are added in
+            names (Iterable[str]): Names to look up
+
+        Returns:
+            Dict[str, int]: The id of each name
+        """
+        with self._lock:
+            found = {name: self._ids[name] for name in set(names) if name in self._ids}
+        pending = session.info.setdefault(PENDING_NAMES_KEY, {}).setdefault(self, {})
+        missing = []
+        for name in set(names) - found.keys():
+            if name in pending:
+                found[name] = pending[name]
+            else:
+                missing.append(name)
+        if not missing:
+            return found
+
+        # Rows another transaction adds first are skipped here and found by the SELECT
+        stmt = insert_ignoring_conflicts(session.get_bind().dialect.name, self.model).returning(
+            self.model.name, self.model.id
+        )
+        added = dict(session.execute(stmt, [{'name': name} for name in sorted(missing)]).all())
+        pending.update(added)
+        found.update(added)
+
+        existing = [name for name in missing if name not in added]
+        if existing:
+            rows = dict(session.execute(
+                select(self.model.name, self.model.id).where(self.model.name.in_(existing))
+            ).all())
+            found.update(rows)
+            with self._lock:
+                self._ids.update(rows)
+        return found
+
+    def id(self, session: Session, name: str) -> int:
+        """Get the id of one name, adding a row for it if it is not stored yet."""
+        return self.ids(session, [name])[name]
+
+    def _remember(self, names: Dict[str, int]) -> None:
+        with self._lock:
+            self._ids.update(names)
+
+@event.listens_for(Session, 'after_commit')
+def _cache_committed_names(session):
+    for interner, names in session.info.pop(PENDING_NAMES_KEY, {}).items():
+        interner._remember(names)
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_rolled_back_names(session):
+    session.info.pop(PENDING_NAMES_KEY, None)
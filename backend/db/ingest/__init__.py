@@ -0,0 +1,8 @@
+"""
+Workout ingest package for SwolePT backend.
+This package contains the CSV parsing and validation used when importing workout data.
+"""
+from .parsers import WorkoutCsvParser, get_parser
+from .workout_csv import iter_workout_rows, normalize_column_name
+
+__all__ = ['WorkoutCsvParser', 'get_parser', 'iter_workout_rows', 'normalize_column_name']
@@ -0,0 +1,100 @@
+"""
+Resumable workout CSV parsing.
+Rows are parsed from a stream of byte chunks together with the byte offset at which each
+row ends, so a long-running ingest can record how far it got and a later run can carry on
+from there.
+"""
+from collections import deque
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+from .workout_csv import RowErrorReport, iter_workout_rows
+
+def iter_csv_records(chunks: Iterable[bytes]) -> Iterator[Tuple[bytes, int]]:
+    """
+    Split a stream of byte chunks into whole CSV records.
+
+    A newline inside a quoted field does not end a record.
+
+    Args:
+        chunks (Iterable[bytes]): The file's content, in order, in chunks of any size
+
+    Yields:
+        Tuple[bytes, int]: Each record, including its line ending, and the byte offset just
+            after it
+    """
+    pending = b''
+    pending_start = 0  # byte offset of the start of pending
+    for chunk in chunks:
+        data = pending + chunk
+        record_start = 0
+        search_from = 0
+        while True:
+            newline = data.find(b'\n', search_from)
+            if newline == -1:
+                break
+            search_from = newline + 1
+            record = data[record_start:search_from]
+            # An odd number of quotes means the newline is inside a quoted field
+            if record.count(b'"') % 2 == 0:
+                yield record, pending_start + search_from
+                record_start = search_from
+        pending = data[record_start:]
+        pending_start += record_start
+
+    if pending:
+        yield pending, pending_start + len(pending)
+
+def iter_rows_with_offsets(chunks: Iterable[bytes], encoding: str = 'utf-8',
+                           date_format: Optional[str] = None,
+                           report: Optional[RowErrorReport] = None,
+                           header: Optional[bytes] = None, byte_offset: int = 0,
+                           row_num: int = 1) -> Iterator[Tuple[int, int, Dict[str, Any]]]:
+    """
+    Parse and validate a workout CSV from byte chunks, tracking where each row ends.
+
+    Parsing and validation are the same as ``iter_workout_rows``, including date format
+    inference from the first rows. To resume part way through a file, pass the file's
+    header record separately with the offset and row number the chunks start after, and
+    the date format inferred from the start of the file.
+
+    Args:
+        chunks (Iterable[bytes]): The file's content from the start, or from
+            ``byte_offset``, in chunks of any size
+        encoding (str): Text encoding of the CSV file
+        date_format (Optional[str]): The file's date format (e.g. ``DD/MM/YYYY``), if known
+        report (Optional[RowErrorReport]): If given, invalid rows are recorded here and
+            skipped instead of stopping the file
+        header (Optional[bytes]): The file's header record, when the chunks start part way
+        byte_offset (int): Offset in the file at which the chunks start
+        row_num (int): Number of the last row before ``byte_offset``; the header is row 1
+
+    Yields:
+        Tuple[int, int, Dict[str, Any]]: The row number, the byte offset just after the row,
+            and its workout data
+
+    Raises:
+        ValueError: If the header is invalid, or any row is invalid and no report is given
+    """
+    # End offsets of records handed to the parser but not yet matched to a parsed row; the
+    # parser reads ahead while it samples dates, and past any invalid rows it skips
+    offsets = deque()
+    next_row_num = row_num  # row number of the oldest offset in the deque
+
+    def lines():
+        if header is not None:
+            # Stands in for the rows before byte_offset
+            offsets.append(byte_offset)
+            yield header.decode(encoding)
+        for record, end in iter_csv_records(chunks):
+            if not record.strip(b'\r\n'):
+                # The csv module skips blank lines without numbering them
+                continue
+            offsets.append(byte_offset + end)
+            yield record.decode(encoding)
+
+    for row_num, workout_data in iter_workout_rows(lines(), date_format, report, first_row_num=row_num + 1):
+        # Drop the offsets of the header and of any invalid rows skipped since the last row
+        for _ in range(row_num - next_row_num):
+            offsets.popleft()
+        next_row_num = row_num + 1
+        yield row_num, offsets.popleft(), workout_data
@@ -0,0 +1,166 @@
+"""
+Compressed workout CSV support.
+Uploads may be gzip or zstd compressed. The compression is detected from the content
+encoding or the file's magic bytes, and the content is decompressed on the fly as it is
+parsed, so the uncompressed text is never held in full.
+"""
+import gzip
+import io
+import zlib
+from itertools import chain
+from typing import BinaryIO, Iterable, Iterator, Optional
+
+try:
+    import zstandard
+except ImportError:
+    # zstandard is optional; only gzip uploads are accepted without it
+    zstandard = None
+
+GZIP = 'gzip'
+ZSTD = 'zstd'
+
+MAGIC_BYTES = {
+    GZIP: b'\x1f\x8b',
+    ZSTD: b'\x28\xb5\x2f\xfd',
+}
+
+# Content-Encoding and media type values that name each compression
+ENCODING_ALIASES = {
+    'gzip': GZIP, 'x-gzip': GZIP, 'application/gzip': GZIP, 'application/x-gzip': GZIP,
+    'zstd': ZSTD, 'application/zstd': ZSTD,
+}
+
+def detect_compression(head: bytes, content_encoding: Optional[str] = None) -> Optional[str]:
+    """
+    Work out how an upload is compressed.
+
+    Args:
+        head (bytes): The first bytes of the upload (at least four)
+        content_encoding (Optional[str]): The declared Content-Encoding or media type, if any
+
+    Returns:
+        Optional[str]: ``gzip``, ``zstd``, or None for plain text
+
+    Raises:
+        ValueError: If the upload is zstd compressed and zstandard is not installed
+    """
+    compression = ENCODING_ALIASES.get((content_encoding or '').strip().lower())
+    if compression is None:
+        for name, magic in MAGIC_BYTES.items():
+            if head.startswith(magic):
+                compression = name
+                break
+
+    if compression == ZSTD and zstandard is None:
+        raise ValueError("zstd-compressed uploads require the zstandard package")
+    return compression
+
+class _PrefixedStream(io.RawIOBase):
+    """A raw stream that replays bytes already read from the start of a non-seekable stream."""
+
+    def __init__(self, prefix: bytes, stream: BinaryIO):
+        super().__init__()
+        self._prefix = prefix
+        self._stream = stream
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self._prefix:
+            size = min(len(buffer), len(self._prefix))
+            buffer[:size] = self._prefix[:size]
+            self._prefix = self._prefix[size:]
+            return size
+        data = self._stream.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+def open_decompressed(stream: BinaryIO, content_encoding: Optional[str] = None) -> BinaryIO:
+    """
+    Wrap a binary stream so reads return decompressed content.
+
+    Plain-text streams are returned as they are.
+
+    Args:
+        stream (BinaryIO): A readable binary stream positioned at the start of the upload
+        content_encoding (Optional[str]): The declared Content-Encoding or media type, if any
+
+    Returns:
+        BinaryIO: A readable binary stream of the uncompressed content
+
+    Raises:
+        ValueError: If the upload is zstd compressed and zstandard is not installed
+    """
+    if stream.seekable():
+        start = stream.tell()
+        head = stream.read(4)
+        stream.seek(start)
+    else:
+        head = stream.read(4)
+        stream = io.BufferedReader(_PrefixedStream(head, stream))
+
+    compression = detect_compression(head, content_encoding)
+    if compression == GZIP:
+        return gzip.GzipFile(fileobj=stream, mode='rb')
+    if compression == ZSTD:
+        # Buffered so the parsers can read line by line
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(stream, read_across_frames=True))
+    return stream
+
+def iter_decompressed_chunks(chunks: Iterable[bytes], content_encoding: Optional[str] = None) -> Iterator[bytes]:
+    """
+    Decompress a stream of byte chunks as they arrive.
+
+    Plain-text chunks are passed through unchanged.
+
+    Args:
+        chunks (Iterable[bytes]): The upload's content, in order, in chunks of any size
+        content_encoding (Optional[str]): The declared Content-Encoding or media type, if any
+
+    Yields:
+        bytes: Chunks of the uncompressed content
+
+    Raises:
+        ValueError: If the upload is zstd compressed and zstandard is not installed
+    """
+    chunks = iter(chunks)
+    head = b''
+    for chunk in chunks:
+        head += chunk
+        if len(head) >= 4:
+            break
+    chunks = chain([head], chunks)
+
+    compression = detect_compression(head, content_encoding)
+    if compression is None:
+        yield from (chunk for chunk in chunks if chunk)
+        return
+
+    if compression == ZSTD:
+        # A zstd file may hold several frames one after another, and a decompressobj stops
+        # at the end of the first
+        decompressor = zstandard.ZstdDecompressor().decompressobj()
+        for chunk in chunks:
+            while chunk:
+                if decompressor.eof:
+                    decompressor = zstandard.ZstdDecompressor().decompressobj()
+                data = decompressor.decompress(chunk)
+                if data:
+                    yield data
+                chunk = decompressor.unused_data if decompressor.eof else b''
+        return
+
+    # A gzip file may hold several members one after another
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        while chunk:
+            data = decompressor.decompress(chunk)
+            if data:
+                yield data
+            chunk = decompressor.unused_data
+            if chunk:
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    data = decompressor.flush()
+    if data:
+        yield data
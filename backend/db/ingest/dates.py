@@ -0,0 +1,146 @@
+"""
+Date parsing for workout CSV imports.
+Each date value is dispatched to a single format by its shape instead of trying every
+supported format in turn. Whether year-last dates are day-first (DD/MM/YYYY) or month-first
+(MM/DD/YYYY) is decided once per file from a sample of rows, and parsed values are cached
+since workout logs repeat the same dates many times.
+"""
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Iterable, Optional, Tuple
+
+# Supported formats, keyed by the name shown to users
+DATE_FORMATS = {
+    'YYYY-MM-DD': '%Y-%m-%d',  # 2024-03-14
+    'MM/DD/YYYY': '%m/%d/%Y',  # 03/14/2024
+    'DD/MM/YYYY': '%d/%m/%Y',  # 14/03/2024
+    'YYYY/MM/DD': '%Y/%m/%d',  # 2024/03/14
+    'MM-DD-YYYY': '%m-%d-%Y',  # 03-14-2024
+    'DD-MM-YYYY': '%d-%m-%Y',  # 14-03-2024
+}
+
+# Number of rows sampled from the start of a file to infer its date format
+DATE_SAMPLE_SIZE = 1000
+
+# Number of distinct date strings cached per file
+DATE_CACHE_SIZE = 4096
+
+ISO_DATE_FORMAT = '%Y-%m-%d'
+
+SEPARATORS = ('-', '/')
+
+class AmbiguousDateFormatError(ValueError):
+    """Raised when a file's dates could be read as either MM/DD/YYYY or DD/MM/YYYY."""
+
+def resolve_date_format(date_format: str) -> Optional[bool]:
+    """
+    Resolve a user-supplied date format name such as ``DD/MM/YYYY``.
+
+    Returns:
+        Optional[bool]: Whether year-last dates are day-first, or None for year-first formats
+
+    Raises:
+        ValueError: If the format is not supported
+    """
+    if date_format not in DATE_FORMATS:
+        raise ValueError(f"Unsupported date format: {date_format}. Supported formats are: {', '.join(DATE_FORMATS)}")
+    if date_format.startswith('YYYY'):
+        return None
+    return date_format.startswith('DD')
+
+def date_format_name(day_first: Optional[bool]) -> str:
+    """Get the name of a date format that resolves to ``day_first``; see ``resolve_date_format``."""
+    if day_first is None:
+        return 'YYYY-MM-DD'
+    return 'DD/MM/YYYY' if day_first else 'MM/DD/YYYY'
+
+def _year_last_fields(value: str) -> Optional[Tuple[int, int]]:
+    """Get the first two fields of a year-last date such as 03/14/2024, or None for other shapes."""
+    for separator in SEPARATORS:
+        parts = value.strip().split(separator)
+        if len(parts) == 3 and len(parts[2]) == 4 and parts[0].isdigit() and parts[1].isdigit():
+            return int(parts[0]), int(parts[1])
+    return None
+
+def infer_day_first(values: Iterable[str]) -> Optional[bool]:
+    """
+    Infer whether a file's year-last dates are day-first from a sample of its date values.
+
+    A value such as 25/02/2024 can only be day-first and 02/25/2024 only month-first;
+    the majority wins, and minority rows are reported as invalid when they are parsed.
+
+    Returns:
+        Optional[bool]: True for DD/MM/YYYY, False for MM/DD/YYYY, or None if the sample
+            has no year-last dates
+
+    Raises:
+        AmbiguousDateFormatError: If the sample cannot tell the two orders apart
+    """
+    year_last_seen = False
+    day_first_votes = 0
+    month_first_votes = 0
+    for value in values:
+        fields = _year_last_fields(value)
+        if fields is None:
+            continue
+        year_last_seen = True
+        first, second = fields
+        if first > 12:
+            day_first_votes += 1
+        elif second > 12:
+            month_first_votes += 1
+
+    if not year_last_seen:
+        return None
+    if day_first_votes == month_first_votes:
+        raise AmbiguousDateFormatError(
+            "Ambiguous date format: dates in this file could be read as MM/DD/YYYY or DD/MM/YYYY. "
+            "Specify the date format or use YYYY-MM-DD."
+        )
+    return day_first_votes > month_first_votes
+
+class DateParser:
+    """Parses the date column of one file."""
+
+    def __init__(self, day_first: Optional[bool] = None):
+        """
+        Initialize the parser.
+
+        Args:
+            day_first (Optional[bool]): Whether year-last dates are DD/MM/YYYY (True) or
+                MM/DD/YYYY (False); None if the order is unknown, in which case year-last
+                dates are rejected as ambiguous
+        """
+        self.day_first = day_first
+        self.parse = lru_cache(maxsize=DATE_CACHE_SIZE)(self._parse)
+
+    def _get_format(self, value: str) -> str:
+        if len(value) >= 8 and value[4] in SEPARATORS and value[:4].isdigit():
+            separator = value[4]
+            return f'%Y{separator}%m{separator}%d'
+
+        separator = '/' if '/' in value else '-'
+        if self.day_first is None:
+            if _year_last_fields(value) is None:
+                raise ValueError(f"Invalid date '{value}'. Supported formats are: {', '.join(DATE_FORMATS)}")
+            raise AmbiguousDateFormatError(f"Ambiguous date '{value}'. Specify the date format or use YYYY-MM-DD.")
+        if self.day_first:
+            return f'%d{separator}%m{separator}%Y'
+        return f'%m{separator}%d{separator}%Y'
+
+    def _parse(self, value: str) -> date:
+        value = value.strip()
+        date_format = self._get_format(value)
+        if date_format == ISO_DATE_FORMAT and len(value) == 10:
+            try:
+                return date.fromisoformat(value)
+            except ValueError:
+                pass
+
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            if _year_last_fields(value) is not None:
+                order = 'DD/MM/YYYY' if self.day_first else 'MM/DD/YYYY'
+                raise ValueError(f"Invalid date '{value}'. Dates in this file are {order}")
+            raise ValueError(f"Invalid date '{value}'. Supported formats are: {', '.join(DATE_FORMATS)}")
@@ -0,0 +1,98 @@
+"""
+Fingerprints used to make workout ingest idempotent.
+Each workout row gets a natural-key fingerprint so re-uploaded rows are skipped by the
+database, and each uploaded file gets a content hash so an identical file can be recognised
+before it is parsed.
+"""
+import hashlib
+from collections import Counter
+from typing import Any, BinaryIO, Dict, Iterable, List, Optional
+
+# Fields that identify a workout row; units and comments are not part of the natural key
+FINGERPRINT_FIELDS = ('date', 'exercise', 'category', 'weight', 'reps', 'distance', 'time')
+
+# Bytes read at a time while hashing a file
+HASH_BLOCK_SIZE = 1024 * 1024
+
+def _fingerprint_value(value: Any) -> str:
+    """Render a field value so equal values always produce the same text."""
+    if value is None:
+        return ''
+    if isinstance(value, float):
+        return repr(value)
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value).strip()
+
+def workout_fingerprint(user_id: str, workout_data: Dict[str, Any], occurrence: int = 0) -> str:
+    """
+    Compute the natural-key fingerprint of a workout row.
+
+    A file can legitimately contain identical rows, such as several sets with the same
+    weight and reps on the same day, so the n-th repeat of a row within one upload gets
+    ``occurrence`` n and a fingerprint of its own.
+
+    Args:
+        user_id (str): The ID of the user who owns the row
+        workout_data (Dict[str, Any]): Validated workout data dictionary
+        occurrence (int): How many identical rows came before this one in the same upload
+
+    Returns:
+        str: Hex-encoded SHA-256 fingerprint
+    """
+    parts = [user_id] + [_fingerprint_value(workout_data.get(field)) for field in FINGERPRINT_FIELDS]
+    parts.append(str(occurrence))
+    return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+class RowFingerprinter:
+    """Assigns fingerprints to the rows of one upload, numbering repeated rows in file order."""
+
+    def __init__(self, user_id: str, counts: Optional[Dict[str, int]] = None):
+        """
+        Initialize the fingerprinter.
+
+        Args:
+            user_id (str): The ID of the user uploading the file
+            counts (Optional[Dict[str, int]]): How often each row was seen earlier in the
+                upload, as returned by ``take_counts``, when an ingest resumes part way
+        """
+        self.user_id = user_id
+        self._seen = Counter(counts or {})
+        self._changed = set()
+
+    def fingerprint(self, workout_data: Dict[str, Any]) -> str:
+        """Get the fingerprint of the next row of the upload."""
+        key = workout_fingerprint(self.user_id, workout_data)
+        occurrence = self._seen[key]
+        self._seen[key] += 1
+        self._changed.add(key)
+        if occurrence == 0:
+            return key
+        return workout_fingerprint(self.user_id, workout_data, occurrence)
+
+    def take_counts(self) -> Dict[str, int]:
+        """Get the counts of the rows seen since the last call, to store with a checkpoint."""
+        counts = {key: self._seen[key] for key in self._changed}
+        self._changed.clear()
+        return counts
+
+    def fingerprint_all(self, rows: Iterable[Dict[str, Any]]) -> List[str]:
+        """Get the fingerprints of several consecutive rows of the upload."""
+        return [self.fingerprint(workout_data) for workout_data in rows]
+
+def file_fingerprint(stream: BinaryIO) -> str:
+    """
+    Hash the remaining content of a seekable binary stream, then rewind it.
+
+    Args:
+        stream (BinaryIO): A readable, seekable binary stream
+
+    Returns:
+        str: Hex-encoded SHA-256 hash of the content
+    """
+    start = stream.tell()
+    digest = hashlib.sha256()
+    for block in iter(lambda: stream.read(HASH_BLOCK_SIZE), b''):
+        digest.update(block)
+    stream.seek(start)
+    return digest.hexdigest()
@@ -0,0 +1,274 @@
+"""
+Asynchronous workout ingest jobs.
+Uploads are spooled to disk and queued as jobs, so the HTTP request returns immediately while
+a bounded pool of workers parses and inserts the file. Job progress can be polled by id.
+
+The queue backend is pluggable: LocalIngestJobQueue runs jobs on in-process worker threads,
+and other backends can be registered in JOB_QUEUE_BACKENDS and selected with the
+INGEST_QUEUE_BACKEND environment variable.
+"""
+import logging
+import os
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from ..providers import get_provider
+from .compression import detect_compression
+from .workout_csv import CsvValidationError
+
+logger = logging.getLogger(__name__)
+
+# Number of jobs processed at the same time
+DEFAULT_INGEST_WORKERS = 2
+
+# Maximum number of queued or running jobs before new uploads are rejected
+DEFAULT_INGEST_QUEUE_SIZE = 20
+
+# How long finished jobs are kept for status polling
+JOB_RETENTION = timedelta(hours=1)
+
+class IngestQueueFullError(RuntimeError):
+    """Raised when the ingest queue cannot accept more jobs."""
+
+class IngestJob:
+    """Status and progress of one uploaded workout file."""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+
+    def __init__(self, user_id: str, path: str, file_name: str, options: Optional[Dict[str, Any]] = None):
+        """
+        Initialize the job.
+
+        Args:
+            user_id (str): The ID of the user who uploaded the file
+            path (str): Path of the spooled upload; deleted when the job finishes
+            file_name (str): Original name of the uploaded file
+            options (Optional[Dict[str, Any]]): Processing options (``date_format``, ``parallel``,
+                ``partial``, ``content_encoding``)
+        """
+        self.job_id = str(uuid.uuid4())
+        self.user_id = user_id
+        self.path = path
+        self.file_name = file_name
+        self.options = options or {}
+        self.status = self.QUEUED
+        self.rows_done = 0
+        self.rows_failed = 0
+        self.records_inserted = 0
+        self.records_skipped = 0
+        self.duplicate_file = False
+        self.upload_id = None
+        self.summary = None
+        self.error = None
+        self.errors = []
+        self.created_at = datetime.utcnow()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (self.SUCCEEDED, self.FAILED)
+
+    def throughput(self) -> Optional[float]:
+        """Rows processed per second since the job started."""
+        if self.started_at is None:
+            return None
+        elapsed = ((self.finished_at or datetime.utcnow()) - self.started_at).total_seconds()
+        return round(self.rows_done / elapsed, 1) if elapsed > 0 else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the job status to a dictionary for JSON serialization."""
+        return {
+            'job_id': self.job_id,
+            'status': self.status,
+            'file_name': self.file_name,
+            'rows_done': self.rows_done,
+            'rows_failed': self.rows_failed,
+            'records_inserted': self.records_inserted,
+            'records_skipped': self.records_skipped,
+            'duplicate_file': self.duplicate_file,
+            'summary': self.summary,
+            'throughput': self.throughput(),
+            'error': self.error,
+            'errors': self.errors,
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+def run_ingest_job(job: IngestJob, provider) -> None:
+    """
+    Process a job's spooled file with a database provider, updating its progress.
+
+    The spooled file is deleted afterwards, whether or not processing succeeded.
+    """
+    job.status = IngestJob.RUNNING
+    job.started_at = datetime.utcnow()
+
+    def on_progress(rows_done: int, rows_failed: int) -> None:
+        job.rows_done = rows_done
+        job.rows_failed = rows_failed
+
+    try:
+        options = {
+            'date_format': job.options.get('date_format'),
+            'partial': job.options.get('partial', False),
+            'progress': on_progress,
+            'file_name': job.file_name
+        }
+        content_encoding = job.options.get('content_encoding')
+        with open(job.path, 'rb') as f:
+            compressed = detect_compression(f.read(4), content_encoding) is not None
+        
+        # A compressed file cannot be split into byte ranges, so it is always streamed
+        if job.options.get('parallel') and not compressed:
+            result = provider.process_workout_csv_parallel(job.user_id, job.path, **options)
+        else:
+            with open(job.path, 'rb') as f:
+                result = provider.process_workout_csv_stream(
+                    job.user_id, f, content_encoding=content_encoding, **options)
+        job.records_inserted = result['records_inserted']
+        job.records_skipped = result['records_skipped']
+        job.duplicate_file = result['duplicate_file']
+        job.upload_id = result['upload_id']
+        job.summary = result['summary']
+        job.rows_done = job.records_inserted + job.records_skipped
+        job.rows_failed = result['rows_failed']
+        job.errors = result['errors']
+        job.status = IngestJob.SUCCEEDED
+        logger.info(f"Ingest job {job.job_id} inserted {job.records_inserted} records, "
+                    f"skipped {job.records_skipped} duplicates")
+    except CsvValidationError as e:
+        # The file was rejected; report every bad row so it can be fixed in one go
+        job.status = IngestJob.FAILED
+        job.rows_done = 0
+        job.rows_failed = e.rows_failed
+        job.errors = e.errors
+        job.error = str(e)
+        logger.info(f"Ingest job {job.job_id} rejected: {str(e)}")
+    except Exception as e:
+        # The transaction was rolled back, so nothing from this file was stored
+        job.status = IngestJob.FAILED
+        job.rows_done = 0
+        job.error = str(e)
+        logger.error(f"Ingest job {job.job_id} failed: {str(e)}")
+    finally:
+        job.finished_at = datetime.utcnow()
+        try:
+            os.remove(job.path)
+        except OSError:
+            pass
+
+class IngestJobQueue(ABC):
+    """Abstract base class for ingest job queues."""
+
+    @abstractmethod
+    def submit(self, user_id: str, path: str, file_name: str,
+               options: Optional[Dict[str, Any]] = None) -> IngestJob:
+        """
+        Queue a spooled upload for processing.
+
+        Raises:
+            IngestQueueFullError: If the queue cannot accept more jobs
+        """
+        pass
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        """Get a job by its ID, or None if it is unknown or has expired."""
+        pass
+
+class LocalIngestJobQueue(IngestJobQueue):
+    """In-process job queue backed by a bounded pool of worker threads."""
+
+    def __init__(self, workers: int = DEFAULT_INGEST_WORKERS, max_pending: int = DEFAULT_INGEST_QUEUE_SIZE):
+        """
+        Initialize the queue.
+
+        Args:
+            workers (int): Number of worker threads
+            max_pending (int): Maximum number of queued or running jobs
+        """
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ingest')
+        self._max_pending = max_pending
+        self._jobs: Dict[str, IngestJob] = {}
+        self._lock = threading.Lock()
+
+    def _run(self, job: IngestJob) -> None:
+        # Each worker thread has its own session, so jobs never share a transaction with
+        # requests; it is ended after every job to return its connection to the pool
+        provider = get_provider()
+        try:
+            run_ingest_job(job, provider)
+        finally:
+            provider.remove_session()
+
+    def submit(self, user_id: str, path: str, file_name: str,
+               options: Optional[Dict[str, Any]] = None) -> IngestJob:
+        job = IngestJob(user_id, path, file_name, options)
+        with self._lock:
+            self._expire_jobs()
+            pending = sum(1 for existing in self._jobs.values() if not existing.finished)
+            if pending >= self._max_pending:
+                raise IngestQueueFullError("Too many uploads are being processed. Please try again shortly.")
+            self._jobs[job.job_id] = job
+
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _expire_jobs(self) -> None:
+        """Forget finished jobs older than the retention period."""
+        cutoff = datetime.utcnow() - JOB_RETENTION
+        expired = [job_id for job_id, job in self._jobs.items() if job.finished and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+JOB_QUEUE_BACKENDS = {
+    'local': LocalIngestJobQueue,
+}
+
+_queue_instance: Optional[IngestJobQueue] = None
+_queue_lock = threading.Lock()
+
+def get_job_queue() -> IngestJobQueue:
+    """
+    Get the ingest job queue for the current environment.
+    Uses singleton pattern to maintain a single queue instance.
+
+    The backend is chosen by INGEST_QUEUE_BACKEND (default ``local``); the local queue is
+    sized by INGEST_WORKERS and INGEST_QUEUE_SIZE.
+
+    Returns:
+        IngestJobQueue: The job queue.
+
+    Raises:
+        RuntimeError: If the configured backend is unknown.
+    """
+    global _queue_instance
+
+    with _queue_lock:
+        if _queue_instance is None:
+            backend = os.getenv('INGEST_QUEUE_BACKEND', 'local').lower()
+            if backend not in JOB_QUEUE_BACKENDS:
+                raise RuntimeError(f"Unknown ingest queue backend: {backend}")
+
+            if backend == 'local':
+                _queue_instance = LocalIngestJobQueue(
+                    workers=int(os.getenv('INGEST_WORKERS', DEFAULT_INGEST_WORKERS)),
+                    max_pending=int(os.getenv('INGEST_QUEUE_SIZE', DEFAULT_INGEST_QUEUE_SIZE))
+                )
+            else:
+                _queue_instance = JOB_QUEUE_BACKENDS[backend]()
+
+    return _queue_instance
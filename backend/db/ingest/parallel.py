@@ -0,0 +1,193 @@
+"""
+Multi-process parsing for very large workout CSV files.
+The file is split into line-aligned byte ranges that are parsed and validated in a process
+pool. Results are merged back in file order, and row numbers in error messages refer to
+the original file.
+"""
+import csv
+import io
+import math
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .dates import DATE_SAMPLE_SIZE, DateParser, infer_day_first, resolve_date_format
+from .parsers import DEFAULT_BATCH_SIZE
+from .workout_csv import (
+    RowErrorReport, get_column_mapping, parse_workout_row, row_error_fields, row_error_prefix
+)
+
+# Shards per worker process; more shards than workers evens out uneven shard costs
+SHARDS_PER_WORKER = 4
+
+# Largest shard, in bytes; large files are split into more shards so each result stays small
+MAX_SHARD_BYTES = 16 * 1024 * 1024
+
+# Shards parsed ahead of the one being consumed, per worker; caps the parsed rows held at once
+SHARDS_IN_FLIGHT_PER_WORKER = 2
+
+# Bytes read at a time while scanning for shard boundaries
+SCAN_BLOCK_SIZE = 1024 * 1024
+
+def _count_quotes(f, start: int, end: int) -> int:
+    """Count double quotes between two byte offsets."""
+    f.seek(start)
+    count = 0
+    remaining = end - start
+    while remaining > 0:
+        block = f.read(min(SCAN_BLOCK_SIZE, remaining))
+        if not block:
+            break
+        count += block.count(b'"')
+        remaining -= len(block)
+    return count
+
+def find_shard_ranges(path: str, num_shards: int) -> Tuple[bytes, List[Tuple[int, int]]]:
+    """
+    Split a CSV file into line-aligned byte ranges.
+
+    Boundaries are moved forward to the end of a line, and past any newline that falls
+    inside a quoted field, so every range holds whole CSV records.
+
+    Args:
+        path (str): Path to the CSV file
+        num_shards (int): Target number of ranges
+
+    Returns:
+        Tuple[bytes, List[Tuple[int, int]]]: The header line and the (start, end) byte ranges
+            of the data rows, in file order
+    """
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        header = f.readline()
+        data_start = len(header)
+        targets = [data_start + (size - data_start) * i // num_shards for i in range(1, num_shards)]
+
+        boundaries = [data_start]
+        position = data_start
+        quotes = 0
+        for target in targets:
+            if target <= position:
+                continue
+            quotes += _count_quotes(f, position, target)
+            position = target
+
+            # Advance to the end of the line, and keep going while inside a quoted field
+            f.seek(position)
+            while True:
+                line = f.readline()
+                if not line:
+                    break
+                quotes += line.count(b'"')
+                position += len(line)
+                if quotes % 2 == 0:
+                    break
+            boundaries.append(position)
+        boundaries.append(size)
+
+    ranges = [(start, end) for start, end in zip(boundaries, boundaries[1:]) if end > start]
+    return header, ranges
+
+def _parse_shard(path: str, start: int, end: int, header: bytes, encoding: str,
+                 day_first: Optional[bool], collect_errors: bool = False) -> Dict[str, Any]:
+    """
+    Parse one byte range of a workout CSV in a worker process.
+
+    Errors are returned rather than raised, with the index of the failing record within
+    the shard, so the caller can translate it to a row number in the original file.
+    Unless ``collect_errors`` is set, parsing stops at the first invalid record.
+    """
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+
+    reader = csv.DictReader(io.StringIO((header + data).decode(encoding), newline=''))
+    column_mapping = get_column_mapping(reader.fieldnames)
+    date_parser = DateParser(day_first)
+
+    rows = []
+    errors = []
+    for index, row in enumerate(reader):
+        try:
+            rows.append(parse_workout_row(row, column_mapping, date_parser))
+        except Exception as e:
+            # Only plain values are returned, as exceptions may not survive pickling
+            errors.append((index, row_error_prefix(e), str(e), row_error_fields(e)))
+            if not collect_errors:
+                break
+    return {'rows': rows, 'errors': errors}
+
+def _infer_file_day_first(path: str, encoding: str, date_format: Optional[str]) -> Optional[bool]:
+    """Decide the file's day/month order once, from the first rows, before sharding."""
+    if date_format:
+        return resolve_date_format(date_format)
+
+    with open(path, 'r', encoding=encoding, newline='') as f:
+        reader = csv.DictReader(f)
+        column_mapping = get_column_mapping(reader.fieldnames)
+        sample = [row[column_mapping['date']] or '' for row in islice(reader, DATE_SAMPLE_SIZE)]
+    return infer_day_first(sample)
+
+def iter_parallel_batches(path: str, workers: Optional[int] = None,
+                          batch_size: int = DEFAULT_BATCH_SIZE,
+                          encoding: str = 'utf-8',
+                          date_format: Optional[str] = None,
+                          report: Optional[RowErrorReport] = None) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Parse and validate a workout CSV file across several processes.
+
+    Args:
+        path (str): Path to the CSV file
+        workers (Optional[int]): Number of worker processes; defaults to the CPU count
+        batch_size (int): Maximum number of rows per batch
+        encoding (str): Text encoding of the CSV file
+        date_format (Optional[str]): The file's date format (e.g. ``DD/MM/YYYY``), if known
+        report (Optional[RowErrorReport]): If given, invalid rows are recorded here and
+            skipped instead of stopping the file
+
+    Yields:
+        List[Dict[str, Any]]: Validated workout data dictionaries, in file order
+
+    Raises:
+        ValueError: If the header is invalid, or any row is invalid and no report is given;
+            row numbers match the original file
+    """
+    workers = workers or os.cpu_count() or 1
+    day_first = _infer_file_day_first(path, encoding, date_format)
+    num_shards = max(workers * SHARDS_PER_WORKER, math.ceil(os.path.getsize(path) / MAX_SHARD_BYTES))
+    header, ranges = find_shard_ranges(path, num_shards)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Shards are submitted only a few ahead of the one being consumed, so parsed rows
+        # do not pile up in this process when the caller is slower than the workers
+        pending = iter(ranges)
+        futures = deque()
+
+        def submit_next() -> None:
+            shard = next(pending, None)
+            if shard is not None:
+                start, end = shard
+                futures.append(executor.submit(_parse_shard, path, start, end, header, encoding,
+                                               day_first, report is not None))
+
+        for _ in range(workers * SHARDS_IN_FLIGHT_PER_WORKER):
+            submit_next()
+        try:
+            row_num = 2  # row 1 is header
+            while futures:
+                result = futures.popleft().result()
+                rows = result['rows']
+                for index, prefix, message, fields in result['errors']:
+                    if report is None:
+                        raise ValueError(f"{prefix} {row_num + index}: {message}")
+                    report.add_fields(row_num + index, fields)
+
+                row_num += len(rows) + len(result['errors'])
+                for offset in range(0, len(rows), batch_size):
+                    yield rows[offset:offset + batch_size]
+                submit_next()
+        finally:
+            for future in futures:
+                future.cancel()
@@ -0,0 +1,251 @@
+"""
+Workout CSV parser backends.
+This module provides a parser abstraction with a pure-Python backend built on the csv module
+and an optional vectorized backend built on pyarrow, which parses and type-checks whole
+columns at a time. Both yield batches of validated workout data dictionaries.
+"""
+import codecs
+import csv
+import os
+from abc import ABC, abstractmethod
+from itertools import islice
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional
+
+from .dates import DATE_SAMPLE_SIZE, DateParser, infer_day_first, resolve_date_format
+from .workout_csv import (
+    RowErrorReport, column_count_error, get_column_mapping, iter_workout_rows, parse_workout_row,
+    row_error_message
+)
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+except ImportError:
+    # pyarrow is optional; the csv module backend is used without it
+    pa = None
+
+DEFAULT_BATCH_SIZE = 1000
+
+# Bytes of CSV text pyarrow parses per block
+ARROW_BLOCK_SIZE = 4 * 1024 * 1024
+
+NUMERIC_COLUMNS = {'weight': 'float64', 'reps': 'int64', 'distance': 'float64'}
+
+class WorkoutCsvParser(ABC):
+    """Abstract base class for workout CSV parser backends."""
+
+    name = None
+
+    @abstractmethod
+    def iter_batches(self, stream: BinaryIO, batch_size: int = DEFAULT_BATCH_SIZE,
+                     encoding: str = 'utf-8',
+                     date_format: Optional[str] = None,
+                     report: Optional[RowErrorReport] = None) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Parse and validate a workout CSV in batches.
+
+        Args:
+            stream (BinaryIO): A readable binary stream positioned at the CSV header
+            batch_size (int): Maximum number of rows per batch
+            encoding (str): Text encoding of the CSV file
+            date_format (Optional[str]): The file's date format (e.g. ``DD/MM/YYYY``), if known
+            report (Optional[RowErrorReport]): If given, invalid rows are recorded here and
+                skipped instead of stopping the file
+
+        Yields:
+            List[Dict[str, Any]]: Validated workout data dictionaries, in file order
+
+        Raises:
+            ValueError: If the header is invalid, or any row is invalid and no report is given;
+                row errors name the row number
+        """
+        pass
+
+class CsvModuleParser(WorkoutCsvParser):
+    """Row-at-a-time parser built on the standard library csv module."""
+
+    name = 'csv'
+
+    def iter_batches(self, stream: BinaryIO, batch_size: int = DEFAULT_BATCH_SIZE,
+                     encoding: str = 'utf-8',
+                     date_format: Optional[str] = None,
+                     report: Optional[RowErrorReport] = None) -> Iterator[List[Dict[str, Any]]]:
+        # Decode line by line so only the current line is ever held as text
+        rows = iter_workout_rows(codecs.iterdecode(stream, encoding), date_format, report)
+        while True:
+            batch = [workout_data for _, workout_data in islice(rows, batch_size)]
+            if not batch:
+                return
+            yield batch
+
+class ArrowCsvParser(WorkoutCsvParser):
+    """Columnar parser built on pyarrow that converts and validates whole columns at once."""
+
+    name = 'arrow'
+
+    def __init__(self):
+        """Initialize the parser."""
+        if pa is None:
+            raise RuntimeError("The arrow CSV parser requires pyarrow to be installed")
+
+    def iter_batches(self, stream: BinaryIO, batch_size: int = DEFAULT_BATCH_SIZE,
+                     encoding: str = 'utf-8',
+                     date_format: Optional[str] = None,
+                     report: Optional[RowErrorReport] = None) -> Iterator[List[Dict[str, Any]]]:
+        # Read the header ourselves so every column can be loaded as a string and converted
+        # explicitly, rather than relying on pyarrow's type inference
+        header = stream.readline().decode(encoding)
+        fieldnames = next(csv.reader([header]), None)
+        column_mapping = get_column_mapping(fieldnames)
+
+        # pyarrow cannot keep a row with the wrong number of values, so such rows are
+        # recorded and skipped as they are parsed. Their row numbers are remembered so the
+        # rows after them are still numbered as in the file.
+        skipped = set()
+        ragged = []
+
+        def handle_invalid_row(row) -> str:
+            # row.number counts lines after the header, which is row 1
+            row_num = row.number + 1 if row.number is not None else None
+            error = column_count_error(row.expected_columns, row.actual_columns)
+            if report is None:
+                ragged.append(ValueError(row_error_message(row_num, error)))
+                return 'error'
+            report.add(row_num, error)
+            skipped.add(row_num)
+            return 'skip'
+
+        try:
+            reader = pa_csv.open_csv(
+                stream,
+                read_options=pa_csv.ReadOptions(
+                    column_names=fieldnames,
+                    encoding=encoding,
+                    block_size=ARROW_BLOCK_SIZE
+                ),
+                parse_options=pa_csv.ParseOptions(newlines_in_values=True,
+                                                  invalid_row_handler=handle_invalid_row),
+                convert_options=pa_csv.ConvertOptions(
+                    column_types={name: pa.string() for name in fieldnames},
+                    strings_can_be_null=False,
+                    quoted_strings_can_be_null=False
+                )
+            )
+        except pa.ArrowInvalid as e:
+            # A file with a header and no rows has nothing to parse
+            if 'Empty CSV file' in str(e):
+                return
+            if ragged:
+                raise ragged[0] from e
+            raise
+
+        date_parser = None
+        if date_format:
+            date_parser = DateParser(resolve_date_format(date_format))
+
+        next_row_num = 2  # row 1 is header
+        batches = iter(reader)
+        while True:
+            try:
+                record_batch = next(batches)
+            except StopIteration:
+                return
+            except pa.ArrowInvalid as e:
+                if ragged:
+                    raise ragged[0] from e
+                raise
+            if record_batch.num_rows == 0:
+                continue
+            if date_parser is None:
+                sample = record_batch.column(column_mapping['date']).slice(0, DATE_SAMPLE_SIZE).to_pylist()
+                date_parser = DateParser(infer_day_first(sample))
+
+            row_nums = []
+            while len(row_nums) < record_batch.num_rows:
+                if next_row_num not in skipped:
+                    row_nums.append(next_row_num)
+                next_row_num += 1
+            rows = self._convert_batch(record_batch, column_mapping, date_parser, row_nums, report)
+            for start in range(0, len(rows), batch_size):
+                yield rows[start:start + batch_size]
+
+    def _convert_batch(self, record_batch, column_mapping: Dict[str, str],
+                       date_parser: DateParser, row_nums: List[int],
+                       report: Optional[RowErrorReport] = None) -> List[Dict[str, Any]]:
+        """Convert one record batch, whose rows have the given row numbers, column by column."""
+        try:
+            columns = {}
+            for name, actual in column_mapping.items():
+                column = record_batch.column(actual)
+                if name in ('exercise', 'category'):
+                    if pc.any(pc.equal(pc.utf8_length(column), 0)).as_py():
+                        raise ValueError(f"Empty {name}")
+                    columns[name] = column.to_pylist()
+                elif name == 'date':
+                    # Parse each distinct date string once
+                    encoded = pc.dictionary_encode(column)
+                    parsed = [date_parser.parse(value) for value in encoded.dictionary.to_pylist()]
+                    columns[name] = [parsed[index] for index in encoded.indices.to_pylist()]
+                elif name in NUMERIC_COLUMNS:
+                    column = pc.utf8_trim_whitespace(column)
+                    column = pc.if_else(pc.equal(column, ''), pa.scalar(None, pa.string()), column)
+                    columns[name] = pc.cast(column, NUMERIC_COLUMNS[name]).to_pylist()
+                else:
+                    columns[name] = column.to_pylist()
+        except ValueError as e:  # includes pyarrow.ArrowInvalid
+            rows = self._convert_rows(record_batch, column_mapping, date_parser, row_nums, report)
+            if report is None:
+                raise ValueError(f"Error processing rows {row_nums[0]}-{row_nums[-1]}: {str(e)}")
+            return rows
+
+        names = list(columns)
+        return [dict(zip(names, values)) for values in zip(*(columns[name] for name in names))]
+
+    def _convert_rows(self, record_batch, column_mapping: Dict[str, str],
+                      date_parser: DateParser, row_nums: List[int],
+                      report: Optional[RowErrorReport] = None) -> List[Dict[str, Any]]:
+        """
+        Re-check a failed batch row by row, to find which rows are bad.
+
+        Without a report the first bad row is raised; with one, every bad row is recorded
+        and the valid rows are returned.
+        """
+        rows = []
+        for row_num, row in zip(row_nums, record_batch.to_pylist()):
+            try:
+                rows.append(parse_workout_row(row, column_mapping, date_parser))
+            except Exception as e:
+                if report is None:
+                    raise ValueError(row_error_message(row_num, e))
+                report.add(row_num, e)
+        return rows
+
+PARSER_BACKENDS = {
+    CsvModuleParser.name: CsvModuleParser,
+    ArrowCsvParser.name: ArrowCsvParser,
+}
+
+def get_parser(backend: Optional[str] = None) -> WorkoutCsvParser:
+    """
+    Get a workout CSV parser.
+
+    The backend defaults to the CSV_PARSER_BACKEND environment variable, or ``auto``, which
+    uses the arrow backend when pyarrow is installed and the csv backend otherwise.
+
+    Args:
+        backend (Optional[str]): ``csv``, ``arrow`` or ``auto``
+
+    Returns:
+        WorkoutCsvParser: The parser for the selected backend
+
+    Raises:
+        ValueError: If the backend is unknown
+    """
+    backend = (backend or os.getenv('CSV_PARSER_BACKEND', 'auto')).lower()
+    if backend == 'auto':
+        backend = ArrowCsvParser.name if pa is not None else CsvModuleParser.name
+
+    if backend not in PARSER_BACKENDS:
+        raise ValueError(f"Unknown CSV parser backend: {backend}")
+    return PARSER_BACKENDS[backend]()
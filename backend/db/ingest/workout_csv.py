@@ -0,0 +1,247 @@
+"""
+Workout CSV parsing and validation.
+This module turns the rows of an uploaded workout CSV into validated workout data dictionaries
+without touching the database, so the whole file can be checked before anything is written.
+"""
+import csv
+from itertools import chain, islice
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .dates import DATE_SAMPLE_SIZE, DateParser, date_format_name, infer_day_first, resolve_date_format
+
+REQUIRED_COLUMNS = {'date', 'exercise', 'category'}
+OPTIONAL_COLUMNS = {'weight', 'weight_unit', 'reps', 'distance', 'distance_unit', 'time', 'comment'}
+ALL_COLUMNS = REQUIRED_COLUMNS | OPTIONAL_COLUMNS
+
+# Most row errors kept in a validation report; further invalid rows are only counted
+MAX_REPORTED_ERRORS = 1000
+
+class InvalidRowError(ValueError):
+    """Raised when one or more fields of a workout CSV row are invalid."""
+
+    def __init__(self, errors: List[Tuple[str, str]]):
+        """
+        Initialize the error.
+
+        Args:
+            errors (List[Tuple[str, str]]): The (column, reason) of each invalid field
+        """
+        self.errors = errors
+        super().__init__('; '.join(reason for _, reason in errors))
+
+class RowErrorReport:
+    """Collects the errors of every invalid row of a file, so they can be reported together."""
+
+    def __init__(self, max_errors: int = MAX_REPORTED_ERRORS, rows_failed: int = 0,
+                 errors: Optional[List[Dict[str, Any]]] = None):
+        """
+        Initialize the report.
+
+        Args:
+            max_errors (int): Most errors kept; invalid rows beyond this are only counted
+            rows_failed (int): Invalid rows already found, when a file is parsed in parts
+            errors (Optional[List[Dict[str, Any]]]): Errors already reported for those rows
+        """
+        self.max_errors = max_errors
+        self.errors: List[Dict[str, Any]] = list(errors or [])
+        self.rows_failed = rows_failed
+
+    def add(self, row_num: int, error: Exception) -> None:
+        """Record why a row was rejected."""
+        self.add_fields(row_num, row_error_fields(error))
+
+    def add_fields(self, row_num: int, fields: List[Tuple[Optional[str], str]]) -> None:
+        """Record the (column, reason) of each problem with a rejected row."""
+        self.rows_failed += 1
+        for column, reason in fields:
+            if len(self.errors) >= self.max_errors:
+                break
+            self.errors.append({'row': row_num, 'column': column, 'reason': reason})
+
+class CsvValidationError(ValueError):
+    """Raised when a workout CSV is rejected because some of its rows are invalid."""
+
+    def __init__(self, report: RowErrorReport):
+        """
+        Initialize the error.
+
+        Args:
+            report (RowErrorReport): The errors of every invalid row
+        """
+        self.errors = report.errors
+        self.rows_failed = report.rows_failed
+        first = self.errors[0] if self.errors else None
+        message = f"{self.rows_failed} invalid row(s)"
+        if first:
+            message += f"; first in row {first['row']}: {first['reason']}"
+        super().__init__(message)
+
+def row_error_fields(error: Exception) -> List[Tuple[Optional[str], str]]:
+    """Get the (column, reason) of each problem behind a row error; the column is None if unknown."""
+    if isinstance(error, InvalidRowError):
+        return error.errors
+    return [(None, str(error))]
+
+def row_error_prefix(error: Exception) -> str:
+    """Get how a row error is introduced: invalid data, or an unexpected failure."""
+    return 'Error in row' if isinstance(error, ValueError) else 'Error processing row'
+
+def row_error_message(row_num: int, error: Exception) -> str:
+    """Format a row error the way it is reported when a file stops at its first bad row."""
+    return f"{row_error_prefix(error)} {row_num}: {str(error)}"
+
+def normalize_column_name(col: str) -> str:
+    """Normalize a column name (convert to lowercase and replace spaces with underscores)."""
+    return col.lower().replace(' ', '_')
+
+def get_column_mapping(fieldnames) -> Dict[str, str]:
+    """
+    Validate the CSV header and map normalized column names to the actual column names.
+
+    Raises:
+        ValueError: If required columns are missing or unknown columns are present
+    """
+    actual_columns = {normalize_column_name(col) for col in fieldnames} if fieldnames else set()
+
+    # Check for missing required columns
+    missing_columns = REQUIRED_COLUMNS - actual_columns
+    if missing_columns:
+        raise ValueError(f"Missing required columns: {', '.join(missing_columns)}")
+
+    # Check for unknown columns
+    unknown_columns = actual_columns - ALL_COLUMNS
+    if unknown_columns:
+        raise ValueError(f"Unknown columns found: {', '.join(unknown_columns)}")
+
+    return {normalize_column_name(col): col for col in fieldnames}
+
+def read_header(stream: BinaryIO, encoding: str = 'utf-8') -> Dict[str, str]:
+    """
+    Read and validate the header line of a workout CSV, so a file with a bad header can
+    be rejected before any of its rows are parsed.
+
+    Raises:
+        ValueError: If the header cannot be decoded, or required columns are missing or
+            unknown columns are present
+    """
+    header = stream.readline().decode(encoding)
+    return get_column_mapping(next(csv.reader([header]), None))
+
+def column_count_error(expected: int, actual: int) -> InvalidRowError:
+    """Build the error for a row with a different number of values than the header."""
+    return InvalidRowError([(None, f"Expected {expected} columns, got {actual}")])
+
+def parse_workout_row(row: Dict[str, str], column_mapping: Dict[str, str], date_parser: DateParser) -> Dict[str, Any]:
+    """
+    Convert a raw CSV row into a workout data dictionary.
+
+    Every field is checked, so a row with several problems reports all of them.
+
+    Raises:
+        InvalidRowError: If the row has the wrong number of values, or any field is invalid
+    """
+    # csv.DictReader keeps values past the header under None and fills in missing ones with None
+    if None in row or None in row.values():
+        extra = row.get(None) or []
+        values = [value for column, value in row.items() if column is not None and value is not None]
+        raise column_count_error(len(row) - (None in row), len(values) + len(extra))
+
+    workout_data = {}
+    errors = []
+
+    def convert(name, parse):
+        column = column_mapping[name]
+        try:
+            workout_data[name] = parse(row[column])
+        except ValueError as e:
+            errors.append((column, str(e)))
+
+    # Required fields
+    convert('date', date_parser.parse)
+    for name in ('exercise', 'category'):
+        value = row[column_mapping[name]]
+        if value:
+            workout_data[name] = value
+        else:
+            errors.append((column_mapping[name], f"{name.capitalize()} must be a non-empty string"))
+
+    # Optional numeric fields are only set when they have a value
+    for name, parse in (('weight', float), ('reps', int), ('distance', float)):
+        if name in column_mapping:
+            value = row[column_mapping[name]]
+            if value and value.strip():
+                convert(name, parse)
+
+    # Optional text fields are copied as they are
+    for name in ('weight_unit', 'distance_unit', 'time', 'comment'):
+        if name in column_mapping:
+            workout_data[name] = row[column_mapping[name]]
+
+    if errors:
+        raise InvalidRowError(errors)
+    return workout_data
+
+def infer_date_format(csv_file: Iterable[str]) -> str:
+    """
+    Infer a file's date format from its first rows, as ``iter_workout_rows`` does.
+
+    Args:
+        csv_file (Iterable[str]): A text stream, or any iterable of lines, positioned at the CSV header
+
+    Returns:
+        str: The name of the format (e.g. ``DD/MM/YYYY``)
+
+    Raises:
+        AmbiguousDateFormatError: If the file's date format cannot be determined unambiguously
+        ValueError: If the header is invalid
+    """
+    reader = csv.DictReader(csv_file)
+    column_mapping = get_column_mapping(reader.fieldnames)
+    sample = islice(reader, DATE_SAMPLE_SIZE)
+    return date_format_name(infer_day_first(row[column_mapping['date']] or '' for row in sample))
+
+def iter_workout_rows(csv_file: Iterable[str], date_format: Optional[str] = None,
+                      report: Optional[RowErrorReport] = None,
+                      first_row_num: int = 2) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Parse and validate a workout CSV file row by row.
+
+    Unless a date format is given, whether the file's dates are day-first or month-first
+    is inferred once from the first rows of the file and then used for every row.
+
+    Args:
+        csv_file (Iterable[str]): A text stream, or any iterable of lines, positioned at the CSV header
+        date_format (Optional[str]): The file's date format (e.g. ``DD/MM/YYYY``), if known
+        report (Optional[RowErrorReport]): If given, invalid rows are recorded here and
+            skipped instead of stopping the file
+        first_row_num (int): Number of the row after the header; higher when the lines
+            after the header start part way through the file
+
+    Yields:
+        Tuple[int, Dict[str, Any]]: The row number (the header is row 1) and its workout data
+
+    Raises:
+        AmbiguousDateFormatError: If the file's date format cannot be determined unambiguously
+        ValueError: If the header is invalid, or any row is invalid and no report is given
+    """
+    reader = csv.DictReader(csv_file)
+    column_mapping = get_column_mapping(reader.fieldnames)
+
+    if date_format:
+        rows = reader
+        date_parser = DateParser(resolve_date_format(date_format))
+    else:
+        # Only the sampled rows are held in memory while the format is inferred
+        sample = list(islice(reader, DATE_SAMPLE_SIZE))
+        rows = chain(sample, reader)
+        date_parser = DateParser(infer_day_first(row[column_mapping['date']] or '' for row in sample))
+
+    for row_num, row in enumerate(rows, start=first_row_num):  # row 1 is the header
+        try:
+            workout_data = parse_workout_row(row, column_mapping, date_parser)
+        except Exception as e:
+            if report is None:
+                raise ValueError(row_error_message(row_num, e))
+            report.add(row_num, e)
+            continue
+        yield row_num, workout_data
@@ -0,0 +1,164 @@
+"""
+Partition maintenance for SwolePT backend.
+On Postgres, workout_history is partitioned by year of the workout date. This module
+creates partitions for coming years before workouts are logged in them, moves rows that
+landed in the default partition into a partition for their year, and detaches old years
+so they can be archived or dropped without touching the rest of the table. It can also
+rebuild the daily workout summaries from the full history.
+"""
+import argparse
+import logging
+import re
+import sys
+from datetime import date
+from typing import List
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Connection, Engine
+
+from .providers import get_provider
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = 'workout_history'
+DEFAULT_PARTITION = 'workout_history_default'
+
+# Partitions are kept ready for this many years after the current one
+DEFAULT_YEARS_AHEAD = 1
+
+def partition_name(year: int) -> str:
+    """Get the name of the partition holding a year's workouts."""
+    return f"{PARENT_TABLE}_y{year}"
+
+def is_partitioned(conn: Connection) -> bool:
+    """Check whether workout_history is a partitioned table."""
+    if conn.dialect.name != 'postgresql':
+        return False
+    relkind = conn.execute(text(
+        "SELECT relkind FROM pg_class WHERE oid = to_regclass(:table)"
+    ), {'table': PARENT_TABLE}).scalar()
+    return relkind == 'p'
+
+def get_partition_years(conn: Connection) -> List[int]:
+    """Get the years that have a partition attached, in order."""
+    names = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(:table)"
+    ), {'table': PARENT_TABLE}).scalars()
+    pattern = re.compile(rf"{PARENT_TABLE}_y(\d+)$")
+    return sorted(int(match.group(1)) for match in map(pattern.match, names) if match)
+
+def ensure_workout_partitions(engine: Engine, years_ahead: int = DEFAULT_YEARS_AHEAD) -> List[str]:
+    """
+    Create the workout_history partitions that are missing.
+
+    Every year from the current one to ``years_ahead`` years later gets a partition, as does
+    every year with rows in the default partition; those rows are moved into it. Databases
+    where workout_history is not partitioned, such as SQLite, are left unchanged.
+
+    Args:
+        engine (Engine): Engine for the database to maintain
+        years_ahead (int): How many years after the current one need a partition
+
+    Returns:
+        List[str]: Names of the partitions created
+    """
+    created = []
+    with engine.begin() as conn:
+        if not is_partitioned(conn):
+            return created
+
+        existing = set(get_partition_years(conn))
+        default_years = set(conn.execute(text(
+            f"SELECT DISTINCT extract(year FROM date)::int FROM {DEFAULT_PARTITION}"
+        )).scalars())
+        this_year = date.today().year
+        wanted = default_years | set(range(this_year, this_year + years_ahead + 1))
+
+        for year in sorted(wanted - existing):
+            # The partition is filled from the default partition before it is attached;
+            # attaching a range that still has rows in the default partition fails
+            name = partition_name(year)
+            bounds = {'start': date(year, 1, 1), 'end': date(year + 1, 1, 1)}
+            conn.execute(text(f"CREATE TABLE {name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+            if year in default_years:
+                conn.execute(text(
+                    f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE date >= :start AND date < :end "
+                    f"RETURNING *) INSERT INTO {name} SELECT * FROM moved"
+                ), bounds)
+            conn.execute(text(
+                f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} "
+                f"FOR VALUES FROM ('{bounds['start']}') TO ('{bounds['end']}')"
+            ))
+            created.append(name)
+            logger.info(f"Created partition {name}")
+
+    return created
+
+def detach_workout_partition(engine: Engine, year: int, drop: bool = False) -> str:
+    """
+    Detach a year's partition from workout_history.
+
+    The detached table keeps its rows and can be archived, for example with pg_dump, and
+    then dropped. Its workouts no longer appear in workout history.
+
+    Args:
+        engine (Engine): Engine for the database to maintain
+        year (int): Year whose partition is detached
+        drop (bool): Whether to drop the partition once it is detached
+
+    Returns:
+        str: Name of the detached partition
+
+    Raises:
+        ValueError: If workout_history is not partitioned or has no partition for the year
+    """
+    name = partition_name(year)
+    with engine.begin() as conn:
+        if not is_partitioned(conn):
+            raise ValueError("Workout history is not partitioned")
+        if year not in get_partition_years(conn):
+            raise ValueError(f"No partition for {year}")
+
+        conn.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+        if drop:
+            conn.execute(text(f"DROP TABLE {name}"))
+    logger.info(f"{'Dropped' if drop else 'Detached'} partition {name}")
+    return name
+
+def main(argv=None) -> int:
+    """Run partition maintenance from the command line."""
+    parser = argparse.ArgumentParser(description="Maintain workout_history partitions and summaries")
+    parser.add_argument('--years-ahead', type=int, default=DEFAULT_YEARS_AHEAD,
+                        help="years after the current one that need a partition")
+    parser.add_argument('--detach', type=int, metavar='YEAR',
+                        help="detach the partition for YEAR instead")
+    parser.add_argument('--drop', action='store_true',
+                        help="drop the partition after detaching it")
+    parser.add_argument('--rebuild-summaries', action='store_true',
+                        help="rebuild the daily workout summaries instead")
+    parser.add_argument('--user', metavar='USER_ID',
+                        help="only rebuild this user's summaries")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    if args.rebuild_summaries:
+        written = get_provider().rebuild_daily_summaries(args.user)
+        logger.info(f"Rebuilt {written} daily summaries")
+        return 0
+
+    engine = create_engine(get_provider().get_connection_url())
+    try:
+        if args.detach is not None:
+            detach_workout_partition(engine, args.detach, drop=args.drop)
+        else:
+            ensure_workout_partitions(engine, years_ahead=args.years_ahead)
+    except ValueError as e:
+        logger.error(str(e))
+        return 1
+    finally:
+        engine.dispose()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
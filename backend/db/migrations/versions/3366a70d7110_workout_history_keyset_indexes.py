@@ -0,0 +1,48 @@
+"""Add id to the workout history indexes for keyset pagination
+
+Revision ID: 3366a70d7110
+Revises: faf46a412c42
+Create Date: 2025-06-17 11:05:32.871640
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3366a70d7110'
+down_revision = 'faf46a412c42'
+branch_labels = None
+depends_on = None
+
+# Workout history is paged in (date, created_at, id) order. Rows from one upload share a
+# created_at, so id breaks the ties and has to be in the index for pages to be read
+# without a sort. Each old index is replaced by one that ends with id.
+REPLACED_INDEXES = [
+    ('ix_workout_history_user_date', 'ix_workout_history_user_date_id',
+     ['user_id', 'date', 'created_at']),
+    ('ix_workout_history_user_exercise_date', 'ix_workout_history_user_exercise_date_id',
+     ['user_id', 'exercise', 'date', 'created_at']),
+    ('ix_workout_history_user_category_date', 'ix_workout_history_user_category_date_id',
+     ['user_id', 'category', 'date', 'created_at']),
+]
+
+
+def upgrade() -> None:
+    # Built concurrently, outside a transaction, as in faf46a412c42; the new index is
+    # in place before the old one is dropped
+    with op.get_context().autocommit_block():
+        for old_name, new_name, columns in REPLACED_INDEXES:
+            op.create_index(new_name, 'workout_history', columns + ['id'],
+                            postgresql_concurrently=True, if_not_exists=True)
+            op.drop_index(old_name, table_name='workout_history',
+                          postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for old_name, new_name, columns in reversed(REPLACED_INDEXES):
+            op.create_index(old_name, 'workout_history', columns,
+                            postgresql_concurrently=True, if_not_exists=True)
+            op.drop_index(new_name, table_name='workout_history',
+                          postgresql_concurrently=True, if_exists=True)
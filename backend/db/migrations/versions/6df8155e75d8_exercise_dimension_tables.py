@@ -0,0 +1,73 @@
+"""Store exercise and category names once, referenced by id
+
+Revision ID: 6df8155e75d8
+Revises: 8cb0c5303bbb
+Create Date: 2025-06-25 09:31:54.218630
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6df8155e75d8'
+down_revision = '8cb0c5303bbb'
+branch_labels = None
+depends_on = None
+
+# (name column, id column, dimension table, name length)
+DIMENSIONS = [
+    ('exercise', 'exercise_id', 'exercises', 255),
+    ('category', 'category_id', 'exercise_categories', 100),
+]
+
+
+def _index_columns(column):
+    return ['user_id', column, 'date', 'created_at', 'id']
+
+
+def upgrade() -> None:
+    # Every workout_history row is rewritten to fill in the ids, while holding a lock on
+    # the table; run it in a quiet period.
+    for name_column, id_column, table, length in DIMENSIONS:
+        op.create_table(table,
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=length), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name')
+        )
+        op.execute(f"INSERT INTO {table} (name) SELECT DISTINCT {name_column} FROM workout_history ORDER BY 1")
+        op.add_column('workout_history', sa.Column(id_column, sa.Integer(), nullable=True))
+
+    op.execute(
+        "UPDATE workout_history SET exercise_id = e.id, category_id = c.id "
+        "FROM exercises e, exercise_categories c "
+        "WHERE e.name = workout_history.exercise AND c.name = workout_history.category"
+    )
+
+    for name_column, id_column, table, length in DIMENSIONS:
+        op.alter_column('workout_history', id_column, nullable=False)
+        op.create_foreign_key(f'workout_history_{id_column}_fkey', 'workout_history', table, [id_column], ['id'])
+        op.drop_index(f'ix_workout_history_user_{name_column}_date_id', table_name='workout_history')
+        op.drop_column('workout_history', name_column)
+        op.create_index(f'ix_workout_history_user_{name_column}_date_id', 'workout_history',
+                        _index_columns(id_column))
+
+
+def downgrade() -> None:
+    for name_column, id_column, table, length in DIMENSIONS:
+        op.add_column('workout_history', sa.Column(name_column, sa.String(length=length), nullable=True))
+
+    op.execute(
+        "UPDATE workout_history SET exercise = e.name, category = c.name "
+        "FROM exercises e, exercise_categories c "
+        "WHERE e.id = workout_history.exercise_id AND c.id = workout_history.category_id"
+    )
+
+    for name_column, id_column, table, length in DIMENSIONS:
+        op.alter_column('workout_history', name_column, nullable=False)
+        op.drop_index(f'ix_workout_history_user_{name_column}_date_id', table_name='workout_history')
+        op.drop_column('workout_history', id_column)
+        op.create_index(f'ix_workout_history_user_{name_column}_date_id', 'workout_history',
+                        _index_columns(name_column))
+        op.drop_table(table)
@@ -0,0 +1,43 @@
+"""Summarize workouts per user, day and exercise
+
+Revision ID: 8cb0c5303bbb
+Revises: 96db0e579870
+Create Date: 2025-06-23 10:12:47.502318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8cb0c5303bbb'
+down_revision = '96db0e579870'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('workout_daily_summaries',
+    sa.Column('user_id', sa.String(length=255), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('exercise', sa.String(length=255), nullable=False),
+    sa.Column('category', sa.String(length=100), nullable=False),
+    sa.Column('set_count', sa.Integer(), nullable=False),
+    sa.Column('total_reps', sa.Integer(), nullable=False),
+    sa.Column('total_volume', sa.Float(), nullable=False),
+    sa.Column('max_weight', sa.Float(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'date', 'exercise')
+    )
+    # Summarize the workouts already stored
+    op.execute(
+        "INSERT INTO workout_daily_summaries "
+        "(user_id, date, exercise, category, set_count, total_reps, total_volume, max_weight) "
+        "SELECT user_id, date, exercise, min(category), count(*), coalesce(sum(reps), 0), "
+        "coalesce(sum(weight * reps), 0), max(weight) "
+        "FROM workout_history GROUP BY user_id, date, exercise"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('workout_daily_summaries')
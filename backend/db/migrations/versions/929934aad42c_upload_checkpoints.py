@@ -0,0 +1,30 @@
+"""Checkpoint progress of uploads ingested from S3
+
+Revision ID: 929934aad42c
+Revises: b4111d058e43
+Create Date: 2025-06-13 14:52:09.338471
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '929934aad42c'
+down_revision = 'b4111d058e43'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('workout_uploads', sa.Column('byte_offset', sa.BigInteger(), server_default='0', nullable=False))
+    op.add_column('workout_uploads', sa.Column('rows_failed', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('workout_uploads', sa.Column('errors', sa.JSON(), nullable=True))
+    op.add_column('workout_uploads', sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('workout_uploads', 'updated_at')
+    op.drop_column('workout_uploads', 'errors')
+    op.drop_column('workout_uploads', 'rows_failed')
+    op.drop_column('workout_uploads', 'byte_offset')
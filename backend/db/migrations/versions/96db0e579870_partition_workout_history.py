@@ -0,0 +1,118 @@
+"""Partition workout history by year
+
+Revision ID: 96db0e579870
+Revises: 3366a70d7110
+Create Date: 2025-06-20 15:43:08.126597
+
+"""
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '96db0e579870'
+down_revision = '3366a70d7110'
+branch_labels = None
+depends_on = None
+
+# Partitions are created up front for this many years after the current one; later ones are
+# added by db.maintenance
+PARTITION_YEARS_AHEAD = 1
+
+# Secondary indexes of workout_history as of this revision
+HISTORY_INDEXES = [
+    ('ix_workout_history_user_date_id', ['user_id', 'date', 'created_at', 'id']),
+    ('ix_workout_history_user_exercise_date_id', ['user_id', 'exercise', 'date', 'created_at', 'id']),
+    ('ix_workout_history_user_category_date_id', ['user_id', 'category', 'date', 'created_at', 'id']),
+    ('ix_workout_history_upload_id', ['upload_id']),
+]
+
+COLUMN_NAMES = ('id, user_id, date, exercise, category, weight, weight_unit, reps, distance, '
+                'distance_unit, time, comment, created_at, updated_at, fingerprint, upload_id')
+
+
+def _columns():
+    return [
+        sa.Column('id', sa.Integer(), server_default=sa.text("nextval('workout_history_id_seq'::regclass)"), nullable=False),
+        sa.Column('user_id', sa.String(length=255), nullable=False),
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('exercise', sa.String(length=255), nullable=False),
+        sa.Column('category', sa.String(length=100), nullable=False),
+        sa.Column('weight', sa.Float(), nullable=True),
+        sa.Column('weight_unit', sa.String(length=10), nullable=True),
+        sa.Column('reps', sa.Integer(), nullable=True),
+        sa.Column('distance', sa.Float(), nullable=True),
+        sa.Column('distance_unit', sa.String(length=10), nullable=True),
+        sa.Column('time', sa.String(length=50), nullable=True),
+        sa.Column('comment', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('fingerprint', sa.String(length=64), nullable=True),
+        sa.Column('upload_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], name='workout_history_user_id_fkey'),
+        sa.ForeignKeyConstraint(['upload_id'], ['workout_uploads.id'], name='workout_history_upload_id_fkey',
+                                ondelete='SET NULL'),
+    ]
+
+
+def _set_aside(new_name: str) -> None:
+    # Constraint and index names are unique across the schema, so the old table gives up
+    # its names before the replacement is created
+    op.rename_table('workout_history', new_name)
+    op.execute(f"ALTER TABLE {new_name} RENAME CONSTRAINT workout_history_pkey TO {new_name}_pkey")
+    op.execute(f"ALTER TABLE {new_name} RENAME CONSTRAINT workout_history_fingerprint_key "
+               f"TO {new_name}_fingerprint_key")
+    for name, _ in HISTORY_INDEXES:
+        op.drop_index(name, table_name=new_name)
+
+
+def _move_rows(old_name: str) -> None:
+    op.execute("ALTER SEQUENCE workout_history_id_seq OWNED BY workout_history.id")
+    op.execute(f"INSERT INTO workout_history ({COLUMN_NAMES}) SELECT {COLUMN_NAMES} FROM {old_name}")
+    op.drop_table(old_name)
+    for name, columns in HISTORY_INDEXES:
+        op.create_index(name, 'workout_history', columns)
+
+
+def upgrade() -> None:
+    # The table is rebuilt and its rows copied in one transaction, which holds a lock on
+    # workout history until it commits; run it in a quiet period.
+    _set_aside('workout_history_unpartitioned')
+
+    # A partitioned table's unique constraints must include the partition key. The
+    # fingerprint hashes the date, so making it unique per date changes nothing.
+    op.create_table('workout_history',
+    *_columns(),
+    sa.PrimaryKeyConstraint('id', 'date', name='workout_history_pkey'),
+    sa.UniqueConstraint('fingerprint', 'date', name='workout_history_fingerprint_key'),
+    postgresql_partition_by='RANGE (date)'
+    )
+
+    # One partition per year that has workouts, plus the coming years. Rows for any other
+    # year land in the default partition until db.maintenance gives the year a partition.
+    years = {row[0] for row in op.get_bind().execute(
+        sa.text("SELECT DISTINCT extract(year FROM date)::int FROM workout_history_unpartitioned")
+    )}
+    this_year = date.today().year
+    years.update(range(this_year, this_year + PARTITION_YEARS_AHEAD + 1))
+    for year in sorted(years):
+        op.execute(f"CREATE TABLE workout_history_y{year} PARTITION OF workout_history "
+                   f"FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')")
+    op.execute("CREATE TABLE workout_history_default PARTITION OF workout_history DEFAULT")
+
+    _move_rows('workout_history_unpartitioned')
+
+
+def downgrade() -> None:
+    # Partitions that were detached for archiving are left as they are
+    _set_aside('workout_history_partitioned')
+
+    op.create_table('workout_history',
+    *_columns(),
+    sa.PrimaryKeyConstraint('id', name='workout_history_pkey'),
+    sa.UniqueConstraint('fingerprint', name='workout_history_fingerprint_key')
+    )
+
+    _move_rows('workout_history_partitioned')
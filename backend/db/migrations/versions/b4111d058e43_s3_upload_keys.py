@@ -0,0 +1,29 @@
+"""Track S3 object keys of direct uploads
+
+Revision ID: b4111d058e43
+Revises: b546551aa27c
+Create Date: 2025-06-11 09:07:35.664120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4111d058e43'
+down_revision = 'b546551aa27c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('workout_uploads', sa.Column('object_key', sa.String(length=1024), nullable=True))
+    # Uploads made before this revision were processed when they were recorded
+    op.add_column('workout_uploads', sa.Column('status', sa.String(length=20), server_default='completed', nullable=False))
+    op.create_unique_constraint('workout_uploads_object_key_key', 'workout_uploads', ['object_key'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('workout_uploads_object_key_key', 'workout_uploads', type_='unique')
+    op.drop_column('workout_uploads', 'status')
+    op.drop_column('workout_uploads', 'object_key')
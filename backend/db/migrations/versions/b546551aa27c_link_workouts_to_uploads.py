@@ -0,0 +1,33 @@
+"""Link workout records to their upload
+
+Revision ID: b546551aa27c
+Revises: ef7a44aa90a5
+Create Date: 2025-06-05 16:22:48.913027
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b546551aa27c'
+down_revision = 'ef7a44aa90a5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Streams that cannot be hashed up front are still recorded as uploads
+    op.alter_column('workout_uploads', 'file_hash', existing_type=sa.String(length=64), nullable=True)
+    op.add_column('workout_history', sa.Column('upload_id', sa.Integer(), nullable=True))
+    op.create_foreign_key('workout_history_upload_id_fkey', 'workout_history', 'workout_uploads',
+                          ['upload_id'], ['id'], ondelete='SET NULL')
+    op.create_index('ix_workout_history_upload_id', 'workout_history', ['upload_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_workout_history_upload_id', table_name='workout_history')
+    op.drop_constraint('workout_history_upload_id_fkey', 'workout_history', type_='foreignkey')
+    op.drop_column('workout_history', 'upload_id')
+    op.execute("DELETE FROM workout_uploads WHERE file_hash IS NULL")
+    op.alter_column('workout_uploads', 'file_hash', existing_type=sa.String(length=64), nullable=False)
@@ -0,0 +1,32 @@
+"""Store the row number and repeated-row counts of upload checkpoints
+
+Revision ID: c81f0a2d94e7
+Revises: 6df8155e75d8
+Create Date: 2025-07-02 11:08:41.573920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c81f0a2d94e7'
+down_revision = '6df8155e75d8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('workout_uploads', sa.Column('row_num', sa.Integer(), server_default='0', nullable=False))
+    op.create_table('workout_upload_fingerprints',
+    sa.Column('upload_id', sa.Integer(), nullable=False),
+    sa.Column('fingerprint', sa.String(length=64), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['upload_id'], ['workout_uploads.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('upload_id', 'fingerprint')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('workout_upload_fingerprints')
+    op.drop_column('workout_uploads', 'row_num')
@@ -0,0 +1,106 @@
+"""Workout fingerprints and upload history
+
+Revision ID: ef7a44aa90a5
+Revises: 94db6fe2e78a
+Create Date: 2025-06-02 10:41:17.208356
+
+"""
+import hashlib
+from collections import Counter
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ef7a44aa90a5'
+down_revision = '94db6fe2e78a'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH_SIZE = 5000
+
+workout_history = sa.table(
+    'workout_history',
+    sa.column('id', sa.Integer),
+    sa.column('user_id', sa.String),
+    sa.column('date', sa.Date),
+    sa.column('exercise', sa.String),
+    sa.column('category', sa.String),
+    sa.column('weight', sa.Float),
+    sa.column('reps', sa.Integer),
+    sa.column('distance', sa.Float),
+    sa.column('time', sa.String),
+    sa.column('fingerprint', sa.String),
+)
+
+
+def _fingerprint(row, occurrence):
+    # Frozen copy of db.ingest.fingerprints.workout_fingerprint as of this revision
+    def value(v):
+        if v is None:
+            return ''
+        if isinstance(v, float):
+            return repr(v)
+        if hasattr(v, 'isoformat'):
+            return v.isoformat()
+        return str(v).strip()
+
+    parts = [row.user_id] + [value(getattr(row, field)) for field in
+                             ('date', 'exercise', 'category', 'weight', 'reps', 'distance', 'time')]
+    parts.append(str(occurrence))
+    return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+
+def _backfill_fingerprints() -> None:
+    # Existing duplicates keep their rows; repeats are numbered in id order so each gets
+    # a distinct fingerprint and the unique index can be built
+    bind = op.get_bind()
+    seen = Counter()
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(workout_history)
+            .where(workout_history.c.id > last_id)
+            .order_by(workout_history.c.id)
+            .limit(BACKFILL_BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+
+        updates = []
+        for row in rows:
+            key = _fingerprint(row, 0)
+            updates.append({'row_id': row.id, 'fingerprint': _fingerprint(row, seen[key])})
+            seen[key] += 1
+        bind.execute(
+            workout_history.update()
+            .where(workout_history.c.id == sa.bindparam('row_id'))
+            .values(fingerprint=sa.bindparam('fingerprint')),
+            updates
+        )
+        last_id = rows[-1].id
+
+
+def upgrade() -> None:
+    op.add_column('workout_history', sa.Column('fingerprint', sa.String(length=64), nullable=True))
+    _backfill_fingerprints()
+    op.create_unique_constraint('workout_history_fingerprint_key', 'workout_history', ['fingerprint'])
+    op.create_table('workout_uploads',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.String(length=255), nullable=False),
+    sa.Column('file_hash', sa.String(length=64), nullable=False),
+    sa.Column('file_name', sa.String(length=255), nullable=True),
+    sa.Column('records_inserted', sa.Integer(), nullable=False),
+    sa.Column('records_skipped', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'file_hash')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('workout_uploads')
+    op.drop_constraint('workout_history_fingerprint_key', 'workout_history', type_='unique')
+    op.drop_column('workout_history', 'fingerprint')
@@ -0,0 +1,42 @@
+"""Indexes for workout history queries
+
+Revision ID: faf46a412c42
+Revises: 929934aad42c
+Create Date: 2025-06-16 09:27:44.519203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'faf46a412c42'
+down_revision = '929934aad42c'
+branch_labels = None
+depends_on = None
+
+# Name and columns of each index. History is read per user, optionally for one exercise or
+# category, ordered by date and created_at, so each index gives the rows in that order
+# without a sort. Postgres scans them backwards for DESC order.
+INDEXES = [
+    ('ix_workout_history_user_date', ['user_id', 'date', 'created_at']),
+    ('ix_workout_history_user_exercise_date', ['user_id', 'exercise', 'date', 'created_at']),
+    ('ix_workout_history_user_category_date', ['user_id', 'category', 'date', 'created_at']),
+]
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction. Built this way, the table
+    # stays writable while the indexes are built. If a build fails, the index is left
+    # invalid; drop it before running the migration again.
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES:
+            op.create_index(name, 'workout_history', columns,
+                            postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, _ in reversed(INDEXES):
+            op.drop_index(name, table_name='workout_history',
+                          postgresql_concurrently=True, if_exists=True)
@@ -8,6 +8,7 @@ from sqlalchemy.ext.declarative import declarative_base
 Base = declarative_base()
 
 from .user import User
-from .workout import WorkoutHistory
+from .workout import Exercise, ExerciseCategory, WorkoutDailySummary, WorkoutHistory, WorkoutUpload, WorkoutUploadFingerprint
 
-__all__ = ['Base', 'User', 'WorkoutHistory'] 
\ No newline at end of file
+__all__ = ['Base', 'User', 'Exercise', 'ExerciseCategory', 'WorkoutDailySummary', 'WorkoutHistory', 'WorkoutUpload',
+           'WorkoutUploadFingerprint'] 
\ No newline at end of file
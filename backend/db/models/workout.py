@@ -1,18 +1,56 @@
 """
 WorkoutHistory model definition.
 """
-from sqlalchemy import Column, Integer, String, Float, Date, ForeignKey, Text, DateTime
+from sqlalchemy import Column, Integer, BigInteger, String, Float, Date, ForeignKey, Text, DateTime, JSON, Index, UniqueConstraint
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from . import Base  # <-- import the shared Base
 
+class Exercise(Base):
+    """An exercise name, stored once and referred to by id from workout history."""
+    __tablename__ = 'exercises'
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(255), nullable=False, unique=True)
+
+class ExerciseCategory(Base):
+    """A category name, stored once and referred to by id from workout history."""
+    __tablename__ = 'exercise_categories'
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(100), nullable=False, unique=True)
+
 class WorkoutHistory(Base):
     __tablename__ = 'workout_history'
+    # On Postgres the table is partitioned by year of date (see db.maintenance), so its
+    # primary key and fingerprint constraint there also include date
+    # History is always read per user in (date, created_at, id) order, optionally for one
+    # exercise or category
+    __table_args__ = (
+        Index('ix_workout_history_user_date_id', 'user_id', 'date', 'created_at', 'id'),
+        Index('ix_workout_history_user_exercise_date_id', 'user_id', 'exercise_id', 'date', 'created_at', 'id'),
+        Index('ix_workout_history_user_category_date_id', 'user_id', 'category_id', 'date', 'created_at', 'id'),
+    )
+
+    # Columns a workout's owner can read, in the order the API returns them
+    FIELDS = ('id', 'date', 'exercise', 'category', 'weight', 'weight_unit', 'reps',
+              'distance', 'distance_unit', 'time', 'comment', 'created_at')
+    # Columns that place a workout in history order, used as its paging key
+    KEY_FIELDS = ('date', 'created_at', 'id')
+    # Fields a workout's owner can change
+    EDITABLE_FIELDS = ('date', 'exercise', 'category', 'weight', 'weight_unit', 'reps',
+                       'distance', 'distance_unit', 'time', 'comment')
 
     id = Column(Integer, primary_key=True)
     user_id = Column(String(255), ForeignKey('users.user_id'), nullable=False)
     date = Column(Date, nullable=False)
-    exercise = Column(String(255), nullable=False)
-    category = Column(String(100), nullable=False)
+    exercise_id = Column(Integer, ForeignKey('exercises.id'), nullable=False)
+    category_id = Column(Integer, ForeignKey('exercise_categories.id'), nullable=False)
+    # Exercise and category names are joined onto the row when it is loaded; set the ids
+    # to change them. Queries selecting the names as columns join the tables themselves.
+    exercise_row = relationship(Exercise, lazy='joined', innerjoin=True, viewonly=True)
+    category_row = relationship(ExerciseCategory, lazy='joined', innerjoin=True, viewonly=True)
     weight = Column(Float)
     weight_unit = Column(String(10))
     reps = Column(Integer)
@@ -20,5 +58,87 @@ class WorkoutHistory(Base):
     distance_unit = Column(String(10))
     time = Column(String(50))
     comment = Column(Text)
+    # Natural-key fingerprint of rows imported from a file; re-imported rows are skipped
+    fingerprint = Column(String(64), unique=True)
+    # The upload a row was imported from, if any
+    upload_id = Column(Integer, ForeignKey('workout_uploads.id', ondelete='SET NULL'), index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now()) 
+
+    @hybrid_property
+    def exercise(self):
+        return self.exercise_row.name
+
+    @exercise.inplace.expression
+    @classmethod
+    def _exercise_expression(cls):
+        return Exercise.name.label('exercise')
+
+    @hybrid_property
+    def category(self):
+        return self.category_row.name
+
+    @category.inplace.expression
+    @classmethod
+    def _category_expression(cls):
+        return ExerciseCategory.name.label('category')
+
+class WorkoutDailySummary(Base):
+    """
+    Totals of one user's sets of one exercise on one day.
+    Summaries are derived from workout_history and kept up to date by the providers as
+    workouts are written, so analytics read these rows instead of every set.
+    """
+    __tablename__ = 'workout_daily_summaries'
+
+    # Columns the API returns, in order
+    FIELDS = ('date', 'exercise', 'category', 'set_count', 'total_reps', 'total_volume', 'max_weight')
+
+    user_id = Column(String(255), ForeignKey('users.user_id'), primary_key=True)
+    date = Column(Date, primary_key=True)
+    exercise = Column(String(255), primary_key=True)
+    category = Column(String(100), nullable=False)
+    set_count = Column(Integer, nullable=False, default=0)
+    total_reps = Column(Integer, nullable=False, default=0)
+    # Sum of weight x reps over the sets, in the units they were logged in
+    total_volume = Column(Float, nullable=False, default=0)
+    max_weight = Column(Float)
+
+class WorkoutUpload(Base):
+    __tablename__ = 'workout_uploads'
+    __table_args__ = (UniqueConstraint('user_id', 'file_hash'),)
+
+    # Upload statuses; files sent straight to S3 stay pending until they are ingested
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(String(255), ForeignKey('users.user_id'), nullable=False)
+    file_hash = Column(String(64))
+    file_name = Column(String(255))
+    records_inserted = Column(Integer, nullable=False, default=0)
+    records_skipped = Column(Integer, nullable=False, default=0)
+    object_key = Column(String(1024), unique=True)
+    status = Column(String(20), nullable=False, default=COMPLETED, server_default=COMPLETED)
+    # Ingest checkpoint: rows ending before this offset of the file are already stored
+    byte_offset = Column(BigInteger, nullable=False, default=0, server_default='0')
+    # Number of the last row before byte_offset; the header is row 1
+    row_num = Column(Integer, nullable=False, default=0, server_default='0')
+    rows_failed = Column(Integer, nullable=False, default=0, server_default='0')
+    errors = Column(JSON)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now()) 
\ No newline at end of file
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class WorkoutUploadFingerprint(Base):
+    """
+    How many times a row has been seen so far in an upload being ingested from S3.
+    The counts are stored with each checkpoint, so an ingest that resumes part way numbers
+    repeated rows, and so fingerprints them, exactly as a single run would.
+    """
+    __tablename__ = 'workout_upload_fingerprints'
+
+    upload_id = Column(Integer, ForeignKey('workout_uploads.id', ondelete='CASCADE'), primary_key=True)
+    fingerprint = Column(String(64), primary_key=True)
+    count = Column(Integer, nullable=False)
@@ -0,0 +1,43 @@
+"""
+Keyset pagination for workout history.
+A page ends at a workout's position in history order, (date, created_at, id), and the next
+page starts just after it. The position is handed to clients as an opaque cursor string.
+"""
+import base64
+import json
+from datetime import date, datetime
+from typing import Tuple
+
+WorkoutKey = Tuple[date, datetime, int]
+
+def encode_workout_cursor(workout) -> str:
+    """
+    Encode the cursor for the page that follows a workout.
+
+    Args:
+        workout: The last workout record of a page
+
+    Returns:
+        str: A URL-safe cursor string
+    """
+    key = [workout.date.isoformat(), workout.created_at.isoformat(), workout.id]
+    return base64.urlsafe_b64encode(json.dumps(key).encode('utf-8')).decode('ascii')
+
+def decode_workout_cursor(cursor: str) -> WorkoutKey:
+    """
+    Decode a cursor made by ``encode_workout_cursor``.
+
+    Args:
+        cursor (str): The cursor string
+
+    Returns:
+        WorkoutKey: The date, created_at and id of the workout the cursor follows
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        workout_date, created_at, workout_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return date.fromisoformat(workout_date), datetime.fromisoformat(created_at), int(workout_id)
+    except (ValueError, TypeError, UnicodeEncodeError):
+        raise ValueError("Invalid cursor")
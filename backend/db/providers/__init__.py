@@ -2,6 +2,6 @@
 Database providers package for SwolePT backend.
 This package provides database provider implementations and factory.
 """
-from .database_provider_factory import get_provider
+from .database_provider_factory import get_provider, remove_provider_session
 
-__all__ = ['get_provider'] 
\ No newline at end of file
+__all__ = ['get_provider', 'remove_provider_session'] 
\ No newline at end of file
@@ -1,16 +1,335 @@
+import functools
+import itertools
+import os
+import threading
+import time
 from abc import ABC, abstractmethod
-from typing import List, Optional, Dict, Any
+from collections import Counter
+from typing import List, Optional, Dict, Any, BinaryIO, Iterable, Callable, Tuple
 from datetime import datetime, date, timedelta
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy import (Executable, Row, Select, bindparam, create_engine, delete, func, select,
+                        true, tuple_, update)
+from sqlalchemy.orm import Session, sessionmaker, scoped_session
+from sqlalchemy.types import Integer
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError, OperationalError
 from werkzeug.security import check_password_hash
-import csv
-from io import StringIO
+from io import BytesIO
 
+from ..dimensions import NameInterner, insert_ignoring_conflicts, insert_updating_conflicts
+from ..ingest import get_parser
+from ..ingest.compression import open_decompressed
+from ..ingest.fingerprints import FINGERPRINT_FIELDS, RowFingerprinter, file_fingerprint, workout_fingerprint
+from ..ingest.parallel import iter_parallel_batches
+from ..ingest.workout_csv import CsvValidationError, RowErrorReport
 from ..models.user import User
-from ..models.workout import WorkoutHistory
+from ..models.workout import (Exercise, ExerciseCategory, WorkoutDailySummary, WorkoutHistory, WorkoutUpload,
+                              WorkoutUploadFingerprint)
+from ..pagination import WorkoutKey
+
+# Number of rows written per multi-row INSERT statement during bulk ingest
+BULK_INSERT_BATCH_SIZE = 1000
+
+# Seconds after a user's write during which their reads skip the replicas
+DEFAULT_READ_YOUR_WRITES_SECONDS = 10
+
+# Connection modes, chosen with DATABASE_CONNECTION_MODE
+POOLED = 'pooled'
+SERVERLESS = 'serverless'
+
+# Seconds a serverless connection is kept before it is replaced; connections idle for
+# longer are often closed by proxies and NAT gateways while the container is frozen
+SERVERLESS_POOL_RECYCLE = 300
+
+def get_connection_mode() -> str:
+    """
+    Get how the providers manage connections, from DATABASE_CONNECTION_MODE.
+
+    ``pooled`` keeps a pool of connections for a long-running, multi-threaded server.
+    ``serverless`` keeps a single connection per process, for AWS Lambda, where each
+    container handles one request at a time and hundreds of containers may run at once.
+    Defaults to serverless inside Lambda and pooled elsewhere.
+    """
+    default = SERVERLESS if os.getenv('AWS_LAMBDA_FUNCTION_NAME') else POOLED
+    mode = os.getenv('DATABASE_CONNECTION_MODE', default).lower()
+    if mode not in (POOLED, SERVERLESS):
+        raise ValueError(f"DATABASE_CONNECTION_MODE must be {POOLED} or {SERVERLESS}")
+    return mode
+
+def get_pool_options() -> Dict[str, Any]:
+    """Get the connection pool settings for the connection mode."""
+    if get_connection_mode() == SERVERLESS:
+        # The connection is reused across warm invocations, and checked before each use in
+        # case it was dropped while the container was frozen
+        return {
+            'pool_size': 1,
+            'max_overflow': 0,
+            'pool_timeout': 30,
+            'pool_recycle': SERVERLESS_POOL_RECYCLE,
+            'pool_pre_ping': True
+        }
+    return {
+        'pool_size': 5,
+        'max_overflow': 10,
+        'pool_timeout': 30,
+        'pool_recycle': 1800
+    }
+
+def workout_history_filters(user_id: str,
+                            start_date: Optional[date] = None,
+                            end_date: Optional[date] = None,
+                            exercise: Optional[str] = None,
+                            category: Optional[str] = None) -> List[Any]:
+    """Build the WHERE conditions that pick a user's workouts, with optional filters."""
+    conditions = [WorkoutHistory.user_id == user_id]
+    if start_date:
+        conditions.append(WorkoutHistory.date >= start_date)
+    if end_date:
+        conditions.append(WorkoutHistory.date <= end_date)
+    # Names are resolved to ids once, so rows are filtered by integer on the index
+    if exercise:
+        conditions.append(WorkoutHistory.exercise_id ==
+                          select(Exercise.id).where(Exercise.name == exercise).scalar_subquery())
+    if category:
+        conditions.append(WorkoutHistory.category_id ==
+                          select(ExerciseCategory.id).where(ExerciseCategory.name == category).scalar_subquery())
+    return conditions
+
+@functools.lru_cache(maxsize=256)
+def _workout_history_statement(fields: Optional[Tuple[str, ...]], start_date: bool, end_date: bool,
+                               exercise: bool, category: bool, limit: bool, after: bool) -> Select:
+    """
+    Build the SELECT for one shape of workout history query, with every value a bound parameter.
+    
+    The flags say which filters are present. A statement is built once per shape and then
+    reused, so SQLAlchemy finds its compiled form in its cache without the statement being
+    rebuilt and its cache key worked out again on every call.
+    """
+    entities = [getattr(WorkoutHistory, field) for field in fields] if fields else [WorkoutHistory]
+    stmt = select(*entities).select_from(WorkoutHistory)
+    # Whole records join the names on themselves; projections join them when they are asked for
+    if fields and 'exercise' in fields:
+        stmt = stmt.join(Exercise, Exercise.id == WorkoutHistory.exercise_id)
+    if fields and 'category' in fields:
+        stmt = stmt.join(ExerciseCategory, ExerciseCategory.id == WorkoutHistory.category_id)
+    stmt = stmt.where(WorkoutHistory.user_id == bindparam('user_id'))
+    if start_date:
+        stmt = stmt.where(WorkoutHistory.date >= bindparam('start_date'))
+    if end_date:
+        stmt = stmt.where(WorkoutHistory.date <= bindparam('end_date'))
+    # Names are resolved to ids once, so rows are filtered by integer on the index
+    if exercise:
+        stmt = stmt.where(WorkoutHistory.exercise_id ==
+                          select(Exercise.id).where(Exercise.name == bindparam('exercise')).scalar_subquery())
+    if category:
+        stmt = stmt.where(WorkoutHistory.category_id ==
+                          select(ExerciseCategory.id).where(ExerciseCategory.name == bindparam('category')).scalar_subquery())
+    
+    if after:
+        # Seek past the previous page instead of counting rows with OFFSET
+        key = [getattr(WorkoutHistory, field) for field in WorkoutHistory.KEY_FIELDS]
+        stmt = stmt.where(tuple_(*key) < tuple_(*[
+            bindparam(f'after_{column.key}', type_=column.type) for column in key
+        ]))
+    
+    stmt = stmt.order_by(WorkoutHistory.date.desc(), 
+                         WorkoutHistory.created_at.desc(),
+                         WorkoutHistory.id.desc())
+    if limit:
+        stmt = stmt.limit(bindparam('limit', type_=Integer))
+    return stmt
+
+def select_workout_history(fields: Optional[Iterable[str]], user_id: str,
+                           start_date: Optional[date] = None,
+                           end_date: Optional[date] = None,
+                           exercise: Optional[str] = None,
+                           category: Optional[str] = None,
+                           limit: Optional[int] = None,
+                           after: Optional[WorkoutKey] = None) -> Tuple[Select, Dict[str, Any]]:
+    """
+    Get the SELECT of a user's workout history with optional filters, newest first, and
+    the parameters to execute it with.
+    
+    Args:
+        fields (Optional[Iterable[str]]): Columns to load, as for ``workout_columns``; whole
+            WorkoutHistory records if None
+    
+    Raises:
+        ValueError: If a field is not in WorkoutHistory.FIELDS
+    """
+    if fields is not None:
+        fields = tuple(column.key for column in workout_columns(fields))
+    stmt = _workout_history_statement(fields, bool(start_date), bool(end_date), bool(exercise),
+                                      bool(category), bool(limit), bool(after))
+    
+    filters = {'start_date': start_date, 'end_date': end_date, 'exercise': exercise,
+               'category': category, 'limit': limit}
+    params = {'user_id': user_id, **{name: value for name, value in filters.items() if value}}
+    if after:
+        params.update(zip([f'after_{field}' for field in WorkoutHistory.KEY_FIELDS], after))
+    return stmt, params
+
+@functools.lru_cache(maxsize=None)
+def select_user_by(column: str) -> Select:
+    """Build the SELECT of the user whose value in a unique column is the ``value`` parameter."""
+    return select(User).where(getattr(User, column) == bindparam('value')).limit(1)
+
+def workout_columns(fields: Optional[Iterable[str]] = None) -> List[Any]:
+    """
+    Get the WorkoutHistory columns to load for a projection, adding the paging key columns.
+    
+    Raises:
+        ValueError: If a field is not in WorkoutHistory.FIELDS
+    """
+    fields = list(fields) if fields else list(WorkoutHistory.FIELDS)
+    unknown = [field for field in fields if field not in WorkoutHistory.FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return [getattr(WorkoutHistory, field) for field in WorkoutHistory.FIELDS
+            if field in fields or field in WorkoutHistory.KEY_FIELDS]
+
+def refresh_workout_fingerprints(session: Session, record_ids: Iterable[int]) -> None:
+    """
+    Recompute the fingerprints of imported workouts after their values change, in the
+    session's transaction.
+
+    The fingerprint then still describes the row, so uploading the corrected file again
+    skips the row instead of adding a copy. Repeats of the new values are numbered after
+    the rows that already have them. Workouts entered by hand have no fingerprint and are
+    left without one.
+    """
+    rows = session.execute(
+        select(WorkoutHistory.id, WorkoutHistory.user_id, WorkoutHistory.date,
+               Exercise.name.label('exercise'), ExerciseCategory.name.label('category'),
+               WorkoutHistory.weight, WorkoutHistory.reps, WorkoutHistory.distance, WorkoutHistory.time)
+        .join(Exercise, Exercise.id == WorkoutHistory.exercise_id)
+        .join(ExerciseCategory, ExerciseCategory.id == WorkoutHistory.category_id)
+        .where(WorkoutHistory.id.in_(list(record_ids)), WorkoutHistory.fingerprint.isnot(None))
+        .order_by(WorkoutHistory.id)
+    ).all()
+    if not rows:
+        return
+    
+    # Cleared first, so the rows can take each other's old fingerprints
+    session.execute(
+        update(WorkoutHistory).where(WorkoutHistory.id.in_([row.id for row in rows])).values(fingerprint=None)
+        .execution_options(synchronize_session=False)
+    )
+    
+    keys = [workout_fingerprint(row.user_id, row._mapping) for row in rows]
+    needed = Counter(keys)
+    examples = dict(zip(keys, rows))
+    free = {key: [] for key in needed}
+    next_occurrence = dict.fromkeys(needed, 0)
+    while True:
+        candidates = {}
+        for key, count in needed.items():
+            start = next_occurrence[key]
+            next_occurrence[key] = start + count - len(free[key])
+            row = examples[key]
+            for occurrence in range(start, next_occurrence[key]):
+                candidates[workout_fingerprint(row.user_id, row._mapping, occurrence)] = key
+        if not candidates:
+            break
+        taken = set(session.execute(
+            select(WorkoutHistory.fingerprint).where(WorkoutHistory.fingerprint.in_(list(candidates)))
+        ).scalars())
+        for fingerprint, key in candidates.items():
+            if fingerprint not in taken:
+                free[key].append(fingerprint)
+    
+    table = WorkoutHistory.__table__
+    session.execute(
+        update(table).where(table.c.id == bindparam('record_id')).values(fingerprint=bindparam('new_fingerprint')),
+        [{'record_id': row.id, 'new_fingerprint': free[key].pop(0)} for row, key in zip(rows, keys)]
+    )
+
+# Summary columns recomputed from workout_history, after the (user_id, date, exercise) key
+SUMMARY_TOTAL_COLUMNS = ('category', 'set_count', 'total_reps', 'total_volume', 'max_weight')
+
+def daily_summary_statements(user_id: Optional[str] = None,
+                             dates: Optional[Iterable[date]] = None,
+                             exercises: Optional[Iterable[str]] = None,
+                             dialect_name: str = 'postgresql') -> List[Executable]:
+    """
+    Build the statements that recompute daily summaries from workout_history.
+
+    Summaries matching every given filter are recomputed, and those whose workouts are
+    all gone are deleted, so running the statements after workouts are added, changed or
+    removed brings those summaries up to date. Without filters, every summary is rebuilt.
+
+    Recomputed totals are upserted, so two transactions refreshing the same summary do
+    not collide on its key. On Postgres, a user's refreshes also take a lock on the user
+    for the rest of the transaction. The second refresh then waits for the first to
+    commit and counts its workouts too, instead of overwriting the summary with totals
+    read before that commit.
+    """
+    def matching(user_column, date_column, exercise_column):
+        conditions = []
+        if user_id is not None:
+            conditions.append(user_column == user_id)
+        if dates is not None:
+            conditions.append(date_column.in_(sorted(set(dates))))
+        if exercises is not None:
+            conditions.append(exercise_column.in_(sorted(set(exercises))))
+        return conditions
+
+    totals = select(
+        WorkoutHistory.user_id,
+        WorkoutHistory.date,
+        Exercise.name,
+        func.min(ExerciseCategory.name),
+        func.count(),
+        func.coalesce(func.sum(WorkoutHistory.reps), 0),
+        func.coalesce(func.sum(WorkoutHistory.weight * WorkoutHistory.reps), 0),
+        func.max(WorkoutHistory.weight)
+    ).select_from(WorkoutHistory).join(
+        Exercise, Exercise.id == WorkoutHistory.exercise_id
+    ).join(
+        ExerciseCategory, ExerciseCategory.id == WorkoutHistory.category_id
+    ).where(
+        # SQLite needs a WHERE clause to parse INSERT ... SELECT ... ON CONFLICT
+        true(), *matching(WorkoutHistory.user_id, WorkoutHistory.date, Exercise.name)
+    ).group_by(WorkoutHistory.user_id, WorkoutHistory.date, Exercise.name)
+
+    has_workouts = select(WorkoutHistory.id).join(
+        Exercise, Exercise.id == WorkoutHistory.exercise_id
+    ).where(
+        WorkoutHistory.user_id == WorkoutDailySummary.user_id,
+        WorkoutHistory.date == WorkoutDailySummary.date,
+        Exercise.name == WorkoutDailySummary.exercise
+    ).exists()
+
+    statements = []
+    if dialect_name == 'postgresql' and user_id is not None:
+        statements.append(select(func.pg_advisory_xact_lock(func.hashtext(user_id))))
+    statements += [
+        delete(WorkoutDailySummary).where(
+            *matching(WorkoutDailySummary.user_id, WorkoutDailySummary.date, WorkoutDailySummary.exercise),
+            ~has_workouts
+        ),
+        insert_updating_conflicts(
+            dialect_name, WorkoutDailySummary, ('user_id', 'date', 'exercise'), SUMMARY_TOTAL_COLUMNS
+        ).from_select(['user_id', 'date', 'exercise', *SUMMARY_TOTAL_COLUMNS], totals)
+    ]
+    return statements
+
+def select_daily_summaries(user_id: str,
+                           start_date: Optional[date] = None,
+                           end_date: Optional[date] = None,
+                           exercise: Optional[str] = None,
+                           category: Optional[str] = None) -> Select:
+    """Build a SELECT of a user's daily summaries with optional filters, newest first."""
+    stmt = select(WorkoutDailySummary).where(WorkoutDailySummary.user_id == user_id)
+    if start_date:
+        stmt = stmt.where(WorkoutDailySummary.date >= start_date)
+    if end_date:
+        stmt = stmt.where(WorkoutDailySummary.date <= end_date)
+    if exercise:
+        stmt = stmt.where(WorkoutDailySummary.exercise == exercise)
+    if category:
+        stmt = stmt.where(WorkoutDailySummary.category == category)
+    return stmt.order_by(WorkoutDailySummary.date.desc(), WorkoutDailySummary.exercise)
 
 class DatabaseProvider(ABC):
     """Abstract base class for database providers."""
@@ -19,7 +338,19 @@ class DatabaseProvider(ABC):
         """Initialize the database provider."""
         self._engine = None
         self._session_factory = None
-        self._session: Optional[Session] = None
+        # A registry that gives each thread its own session, so concurrent requests never
+        # share a transaction; it proxies Session methods to the current thread's session
+        self._session: Optional[scoped_session] = None
+        # Read replicas, if any, and a registry of per-thread sessions on them
+        self._replica_engines = []
+        self._replica_session: Optional[scoped_session] = None
+        self._replica_cycle = None
+        # Users who wrote recently, mapped to when their reads may use a replica again
+        self._recent_writers: Dict[str, float] = {}
+        self._recent_writers_lock = threading.Lock()
+        # Ids of exercise and category names, which workout history stores instead of the names
+        self._exercises = NameInterner(Exercise)
+        self._categories = NameInterner(ExerciseCategory)
         self._base = declarative_base()
     
     @abstractmethod
@@ -27,33 +358,104 @@ class DatabaseProvider(ABC):
         """Get the database connection URL."""
         pass
     
+    def get_replica_urls(self) -> List[str]:
+        """
+        Get the connection URLs of read replicas, from the comma-separated
+        DATABASE_REPLICA_URLS environment variable. Without replicas, everything is read
+        from the primary.
+        """
+        urls = os.getenv('DATABASE_REPLICA_URLS', '')
+        return [url.strip() for url in urls.split(',') if url.strip()]
+    
+    def get_engine_options(self) -> Dict[str, Any]:
+        """
+        Get the connection pool settings of each engine (see get_connection_mode).
+        psycopg2 never prepares statements on the server, so the same settings work through
+        a transaction-pooling proxy such as pgbouncer or RDS Proxy.
+        """
+        return get_pool_options()
+    
     def connect(self) -> None:
-        """Establish a connection to the database."""
+        """
+        Set up the engines and sessions.
+        No connection is opened until the first query needs one.
+        """
         if self._engine is None:
             connection_url = self.get_connection_url()
-            self._engine = create_engine(
-                connection_url,
-                pool_size=5,
-                max_overflow=10,
-                pool_timeout=30,
-                pool_recycle=1800
-            )
+            self._engine = create_engine(connection_url, **self.get_engine_options())
             self._session_factory = sessionmaker(
                 autocommit=False,
                 autoflush=False,
                 bind=self._engine
             )
-            self._session = self._session_factory()
+            self._session = scoped_session(self._session_factory)
+            
+            self._replica_engines = [create_engine(url, **self.get_engine_options())
+                                     for url in self.get_replica_urls()]
+            if self._replica_engines:
+                # Each thread's replica session is bound to the next replica in turn
+                self._replica_cycle = itertools.cycle(self._replica_engines)
+                self._replica_session = scoped_session(
+                    lambda: self._session_factory(bind=next(self._replica_cycle))
+                )
+    
+    def remove_session(self) -> None:
+        """
+        End the current thread's session, returning its connection to the pool.
+        Call this when a request or other unit of work is finished; the next use of the
+        provider on the thread starts a new session.
+        """
+        if self._session is not None:
+            self._session.remove()
+        if self._replica_session is not None:
+            self._replica_session.remove()
     
     def disconnect(self) -> None:
         """Close the database connection."""
         if self._session is not None:
-            self._session.close()
+            self._session.remove()
             self._session = None
+        if self._replica_session is not None:
+            self._replica_session.remove()
+            self._replica_session = None
+        for engine in self._replica_engines:
+            engine.dispose()
+        self._replica_engines = []
         if self._engine is not None:
             self._engine.dispose()
             self._engine = None
     
+    def _record_write(self, user_id: str) -> None:
+        """
+        Note that a user's data changed, so their reads go to the primary for the
+        read-your-writes window (DATABASE_READ_YOUR_WRITES_SECONDS, default 10), while the
+        replicas catch up.
+        """
+        if self._replica_session is None:
+            return
+        window = float(os.getenv('DATABASE_READ_YOUR_WRITES_SECONDS', DEFAULT_READ_YOUR_WRITES_SECONDS))
+        with self._recent_writers_lock:
+            now = time.monotonic()
+            # Forget writers whose window has passed, so the map stays small
+            for writer in [writer for writer, until in self._recent_writers.items() if until <= now]:
+                del self._recent_writers[writer]
+            self._recent_writers[user_id] = now + window
+    
+    def _read_session(self, user_id: Optional[str] = None, use_primary: bool = False):
+        """
+        Get the session to run a read-only query on.
+        
+        Reads go to a replica when there is one, unless the caller needs the primary or the
+        user wrote within the read-your-writes window.
+        """
+        if self._replica_session is None or use_primary:
+            return self._session
+        if user_id is not None:
+            with self._recent_writers_lock:
+                if self._recent_writers.get(user_id, 0) > time.monotonic():
+                    return self._session
+        return self._replica_session
+    
     def init_db(self) -> None:
         """Initialize the database."""
         if self._engine is None:
@@ -113,6 +515,7 @@ class DatabaseProvider(ABC):
             self._session.add(user)
             self._session.commit()  # Commit the transaction
             self._session.refresh(user)
+            self._record_write(user.user_id)
             return user
                 
         except IntegrityError as e:
@@ -132,25 +535,29 @@ class DatabaseProvider(ABC):
             self._session.rollback()
             raise RuntimeError(f"Unexpected error creating user: {str(e)}")
     
-    def get_user_by_email(self, email: str) -> Optional[User]:
-        """Get a user by their email address."""
+    def _get_user(self, column: str, value: str, use_primary: bool) -> Optional[User]:
+        """Get the user with a value in a unique column, reading from a replica when possible."""
         if not self._session:
             raise RuntimeError("Database not connected")
         
         try:
-            return self._session.query(User).filter(User.email == email).first()
+            stmt = select_user_by(column)
+            session = self._read_session(use_primary=use_primary)
+            user = session.execute(stmt, {'value': value}).scalars().first()
+            if user is None and session is not self._session:
+                # A user who has just registered may not have reached the replica yet
+                user = self._session.execute(stmt, {'value': value}).scalars().first()
+            return user
         except SQLAlchemyError as e:
             raise RuntimeError("Failed to get user")
     
-    def get_user_by_username(self, username: str) -> Optional[User]:
+    def get_user_by_email(self, email: str, use_primary: bool = False) -> Optional[User]:
+        """Get a user by their email address."""
+        return self._get_user('email', email, use_primary)
+    
+    def get_user_by_username(self, username: str, use_primary: bool = False) -> Optional[User]:
         """Get a user by their username."""
-        if not self._session:
-            raise RuntimeError("Database not connected")
-        
-        try:
-            return self._session.query(User).filter(User.username == username).first()
-        except SQLAlchemyError as e:
-            raise RuntimeError("Failed to get user")
+        return self._get_user('username', username, use_primary)
     
     def verify_password(self, password: str, password_hash: str) -> bool:
         """Verify a user's password against its hash."""
@@ -160,30 +567,160 @@ class DatabaseProvider(ABC):
                           start_date: Optional[date] = None,
                           end_date: Optional[date] = None,
                           exercise: Optional[str] = None,
-                          category: Optional[str] = None) -> List[WorkoutHistory]:
-        """Get workout records for a user with optional filters."""
+                          category: Optional[str] = None,
+                          limit: Optional[int] = None,
+                          after: Optional[WorkoutKey] = None,
+                          use_primary: bool = False) -> List[WorkoutHistory]:
+        """
+        Get workout records for a user with optional filters, newest first.
+        
+        Records are ordered by (date, created_at, id), so they can be read a page at a time:
+        pass the key of the last record of one page as ``after`` to get the next. They are
+        read from a replica when there is one, unless the user wrote recently.
+        
+        Args:
+            user_id (str): The user's ID
+            start_date (Optional[date]): Earliest workout date to include
+            end_date (Optional[date]): Latest workout date to include
+            exercise (Optional[str]): Only include this exercise
+            category (Optional[str]): Only include this category
+            limit (Optional[int]): Maximum number of records to return
+            after (Optional[WorkoutKey]): The (date, created_at, id) of the record to start after
+            use_primary (bool): Read from the primary even if there are replicas, to see
+                every write made so far
+            
+        Returns:
+            List[WorkoutHistory]: The matching records
+        """
         if not self._session:
             raise RuntimeError("Database not connected")
         
         try:
-            query = self._session.query(WorkoutHistory).filter(WorkoutHistory.user_id == user_id)
-            
-            if start_date:
-                query = query.filter(WorkoutHistory.date >= start_date)
-            if end_date:
-                query = query.filter(WorkoutHistory.date <= end_date)
-            if exercise:
-                query = query.filter(WorkoutHistory.exercise == exercise)
-            if category:
-                query = query.filter(WorkoutHistory.category == category)
-            
-            records = query.order_by(WorkoutHistory.date.desc(), 
-                                   WorkoutHistory.created_at.desc()).all()
+            stmt, params = select_workout_history(None, user_id, start_date, end_date,
+                                                  exercise, category, limit, after)
+            records = self._read_session(user_id, use_primary).execute(stmt, params).scalars().all()
             return records
                                 
         except SQLAlchemyError as e:
             raise RuntimeError("Failed to get workout records")
     
+    def get_workout_rows(self, user_id: str,
+                         fields: Optional[Iterable[str]] = None,
+                         start_date: Optional[date] = None,
+                         end_date: Optional[date] = None,
+                         exercise: Optional[str] = None,
+                         category: Optional[str] = None,
+                         limit: Optional[int] = None,
+                         after: Optional[WorkoutKey] = None,
+                         use_primary: bool = False) -> List[Row]:
+        """
+        Get selected columns of a user's workout history as plain rows, for read-only listing.
+        
+        Filtering, order, paging and routing to replicas are the same as
+        ``get_workout_records``, but only the requested columns are loaded, into lightweight
+        named tuples that the session does not track. The id, date and created_at columns are
+        always included, so the last row of a page can be used as the key for the next.
+        
+        Args:
+            user_id (str): The user's ID
+            fields (Optional[Iterable[str]]): Names of the columns to load, from
+                WorkoutHistory.FIELDS; all of them if not given
+            start_date (Optional[date]): Earliest workout date to include
+            end_date (Optional[date]): Latest workout date to include
+            exercise (Optional[str]): Only include this exercise
+            category (Optional[str]): Only include this category
+            limit (Optional[int]): Maximum number of rows to return
+            after (Optional[WorkoutKey]): The (date, created_at, id) of the row to start after
+            use_primary (bool): Read from the primary even if there are replicas
+            
+        Returns:
+            List[Row]: The matching rows, with an attribute per loaded column
+            
+        Raises:
+            ValueError: If a field is not in WorkoutHistory.FIELDS
+        """
+        if not self._session:
+            raise RuntimeError("Database not connected")
+        
+        stmt, params = select_workout_history(fields or WorkoutHistory.FIELDS, user_id, start_date,
+                                              end_date, exercise, category, limit, after)
+        
+        try:
+            rows = self._read_session(user_id, use_primary).execute(stmt, params).all()
+            return rows
+        
+        except SQLAlchemyError as e:
+            raise RuntimeError("Failed to get workout records")
+    
+    def get_daily_summaries(self, user_id: str,
+                            start_date: Optional[date] = None,
+                            end_date: Optional[date] = None,
+                            exercise: Optional[str] = None,
+                            category: Optional[str] = None,
+                            use_primary: bool = False) -> List[WorkoutDailySummary]:
+        """
+        Get a user's per-day, per-exercise workout totals, newest first.
+        
+        Summaries are read from a replica when there is one, unless the user wrote recently.
+        
+        Args:
+            user_id (str): The user's ID
+            start_date (Optional[date]): Earliest day to include
+            end_date (Optional[date]): Latest day to include
+            exercise (Optional[str]): Only include this exercise
+            category (Optional[str]): Only include this category
+            use_primary (bool): Read from the primary even if there are replicas
+            
+        Returns:
+            List[WorkoutDailySummary]: The matching summaries
+        """
+        if not self._session:
+            raise RuntimeError("Database not connected")
+        
+        try:
+            stmt = select_daily_summaries(user_id, start_date, end_date, exercise, category)
+            return self._read_session(user_id, use_primary).execute(stmt).scalars().all()
+        
+        except SQLAlchemyError as e:
+            raise RuntimeError("Failed to get workout summaries")
+    
+    def _refresh_daily_summaries(self, user_id: str, dates: Iterable[date],
+                                 exercises: Iterable[str]) -> None:
+        """Recompute a user's summaries for the given days and exercises, in the current transaction."""
+        for stmt in daily_summary_statements(user_id, dates, exercises, self._engine.dialect.name):
+            self._session.execute(stmt)
+    
+    def rebuild_daily_summaries(self, user_id: Optional[str] = None) -> int:
+        """
+        Recompute daily summaries from the full workout history.
+        
+        Summaries are normally kept up to date as workouts are written; this repairs them,
+        and fills them in for workouts written some other way.
+        
+        Args:
+            user_id (Optional[str]): Only rebuild this user's summaries
+            
+        Returns:
+            int: Number of summaries written
+            
+        Raises:
+            RuntimeError: If database is not connected or the rebuild fails
+        """
+        if not self._session:
+            raise RuntimeError("Database not connected")
+        
+        try:
+            *remove, rebuild = daily_summary_statements(user_id, dialect_name=self._engine.dialect.name)
+            for stmt in remove:
+                self._session.execute(stmt)
+            written = self._session.execute(rebuild).rowcount
+            self._session.commit()
+            return written
+        
+        except SQLAlchemyError as e:
+            self._session.rollback()
+            raise RuntimeError("Failed to rebuild workout summaries")
+    
     @abstractmethod
     def create_workout_record(self, user_id: str, workout_data: Dict[str, Any]) -> WorkoutHistory:
         """Create a new workout record."""
@@ -199,150 +736,729 @@ class DatabaseProvider(ABC):
         """Delete a workout record."""
         pass
     
-    def process_workout_csv(self, user_id: str, csv_content: str) -> List[Dict[str, Any]]:
+    def _bulk_filters(self, user_id: str, ids: Optional[Iterable[int]],
+                      start_date: Optional[date], end_date: Optional[date],
+                      exercise: Optional[str], category: Optional[str],
+                      upload_id: Optional[int]) -> List[Any]:
+        """Build the WHERE conditions of a bulk update or delete, always scoped to the user."""
+        if ids is None and not any((start_date, end_date, exercise, category, upload_id)):
+            raise ValueError("Record ids or a filter are required")
+        
+        conditions = workout_history_filters(user_id, start_date, end_date, exercise, category)
+        if ids is not None:
+            conditions.append(WorkoutHistory.id.in_(list(ids)))
+        if upload_id is not None:
+            conditions.append(WorkoutHistory.upload_id == upload_id)
+        return conditions
+    
+    def _workout_changes(self, changes: Dict[str, Any]) -> Dict[str, Any]:
+        """Validate the changes of a bulk update and turn them into column values."""
+        if not changes:
+            raise ValueError("No changes given")
+        unknown = [field for field in changes if field not in WorkoutHistory.EDITABLE_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        if 'date' in changes and not isinstance(changes['date'], (datetime, date)):
+            raise ValueError("Date must be a datetime or date object")
+        for field in ('exercise', 'category'):
+            if field in changes and (not isinstance(changes[field], str) or not changes[field]):
+                raise ValueError(f"{field.capitalize()} must be a non-empty string")
+        for field, types in (('weight', (int, float)), ('reps', (int,)), ('distance', (int, float))):
+            value = changes.get(field)
+            if value is not None and (isinstance(value, bool) or not isinstance(value, types)):
+                raise ValueError(f"{field.capitalize()} must be a {'whole ' if field == 'reps' else ''}number")
+        for field, column in (('exercise', Exercise.name), ('category', ExerciseCategory.name),
+                              ('weight_unit', WorkoutHistory.weight_unit),
+                              ('distance_unit', WorkoutHistory.distance_unit),
+                              ('time', WorkoutHistory.time), ('comment', WorkoutHistory.comment)):
+            value = changes.get(field)
+            if value is None:
+                continue
+            if not isinstance(value, str):
+                raise ValueError(f"{field.capitalize()} must be a string")
+            max_length = getattr(column.type, 'length', None)
+            if max_length is not None and len(value) > max_length:
+                raise ValueError(f"{field.capitalize()} must be at most {max_length} characters")
+        
+        values = {field: value for field, value in changes.items() if field not in ('exercise', 'category')}
+        if 'exercise' in changes:
+            values['exercise_id'] = self._exercises.id(self._session, changes['exercise'])
+        if 'category' in changes:
+            values['category_id'] = self._categories.id(self._session, changes['category'])
+        values['updated_at'] = func.now()
+        return values
+    
+    def _refresh_summaries_of(self, user_id: str, keys: Iterable[Row]) -> None:
+        """Recompute a user's summaries for (date, exercise_id) pairs, in the current transaction."""
+        keys = list(keys)
+        if not keys:
+            return
+        exercise_ids = {exercise_id for _, exercise_id in keys}
+        exercises = self._session.execute(select(Exercise.name).where(Exercise.id.in_(exercise_ids))).scalars()
+        self._refresh_daily_summaries(user_id, {workout_date for workout_date, _ in keys}, set(exercises))
+    
+    def update_workout_records(self, user_id: str, changes: Dict[str, Any],
+                               ids: Optional[Iterable[int]] = None,
+                               start_date: Optional[date] = None,
+                               end_date: Optional[date] = None,
+                               exercise: Optional[str] = None,
+                               category: Optional[str] = None,
+                               upload_id: Optional[int] = None) -> int:
+        """
+        Make the same changes to many of a user's workout records with one UPDATE statement.
+        
+        Records are picked by id, by filters, or both, and only the user's own records are
+        changed, whatever ids are given. The daily summaries of the records' days, before
+        and after the change, and the fingerprints of imported records are updated in the
+        same transaction.
+        
+        Args:
+            user_id (str): The ID of the user who owns the records
+            changes (Dict[str, Any]): New values, by field name from WorkoutHistory.EDITABLE_FIELDS
+            ids (Optional[Iterable[int]]): Only change these records
+            start_date (Optional[date]): Only change records on or after this date
+            end_date (Optional[date]): Only change records on or before this date
+            exercise (Optional[str]): Only change records of this exercise
+            category (Optional[str]): Only change records of this category
+            upload_id (Optional[int]): Only change records imported by this upload
+            
+        Returns:
+            int: Number of records changed
+            
+        Raises:
+            ValueError: If neither ids nor a filter is given, or a change is invalid
+            RuntimeError: If database is not connected or the update fails
+        """
+        if not self._session:
+            raise RuntimeError("Database not connected")
+        
+        conditions = self._bulk_filters(user_id, ids, start_date, end_date, exercise, category, upload_id)
+        try:
+            values = self._workout_changes(changes)
+            
+            # Records moving to another day or exercise leave their old summaries too
+            before = []
+            if 'date' in values or 'exercise_id' in values:
+                before = self._session.execute(
+                    select(WorkoutHistory.date, WorkoutHistory.exercise_id).where(*conditions).distinct()
+                ).all()
+            after = self._session.execute(
+                update(WorkoutHistory).where(*conditions).values(**values)
+                .returning(WorkoutHistory.id, WorkoutHistory.date, WorkoutHistory.exercise_id)
+                .execution_options(synchronize_session=False)
+            ).all()
+            
+            if any(field in changes for field in FINGERPRINT_FIELDS):
+                refresh_workout_fingerprints(self._session, [record_id for record_id, _, _ in after])
+            self._refresh_summaries_of(user_id, set(before) | {(workout_date, exercise_id)
+                                                              for _, workout_date, exercise_id in after})
+            self._session.commit()
+            self._record_write(user_id)
+            return len(after)
+                
+        except IntegrityError as e:
+            self._session.rollback()
+            raise ValueError("Failed to update workout records")
+        except OperationalError as e:
+            self._session.rollback()
+            raise RuntimeError("Database operation failed")
+        except SQLAlchemyError as e:
+            self._session.rollback()
+            raise RuntimeError("Failed to update workout records")
+    
+    def delete_workout_records(self, user_id: str,
+                               ids: Optional[Iterable[int]] = None,
+                               start_date: Optional[date] = None,
+                               end_date: Optional[date] = None,
+                               exercise: Optional[str] = None,
+                               category: Optional[str] = None,
+                               upload_id: Optional[int] = None) -> int:
+        """
+        Delete many of a user's workout records with one DELETE statement.
+        
+        Records are picked as in ``update_workout_records``, and only the user's own
+        records are deleted. Their daily summaries are updated in the same transaction.
+        Uploads that records are deleted from stop counting as duplicates, so uploading the
+        same file again restores the records.
+        
+        Args:
+            user_id (str): The ID of the user who owns the records
+            ids (Optional[Iterable[int]]): Only delete these records
+            start_date (Optional[date]): Only delete records on or after this date
+            end_date (Optional[date]): Only delete records on or before this date
+            exercise (Optional[str]): Only delete records of this exercise
+            category (Optional[str]): Only delete records of this category
+            upload_id (Optional[int]): Only delete records imported by this upload
+            
+        Returns:
+            int: Number of records deleted
+            
+        Raises:
+            ValueError: If neither ids nor a filter is given
+            RuntimeError: If database is not connected or the delete fails
+        """
+        if not self._session:
+            raise RuntimeError("Database not connected")
+        
+        conditions = self._bulk_filters(user_id, ids, start_date, end_date, exercise, category, upload_id)
+        try:
+            deleted = self._session.execute(
+                delete(WorkoutHistory).where(*conditions)
+                .returning(WorkoutHistory.date, WorkoutHistory.exercise_id, WorkoutHistory.upload_id)
+                .execution_options(synchronize_session=False)
+            ).all()
+            
+            upload_ids = {upload_id for _, _, upload_id in deleted if upload_id is not None}
+            if upload_ids:
+                self._session.execute(
+                    update(WorkoutUpload).where(WorkoutUpload.id.in_(upload_ids)).values(file_hash=None)
+                    .execution_options(synchronize_session=False)
+                )
+            self._refresh_summaries_of(user_id, {(workout_date, exercise_id) for workout_date, exercise_id, _ in deleted})
+            self._session.commit()
+            self._record_write(user_id)
+            return len(deleted)
+                
+        except OperationalError as e:
+            self._session.rollback()
+            raise RuntimeError("Database operation failed")
+        except SQLAlchemyError as e:
+            self._session.rollback()
+            raise RuntimeError("Failed to delete workout records")
+    
+    def _insert_ignoring_conflicts(self, model):
+        """Build an INSERT for a model that skips rows violating a unique constraint."""
+        return insert_ignoring_conflicts(self._engine.dialect.name, model)
+    
+    def _dimension_ids(self, workout_data: Dict[str, Any]) -> Dict[str, int]:
+        """Get the exercise_id and category_id to store for validated workout data."""
+        return {
+            'exercise_id': self._exercises.id(self._session, workout_data['exercise']),
+            'category_id': self._categories.id(self._session, workout_data['category'])
+        }
+    
+    def bulk_create_workout_records(self, user_id: str, records: List[Dict[str, Any]],
+                                    batch_size: int = BULK_INSERT_BATCH_SIZE,
+                                    fingerprinter: Optional[RowFingerprinter] = None,
+                                    upload_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Insert many workout records using multi-row INSERT statements, skipping duplicates.
+        
+        Every record is given a natural-key fingerprint, and records whose fingerprint is
+        already stored are skipped (``INSERT ... ON CONFLICT DO NOTHING``), so importing the
+        same rows twice does not duplicate them. Records are written in batches of
+        ``batch_size`` rows inside the current transaction, and the generated ids and
+        timestamps are read back with RETURNING. The daily summaries of the records' days
+        are updated in the same transaction. The caller is responsible for committing.
+        
+        Args:
+            user_id (str): The ID of the user who owns the records
+            records (List[Dict[str, Any]]): Validated workout data dictionaries
+            batch_size (int): Number of rows written per INSERT statement
+            fingerprinter (Optional[RowFingerprinter]): Fingerprinter of the upload the records
+                belong to, when they are inserted in several calls; a new one is used if not given
+            upload_id (Optional[int]): ID of the upload the records are imported from
+            
+        Returns:
+            List[Dict[str, Any]]: The id, fingerprint, created_at and updated_at of each inserted
+                row; skipped records are not included
+            
+        Raises:
+            RuntimeError: If database is not connected or the insert fails
+            ValueError: If a record is invalid or violates a constraint
+        """
+        if not self._session:
+            raise RuntimeError("Database not connected")
+        
+        fingerprinter = fingerprinter or RowFingerprinter(user_id)
+        stmt = self._insert_ignoring_conflicts(WorkoutHistory).returning(
+            WorkoutHistory.id,
+            WorkoutHistory.fingerprint,
+            WorkoutHistory.created_at,
+            WorkoutHistory.updated_at
+        )
+        
+        inserted = []
+        try:
+            for start in range(0, len(records), batch_size):
+                batch = []
+                chunk = records[start:start + batch_size]
+                for workout_data in chunk:
+                    self._validate_workout_data(workout_data)
+                exercise_ids = self._exercises.ids(self._session, {workout_data['exercise'] for workout_data in chunk})
+                category_ids = self._categories.ids(self._session, {workout_data['category'] for workout_data in chunk})
+                for workout_data in chunk:
+                    batch.append({
+                        'user_id': user_id,
+                        'date': workout_data['date'],
+                        'exercise_id': exercise_ids[workout_data['exercise']],
+                        'category_id': category_ids[workout_data['category']],
+                        'weight': workout_data.get('weight'),
+                        'weight_unit': workout_data.get('weight_unit'),
+                        'reps': workout_data.get('reps'),
+                        'distance': workout_data.get('distance'),
+                        'distance_unit': workout_data.get('distance_unit'),
+                        'time': workout_data.get('time'),
+                        'comment': workout_data.get('comment'),
+                        'fingerprint': fingerprinter.fingerprint(workout_data),
+                        'upload_id': upload_id
+                    })
+                
+                result = self._session.execute(stmt, batch)
+                inserted.extend(dict(row._mapping) for row in result)
+            
+            if inserted:
+                self._refresh_daily_summaries(user_id,
+                                              {workout_data['date'] for workout_data in records},
+                                              {workout_data['exercise'] for workout_data in records})
+            return inserted
+                
+        except IntegrityError as e:
+            self._session.rollback()
+            raise ValueError("Failed to create workout records")
+        except OperationalError as e:
+            self._session.rollback()
+            raise RuntimeError("Database operation failed")
+        except SQLAlchemyError as e:
+            self._session.rollback()
+            raise RuntimeError("Failed to create workout records")
+    
+    def get_workout_upload(self, user_id: str, file_hash: str) -> Optional[WorkoutUpload]:
+        """Get a user's earlier upload of a file by the file's content hash."""
+        if not self._session:
+            raise RuntimeError("Database not connected")
+        
+        try:
+            return self._session.query(WorkoutUpload).filter(
+                WorkoutUpload.user_id == user_id,
+                WorkoutUpload.file_hash == file_hash
+            ).first()
+        except SQLAlchemyError as e:
+            raise RuntimeError("Failed to get workout upload")
+    
+    def get_upload_records(self, user_id: str, upload_id: int,
+                           after_id: Optional[int] = None, limit: int = 100) -> List[WorkoutHistory]:
+        """
+        Get one page of the workout records imported by an upload.
+        
+        Pages are keyed on the record id rather than an offset, so records deleted while the
+        upload is paged through do not make later pages skip records.
+        
+        Args:
+            user_id (str): The ID of the user who owns the upload
+            upload_id (int): The ID of the upload
+            after_id (Optional[int]): Return the records after this one, i.e. the last record
+                of the previous page
+            limit (int): Maximum number of records to return
+            
+        Returns:
+            List[WorkoutHistory]: The records, in the order they were inserted
+        """
+        if not self._session:
+            raise RuntimeError("Database not connected")
+        
+        try:
+            query = self._session.query(WorkoutHistory).filter(
+                WorkoutHistory.user_id == user_id,
+                WorkoutHistory.upload_id == upload_id
+            )
+            if after_id is not None:
+                query = query.filter(WorkoutHistory.id > after_id)
+            return query.order_by(WorkoutHistory.id).limit(limit).all()
+        except SQLAlchemyError as e:
+            raise RuntimeError("Failed to get upload records")
+    
+    def create_object_upload(self, user_id: str, object_key: str,
+                             file_name: Optional[str] = None) -> WorkoutUpload:
+        """
+        Record a file that the user is uploading straight to object storage.
+        
+        The upload stays pending until the stored object is ingested.
+        
+        Args:
+            user_id (str): The ID of the user uploading the file
+            object_key (str): Key the file will be stored under
+            file_name (Optional[str]): Original name of the file
+            
+        Returns:
+            WorkoutUpload: The pending upload
+            
+        Raises:
+            RuntimeError: If database is not connected or the insert fails
+            ValueError: If the object key is already recorded
+        """
+        if not self._session:
+            raise RuntimeError("Database not connected")
+        
+        try:
+            upload = WorkoutUpload(
+                user_id=user_id,
+                object_key=object_key,
+                file_name=file_name,
+                records_inserted=0,
+                records_skipped=0,
+                status=WorkoutUpload.PENDING
+            )
+            self._session.add(upload)
+            self._session.commit()
+            return upload
+                
+        except IntegrityError as e:
+            self._session.rollback()
+            raise ValueError("Failed to record upload")
+        except OperationalError as e:
+            self._session.rollback()
+            raise RuntimeError("Database operation failed")
+        except SQLAlchemyError as e:
+            self._session.rollback()
+            raise RuntimeError("Failed to record upload")
+    
+    def get_upload_by_object_key(self, object_key: str) -> Optional[WorkoutUpload]:
+        """Get the upload recorded for an object storage key."""
+        if not self._session:
+            raise RuntimeError("Database not connected")
+        
+        try:
+            return self._session.query(WorkoutUpload).filter(WorkoutUpload.object_key == object_key).first()
+        except SQLAlchemyError as e:
+            raise RuntimeError("Failed to get workout upload")
+    
+    def ingest_upload_chunk(self, upload_id: int, user_id: str, records: List[Dict[str, Any]],
+                            fingerprinter: RowFingerprinter, byte_offset: int,
+                            report: Optional[RowErrorReport] = None, row_num: int = 0) -> int:
+        """
+        Insert a chunk of an upload's rows and advance the upload's checkpoint, in one transaction.
+        
+        Because the rows and the checkpoint are committed together, an ingest that stops
+        part way can resume from ``byte_offset`` without losing or repeating rows. The
+        checkpoint also holds the error report and the fingerprinter's counts of repeated
+        rows, so the resumed ingest carries on with them.
+        
+        Args:
+            upload_id (int): The ID of the upload being ingested
+            user_id (str): The ID of the user who owns the upload
+            records (List[Dict[str, Any]]): Validated workout data dictionaries
+            fingerprinter (RowFingerprinter): The upload's fingerprinter
+            byte_offset (int): Offset in the file just after the last of the records
+            report (Optional[RowErrorReport]): Invalid rows found so far
+            row_num (int): Row number of the last of the records; the header is row 1
+            
+        Returns:
+            int: Number of records inserted; the rest were already stored
+            
+        Raises:
+            RuntimeError: If database is not connected or the insert fails
+        """
+        if not self._session:
+            raise RuntimeError("Database not connected")
+        
+        inserted = len(self.bulk_create_workout_records(user_id, records, fingerprinter=fingerprinter,
+                                                        upload_id=upload_id))
+        try:
+            values = {
+                'records_inserted': WorkoutUpload.records_inserted + inserted,
+                'records_skipped': WorkoutUpload.records_skipped + len(records) - inserted,
+                'byte_offset': byte_offset,
+                'row_num': row_num,
+                'status': WorkoutUpload.PROCESSING
+            }
+            if report is not None:
+                values['rows_failed'] = report.rows_failed
+                values['errors'] = report.errors
+            self._session.query(WorkoutUpload).filter(WorkoutUpload.id == upload_id).update(values)
+            counts = fingerprinter.take_counts()
+            if counts:
+                self._session.execute(
+                    insert_updating_conflicts(self._engine.dialect.name, WorkoutUploadFingerprint,
+                                              ('upload_id', 'fingerprint'), ('count',)),
+                    [{'upload_id': upload_id, 'fingerprint': key, 'count': count} for key, count in counts.items()]
+                )
+            self._session.commit()
+            self._record_write(user_id)
+            return inserted
+                
+        except OperationalError as e:
+            self._session.rollback()
+            raise RuntimeError("Database operation failed")
+        except SQLAlchemyError as e:
+            self._session.rollback()
+            raise RuntimeError("Failed to checkpoint upload")
+    
+    def get_upload_fingerprint_counts(self, upload_id: int) -> Dict[str, int]:
+        """Get the repeated-row counts stored with an upload's checkpoint, for a RowFingerprinter."""
+        if not self._session:
+            raise RuntimeError("Database not connected")
+        
+        try:
+            rows = self._session.query(WorkoutUploadFingerprint.fingerprint, WorkoutUploadFingerprint.count).filter(
+                WorkoutUploadFingerprint.upload_id == upload_id
+            )
+            return {fingerprint: count for fingerprint, count in rows}
+        except SQLAlchemyError as e:
+            raise RuntimeError("Failed to get upload checkpoint")
+    
+    def set_upload_status(self, upload_id: int, status: str,
+                          report: Optional[RowErrorReport] = None) -> None:
+        """
+        Set an upload's status, and optionally its final error report.
+        
+        The repeated-row counts of the checkpoint are dropped once the upload is completed
+        or failed, since it will not be resumed.
+        """
+        if not self._session:
+            raise RuntimeError("Database not connected")
+        
+        try:
+            values = {'status': status}
+            if report is not None:
+                values['rows_failed'] = report.rows_failed
+                values['errors'] = report.errors
+            self._session.query(WorkoutUpload).filter(WorkoutUpload.id == upload_id).update(values)
+            if status in (WorkoutUpload.COMPLETED, WorkoutUpload.FAILED):
+                self._session.query(WorkoutUploadFingerprint).filter(
+                    WorkoutUploadFingerprint.upload_id == upload_id
+                ).delete()
+            self._session.commit()
+                
+        except SQLAlchemyError as e:
+            self._session.rollback()
+            raise RuntimeError("Failed to update upload status")
+    
+    def _create_workout_upload(self, user_id: str, file_hash: Optional[str],
+                               file_name: Optional[str]) -> Optional[int]:
+        """
+        Record an upload in the current transaction, before its rows are inserted.
+        
+        Returns the new upload's ID, or None if the user already uploaded an identical file.
+        A concurrent upload of the same file waits for this transaction, then finds it.
+        """
+        result = self._session.execute(self._insert_ignoring_conflicts(WorkoutUpload).values(
+            user_id=user_id,
+            file_hash=file_hash,
+            file_name=file_name,
+            records_inserted=0,
+            records_skipped=0
+        ).returning(WorkoutUpload.id))
+        return result.scalar()
+    
+    def process_workout_csv(self, user_id: str, csv_content: str,
+                            date_format: Optional[str] = None,
+                            partial: bool = False) -> Dict[str, Any]:
         """
         Process a CSV file containing workout data and insert it into the database.
         
+        The content is processed like an uploaded stream (see ``process_workout_csv_stream``)
+        and only summary statistics are returned; the inserted records can be read back a
+        page at a time with ``get_upload_records``.
+        
         Args:
             user_id (str): The ID of the user uploading the workout data
             csv_content (str): The content of the CSV file as a string
+            date_format (Optional[str]): The file's date format (e.g. ``DD/MM/YYYY``); inferred if not given
+            partial (bool): Insert the valid rows even if some rows are invalid
+            
+        Returns:
+            Dict[str, Any]: The ingest result, as returned by ``process_workout_csv_stream``
+            
+        Raises:
+            RuntimeError: If database is not connected or processing fails
+            CsvValidationError: If any row is invalid and ``partial`` is not set; lists every bad row
+        """
+        return self.process_workout_csv_stream(user_id, BytesIO(csv_content.encode('utf-8')),
+                                               date_format=date_format, partial=partial)
+    
+    def process_workout_csv_stream(self, user_id: str, stream: BinaryIO,
+                                   chunk_size: int = BULK_INSERT_BATCH_SIZE,
+                                   encoding: str = 'utf-8',
+                                   date_format: Optional[str] = None,
+                                   progress: Optional[Callable[[int, int], None]] = None,
+                                   file_name: Optional[str] = None,
+                                   partial: bool = False,
+                                   content_encoding: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Process a workout CSV from a binary stream using bounded memory.
+        
+        The stream is decoded and parsed incrementally by the configured CSV parser backend,
+        and rows are inserted in chunks of ``chunk_size`` as they are read, so memory use does
+        not grow with the file size. All chunks are committed in a single transaction. Every
+        row is checked, and unless ``partial`` is set nothing is written if any row is invalid.
+        Rows that were already imported are skipped. If the stream is seekable it is hashed
+        first, and a file identical to one the user uploaded before is not parsed. gzip and
+        zstd compressed streams are decompressed on the fly as they are parsed.
+        
+        Args:
+            user_id (str): The ID of the user uploading the workout data
+            stream (BinaryIO): A readable binary stream positioned at the CSV header
+            chunk_size (int): Number of rows parsed and inserted at a time
+            encoding (str): Text encoding of the CSV file
+            date_format (Optional[str]): The file's date format (e.g. ``DD/MM/YYYY``); inferred if not given
+            progress (Optional[Callable[[int, int], None]]): Called after each chunk with the running
+                counts of rows processed and rows failed
+            file_name (Optional[str]): Original name of the uploaded file, kept with the upload record
+            partial (bool): Insert the valid rows even if some rows are invalid
+            content_encoding (Optional[str]): Declared compression (e.g. ``gzip``); detected
+                from the content if not given
+            
+        Returns:
+            Dict[str, Any]: The ``upload_id``, ``records_inserted`` and ``records_skipped`` counts,
+                whether the whole file was skipped as a ``duplicate_file``, the ``rows_failed``
+                count and ``errors`` of invalid rows left out of a partial upload, and a
+                ``summary`` of the file's valid rows (count, date range, distinct exercises)
+            
+        Raises:
+            RuntimeError: If database is not connected or processing fails
+            CsvValidationError: If any row is invalid and ``partial`` is not set; lists every bad row
+        """
+        if not self._session:
+            raise RuntimeError("Database not connected")
+        
+        # The file is hashed as uploaded, before it is decompressed
+        file_hash = file_fingerprint(stream) if stream.seekable() else None
+        stream = open_decompressed(stream, content_encoding)
+        report = RowErrorReport()
+        batches = get_parser().iter_batches(stream, chunk_size, encoding, date_format, report)
+        return self._ingest_workout_batches(user_id, batches, chunk_size, progress, file_hash, file_name,
+                                            report, partial)
+    
+    def process_workout_csv_parallel(self, user_id: str, path: str,
+                                     workers: Optional[int] = None,
+                                     chunk_size: int = BULK_INSERT_BATCH_SIZE,
+                                     encoding: str = 'utf-8',
+                                     date_format: Optional[str] = None,
+                                     progress: Optional[Callable[[int, int], None]] = None,
+                                     file_name: Optional[str] = None,
+                                     partial: bool = False) -> Dict[str, Any]:
+        """
+        Process a large workout CSV file by parsing it on several cores.
+        
+        The file is split into line-aligned byte ranges that are parsed and validated in a
+        process pool; the results are inserted in file order in a single transaction.
+        Every row is checked, and unless ``partial`` is set nothing is written if any row is
+        invalid; row numbers in errors match the original file. Rows that were already
+        imported are skipped, and a file identical to one the user uploaded before is not parsed.
+        
+        Args:
+            user_id (str): The ID of the user uploading the workout data
+            path (str): Path to the CSV file on disk
+            workers (Optional[int]): Number of parser processes; defaults to the CPU count
+            chunk_size (int): Number of rows inserted at a time
+            encoding (str): Text encoding of the CSV file
+            date_format (Optional[str]): The file's date format (e.g. ``DD/MM/YYYY``); inferred if not given
+            progress (Optional[Callable[[int, int], None]]): Called after each chunk with the running
+                counts of rows processed and rows failed
+            file_name (Optional[str]): Original name of the uploaded file, kept with the upload record
+            partial (bool): Insert the valid rows even if some rows are invalid
             
         Returns:
-            List[Dict[str, Any]]: List of processed workout records as dictionaries
+            Dict[str, Any]: The ``upload_id``, ``records_inserted`` and ``records_skipped`` counts,
+                whether the whole file was skipped as a ``duplicate_file``, the ``rows_failed``
+                count and ``errors`` of invalid rows left out of a partial upload, and a
+                ``summary`` of the file's valid rows (count, date range, distinct exercises)
             
         Raises:
-            RuntimeError: If database is not connected
-            ValueError: If CSV data is invalid
-            SQLAlchemyError: If database operation fails
+            RuntimeError: If database is not connected or processing fails
+            CsvValidationError: If any row is invalid and ``partial`` is not set; lists every bad row
         """
         if not self._session:
             raise RuntimeError("Database not connected")
         
+        with open(path, 'rb') as f:
+            file_hash = file_fingerprint(f)
+        report = RowErrorReport()
+        batches = iter_parallel_batches(path, workers, chunk_size, encoding, date_format, report)
+        return self._ingest_workout_batches(user_id, batches, chunk_size, progress, file_hash, file_name,
+                                            report, partial)
+    
+    def _ingest_workout_batches(self, user_id: str, batches: Iterable[List[Dict[str, Any]]],
+                                chunk_size: int,
+                                progress: Optional[Callable[[int, int], None]] = None,
+                                file_hash: Optional[str] = None,
+                                file_name: Optional[str] = None,
+                                report: Optional[RowErrorReport] = None,
+                                partial: bool = False) -> Dict[str, Any]:
+        """
+        Insert parsed batches of workout data, skipping duplicates, and commit them as one transaction.
+        
+        Invalid rows recorded in ``report`` while the batches are parsed reject the whole
+        file unless ``partial`` is set. Once a rejected file has a bad row, the rest of it is
+        only validated, not inserted, so the report still lists every bad row.
+        
+        A file the user already uploaded is skipped if every row of it was stored. If the
+        earlier upload left invalid rows out, the file is processed again instead, so the
+        rows that were never stored are reported; the rows that were are skipped.
+        """
+        report = report or RowErrorReport()
         try:
-            # Parse CSV content
-            csv_file = StringIO(csv_content)
-            reader = csv.DictReader(csv_file)
-            
-            # Check required columns
-            required_columns = {'date', 'exercise', 'category'}
-            optional_columns = {'weight', 'weight_unit', 'reps', 'distance', 'distance_unit', 'time', 'comment'}
-            all_columns = required_columns | optional_columns
-            
-            # Normalize column names (convert to lowercase and replace spaces with underscores)
-            def normalize_column_name(col):
-                return col.lower().replace(' ', '_')
-            
-            # Get the actual columns from the CSV and normalize them
-            actual_columns = {normalize_column_name(col) for col in reader.fieldnames} if reader.fieldnames else set()
-            
-            # Check for missing required columns
-            missing_columns = required_columns - actual_columns
-            if missing_columns:
-                raise ValueError(f"Missing required columns: {', '.join(missing_columns)}")
-            
-            # Check for unknown columns
-            unknown_columns = actual_columns - all_columns
-            if unknown_columns:
-                raise ValueError(f"Unknown columns found: {', '.join(unknown_columns)}")
-            
-            # Create a mapping of normalized column names to actual column names
-            column_mapping = {normalize_column_name(col): col for col in reader.fieldnames}
-            
-            processed_records = []
-            
-            # Process each row
-            for row_num, row in enumerate(reader, start=2):  # start=2 because row 1 is header
-                try:
-                    # Try multiple date formats
-                    date_formats = [
-                        '%Y-%m-%d',  # 2024-03-14
-                        '%m/%d/%Y',  # 03/14/2024
-                        '%d/%m/%Y',  # 14/03/2024
-                        '%Y/%m/%d',  # 2024/03/14
-                        '%m-%d-%Y',  # 03-14-2024
-                        '%d-%m-%Y',  # 14-03-2024
-                    ]
-                    
-                    date = None
-                    for date_format in date_formats:
-                        try:
-                            date = datetime.strptime(row[column_mapping['date']], date_format).date()
-                            break
-                        except ValueError:
-                            continue
-                    
-                    if date is None:
-                        raise ValueError(f"Invalid date format in row {row_num}. Supported formats are: YYYY-MM-DD, MM/DD/YYYY, DD/MM/YYYY, YYYY/MM/DD, MM-DD-YYYY, DD-MM-YYYY")
-                    
-                    # Create workout record with required fields
-                    workout_data = {
-                        'date': date,
-                        'exercise': row[column_mapping['exercise']],
-                        'category': row[column_mapping['category']]
-                    }
-                    
-                    # Add optional fields if they exist in the CSV
-                    if 'weight' in column_mapping:
-                        weight_value = row[column_mapping['weight']]
-                        if weight_value and weight_value.strip():
-                            workout_data['weight'] = float(weight_value)
-                    
-                    if 'weight_unit' in column_mapping:
-                        workout_data['weight_unit'] = row[column_mapping['weight_unit']]
-                    
-                    if 'reps' in column_mapping:
-                        reps_value = row[column_mapping['reps']]
-                        if reps_value and reps_value.strip():
-                            workout_data['reps'] = int(reps_value)
-                    
-                    if 'distance' in column_mapping:
-                        distance_value = row[column_mapping['distance']]
-                        if distance_value and distance_value.strip():
-                            workout_data['distance'] = float(distance_value)
-                    
-                    if 'distance_unit' in column_mapping:
-                        workout_data['distance_unit'] = row[column_mapping['distance_unit']]
-                    
-                    if 'time' in column_mapping:
-                        workout_data['time'] = row[column_mapping['time']]
-                    
-                    if 'comment' in column_mapping:
-                        workout_data['comment'] = row[column_mapping['comment']]
-                    
-                    # Use existing create_workout_record method
-                    record = self.create_workout_record(user_id, workout_data)
-                    
-                    # Commit the transaction for this record
-                    self._session.commit()
-                    
-                    # Convert record to dictionary
-                    record_dict = {
-                        'id': record.id,
-                        'user_id': record.user_id,
-                        'date': record.date.isoformat(),
-                        'exercise': record.exercise,
-                        'category': record.category,
-                        'weight': record.weight,
-                        'weight_unit': record.weight_unit,
-                        'reps': record.reps,
-                        'distance': record.distance,
-                        'distance_unit': record.distance_unit,
-                        'time': record.time,
-                        'comment': record.comment,
-                        'created_at': record.created_at.isoformat() if record.created_at else None,
-                        'updated_at': record.updated_at.isoformat() if record.updated_at else None
-                    }
-                    processed_records.append(record_dict)
-                    
-                except ValueError as e:
-                    self._session.rollback()
-                    raise ValueError(f"Error in row {row_num}: {str(e)}")
-                except Exception as e:
-                    self._session.rollback()
-                    raise ValueError(f"Error processing row {row_num}: {str(e)}")
-            
-            return processed_records
+            upload_id = self._create_workout_upload(user_id, file_hash, file_name)
+            upload = self.get_workout_upload(user_id, file_hash) if upload_id is None else None
+            if upload is not None and upload.rows_failed:
+                upload_id = upload.id
+            elif upload is not None:
+                self._session.rollback()
+                return {
+                    'upload_id': upload.id,
+                    'records_inserted': 0,
+                    'records_skipped': upload.records_inserted + upload.records_skipped,
+                    'duplicate_file': True,
+                    'rows_failed': 0,
+                    'errors': [],
+                    'summary': None
+                }
+            
+            fingerprinter = RowFingerprinter(user_id)
+            records_processed = 0
+            records_inserted = 0
+            first_date = last_date = None
+            exercises = set()
+            for batch in batches:
+                if partial or not report.rows_failed:
+                    records_inserted += len(self.bulk_create_workout_records(
+                        user_id, batch, chunk_size, fingerprinter, upload_id))
+                records_processed += len(batch)
                 
+                for workout_data in batch:
+                    if first_date is None or workout_data['date'] < first_date:
+                        first_date = workout_data['date']
+                    if last_date is None or workout_data['date'] > last_date:
+                        last_date = workout_data['date']
+                    exercises.add(workout_data['exercise'])
+                if progress:
+                    progress(records_processed, report.rows_failed)
+            
+            if report.rows_failed and not partial:
+                raise CsvValidationError(report)
+            
+            records_skipped = records_processed - records_inserted
+            # A file processed again adds to the counts of its earlier upload
+            self._session.query(WorkoutUpload).filter(WorkoutUpload.id == upload_id).update({
+                'records_inserted': WorkoutUpload.records_inserted + records_inserted,
+                'records_skipped': WorkoutUpload.records_skipped + records_skipped,
+                'rows_failed': report.rows_failed,
+                'errors': report.errors or None
+            })
+            self._session.commit()
+            self._record_write(user_id)
+            return {
+                'upload_id': upload_id,
+                'records_inserted': records_inserted,
+                'records_skipped': records_skipped,
+                'duplicate_file': False,
+                'rows_failed': report.rows_failed,
+                'errors': report.errors,
+                'summary': {
+                    'count': records_processed,
+                    'inserted': records_inserted,
+                    'skipped': records_skipped,
+                    'failed': report.rows_failed,
+                    'first_date': first_date.isoformat() if first_date else None,
+                    'last_date': last_date.isoformat() if last_date else None,
+                    'exercises': sorted(exercises)
+                }
+            }
+                
+        except CsvValidationError:
+            self._session.rollback()
+            raise
         except Exception as e:
             self._session.rollback()
             raise RuntimeError(f"Failed to process CSV file: {str(e)}") 
\ No newline at end of file
@@ -4,39 +4,73 @@ This module provides a factory for creating and managing database provider insta
 It implements the singleton pattern to ensure only one provider instance exists at a time.
 """
 import os
-from typing import Optional
+import threading
+from typing import Dict, Optional, Union
 from .database_provider import DatabaseProvider
 from .production_database_provider import ProductionDatabaseProvider
 from .local_database_provider import LocalDatabaseProvider
+from .async_database_provider import (
+    AsyncDatabaseProvider, LocalAsyncDatabaseProvider, ProductionAsyncDatabaseProvider
+)
 
-_provider_instance: Optional[DatabaseProvider] = None
+# Provider classes by environment, for synchronous and asyncio code
+PROVIDER_CLASSES = {
+    False: {'production': ProductionDatabaseProvider, 'local': LocalDatabaseProvider},
+    True: {'production': ProductionAsyncDatabaseProvider, 'local': LocalAsyncDatabaseProvider},
+}
 
-def get_provider() -> DatabaseProvider:
+_provider_instances: Dict[bool, Union[DatabaseProvider, AsyncDatabaseProvider]] = {}
+_provider_lock = threading.Lock()
+
+def get_provider(asynchronous: bool = False) -> Union[DatabaseProvider, AsyncDatabaseProvider]:
     """
     Get the appropriate database provider based on the environment.
-    Uses singleton pattern to maintain a single provider instance.
+    Uses singleton pattern to maintain a single provider instance of each kind. The
+    synchronous instance is shared by every thread; each thread gets its own session from
+    it (see DatabaseProvider.remove_session). The asyncio instance must be used from one
+    event loop, as its pooled connections belong to the loop that opened them.
+    
+    Args:
+        asynchronous (bool): Get the AsyncDatabaseProvider, for code running on an
+            event loop, instead of the DatabaseProvider
     
     Returns:
-        DatabaseProvider: The appropriate provider for the current environment.
+        Union[DatabaseProvider, AsyncDatabaseProvider]: The appropriate provider for the
+            current environment.
         
     Raises:
         RuntimeError: If provider initialization fails.
     """
-    global _provider_instance
+    provider = _provider_instances.get(asynchronous)
     
-    if _provider_instance is None:
-        environment = os.getenv('ENVIRONMENT', 'local').lower()
-        
-        try:
-            if environment == 'production':
-                _provider_instance = ProductionDatabaseProvider()
-            else:
-                _provider_instance = LocalDatabaseProvider()
+    if provider is None:
+        with _provider_lock:
+            provider = _provider_instances.get(asynchronous)
+            if provider is None:
+                environment = os.getenv('ENVIRONMENT', 'local').lower()
                 
-            # Initialize the provider
-            _provider_instance.connect()
-            
-        except Exception as e:
-            raise RuntimeError(f"Failed to initialize database provider: {str(e)}")
+                try:
+                    if environment == 'production':
+                        provider = PROVIDER_CLASSES[asynchronous]['production']()
+                    else:
+                        provider = PROVIDER_CLASSES[asynchronous]['local']()
+                        
+                    # Initialize the provider
+                    provider.connect()
+                    _provider_instances[asynchronous] = provider
+                    
+                except Exception as e:
+                    raise RuntimeError(f"Failed to initialize database provider: {str(e)}")
     
-    return _provider_instance 
\ No newline at end of file
+    return provider
+
+
+def remove_provider_session() -> None:
+    """
+    End the current thread's session on the synchronous provider, if it was created.
+    Lambda handlers call this when an invocation finishes, so the connection goes back to
+    the pool instead of sitting in an open transaction while the container is frozen.
+    """
+    provider = _provider_instances.get(False)
+    if provider is not None:
+        provider.remove_session()
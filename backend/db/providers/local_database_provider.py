@@ -3,7 +3,7 @@ from typing import Dict, Any, Optional, List
 from datetime import datetime
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError, OperationalError
 
-from .database_provider import DatabaseProvider
+from .database_provider import DatabaseProvider, refresh_workout_fingerprints
 from ..models.workout import WorkoutHistory
 
 class LocalDatabaseProvider(DatabaseProvider):
@@ -24,8 +24,7 @@ class LocalDatabaseProvider(DatabaseProvider):
             record = WorkoutHistory(
                 user_id=user_id,
                 date=workout_data['date'],
-                exercise=workout_data['exercise'],
-                category=workout_data['category'],
+                **self._dimension_ids(workout_data),
                 weight=workout_data.get('weight'),
                 weight_unit=workout_data.get('weight_unit'),
                 reps=workout_data.get('reps'),
@@ -38,6 +37,8 @@ class LocalDatabaseProvider(DatabaseProvider):
             self._session.add(record)
             self._session.flush()
             self._session.refresh(record)
+            self._refresh_daily_summaries(user_id, {record.date}, {record.exercise})
+            self._record_write(user_id)
             return record
                 
         except IntegrityError as e:
@@ -62,9 +63,12 @@ class LocalDatabaseProvider(DatabaseProvider):
             
             self._validate_workout_data(workout_data)
             
+            # The summaries of the day and exercise the record is moving from change too
+            old_date, old_exercise = record.date, record.exercise
+            dimension_ids = self._dimension_ids(workout_data)
             record.date = workout_data['date']
-            record.exercise = workout_data['exercise']
-            record.category = workout_data['category']
+            record.exercise_id = dimension_ids['exercise_id']
+            record.category_id = dimension_ids['category_id']
             record.weight = workout_data.get('weight')
             record.weight_unit = workout_data.get('weight_unit')
             record.reps = workout_data.get('reps')
@@ -75,7 +79,11 @@ class LocalDatabaseProvider(DatabaseProvider):
             record.updated_at = datetime.utcnow()
             
             self._session.flush()
+            refresh_workout_fingerprints(self._session, [record.id])
             self._session.refresh(record)
+            self._refresh_daily_summaries(record.user_id, {old_date, record.date},
+                                          {old_exercise, record.exercise})
+            self._record_write(record.user_id)
             return record
                 
         except IntegrityError as e:
@@ -100,6 +108,8 @@ class LocalDatabaseProvider(DatabaseProvider):
             
             self._session.delete(record)
             self._session.flush()
+            self._refresh_daily_summaries(record.user_id, {record.date}, {record.exercise})
+            self._record_write(record.user_id)
             return True
                 
         except IntegrityError as e:
@@ -4,11 +4,15 @@ This module provides a single point for database initialization and migration.
 """
 import os
 import sys
+from typing import Optional
 from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy_utils import database_exists, create_database
 import logging
 from pathlib import Path
 from alembic.config import Config
+from alembic.script import ScriptDirectory
 from alembic import command
 from .providers import get_provider
 
@@ -51,6 +55,42 @@ def verify_tables(engine):
         logger.error(f"Error verifying tables: {str(e)}")
         return False
 
+def get_alembic_config() -> Config:
+    """Get the Alembic configuration for the backend's migrations."""
+    backend_dir = Path(__file__).parent.parent
+    alembic_cfg = Config(str(backend_dir / 'alembic.ini'))
+    alembic_cfg.set_main_option('script_location', str(backend_dir / 'db' / 'migrations'))
+    return alembic_cfg
+
+def get_head_revision() -> str:
+    """Get the revision the migration scripts end at, without connecting to the database."""
+    return ScriptDirectory.from_config(get_alembic_config()).get_current_head()
+
+def get_current_revision(engine: Engine) -> Optional[str]:
+    """Get the revision the database was last migrated to, or None if it cannot be read."""
+    try:
+        with engine.connect() as conn:
+            return conn.execute(text("SELECT version_num FROM alembic_version")).scalar()
+    except SQLAlchemyError:
+        return None
+
+def is_database_current(engine: Optional[Engine] = None) -> bool:
+    """
+    Check with a single query whether the database schema is at the head revision.
+
+    Args:
+        engine (Optional[Engine]): Engine for the database to check; one for the
+            provider's database is created and disposed of if not given
+    """
+    own_engine = engine is None
+    if own_engine:
+        engine = create_engine(get_provider().get_connection_url())
+    try:
+        return get_current_revision(engine) == get_head_revision()
+    finally:
+        if own_engine:
+            engine.dispose()
+
 def setup_database():
     """
     Set up the database and run migrations.
@@ -58,7 +98,10 @@ def setup_database():
     1. Creates the database if it doesn't exist
     2. Initializes the database with required tables
     3. Runs all pending migrations
-    4. Verifies the setup was successful
+    4. Creates any missing workout history partitions
+    5. Verifies the setup was successful
+    When the schema is already at the head revision, which takes one query to find out,
+    only the partitions are checked.
     """
     try:
         # Get database URL from provider
@@ -66,8 +109,18 @@ def setup_database():
         db_url = provider.get_connection_url()
         logger.info(f"Using database URL: {db_url}")
         
-        # Test initial connection
+        # Keep partitions ready for upcoming workouts. Imported here so that
+        # `python -m db.maintenance` does not import the module twice.
+        from .maintenance import ensure_workout_partitions
+
         engine = create_engine(db_url)
+        if is_database_current(engine):
+            logger.info("✅ Database schema is up to date, skipping setup")
+            ensure_workout_partitions(engine)
+            engine.dispose()
+            return True
+        
+        # Test initial connection
         if not test_connection(engine):
             logger.error("Failed to connect to database")
             return False
@@ -85,19 +138,13 @@ def setup_database():
         
         # Run migrations
         logger.info("Running database migrations...")
-        # Get paths
-        backend_dir = Path(__file__).parent.parent
-        alembic_ini_path = backend_dir / 'alembic.ini'
-        migrations_dir = backend_dir / 'db' / 'migrations'
-        
-        logger.info(f"Using alembic.ini: {alembic_ini_path}")
-        logger.info(f"Using migrations directory: {migrations_dir}")
-        
-        # Configure and run migrations
-        alembic_cfg = Config(str(alembic_ini_path))
-        alembic_cfg.set_main_option('script_location', str(migrations_dir))
+        alembic_cfg = get_alembic_config()
+        logger.info(f"Using alembic.ini: {alembic_cfg.config_file_name}")
+        logger.info(f"Using migrations directory: {alembic_cfg.get_main_option('script_location')}")
         command.upgrade(alembic_cfg, "head")
         logger.info("Migrations completed successfully")
+
+        ensure_workout_partitions(engine)
         
         # Verify tables were created
         logger.info("Verifying database setup...")
@@ -3,18 +3,18 @@ import os
 import boto3
 from botocore.exceptions import ClientError
 from ...common.utils import create_response
-from ..db.providers import get_provider
+from ...db.providers import get_provider, remove_provider_session
 
 # Initialize Cognito client
 cognito = boto3.client('cognito-idp')
 
-# Initialize database provider
-_db_provider = get_provider()
-
 def get_db_provider():
-    """Get the database provider instance."""
-    global _db_provider
-    return _db_provider
+    """
+    Get the database provider instance.
+    It is created on first use, so invocations that never touch the database, and cold
+    starts, do not set it up.
+    """
+    return get_provider()
 
 def main(event, context):
     """
@@ -37,6 +37,8 @@ def main(event, context):
             return create_response(400, {'error': 'Invalid action'})
     except Exception as e:
         return create_response(500, {'error': str(e)})
+    finally:
+        remove_provider_session()
 
 def handle_login(body):
     """
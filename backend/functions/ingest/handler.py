@@ -0,0 +1,162 @@
+import json
+import logging
+import os
+import boto3
+from itertools import chain
+from urllib.parse import unquote_plus
+from ...db.providers import get_provider, remove_provider_session
+from ...db.ingest.checkpoint import iter_csv_records, iter_rows_with_offsets
+from ...db.ingest.compression import detect_compression, iter_decompressed_chunks
+from ...db.ingest.fingerprints import RowFingerprinter
+from ...db.ingest.workout_csv import RowErrorReport, infer_date_format
+from ...db.models import WorkoutUpload
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Bytes requested from S3 at a time while streaming an object
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+# Rows inserted and checkpointed together
+INGEST_BATCH_SIZE = 1000
+
+# Stop and hand over to a new invocation when less time than this is left, in milliseconds
+TIME_MARGIN_MS = 30000
+
+_s3_client = None
+_lambda_client = None
+
+def get_s3_client():
+    """
+    Get the S3 client, creating it on first use.
+    Set S3_ENDPOINT_URL to use a local S3 such as LocalStack.
+    """
+    global _s3_client
+    if _s3_client is None:
+        _s3_client = boto3.client('s3', endpoint_url=os.environ.get('S3_ENDPOINT_URL'))
+    return _s3_client
+
+def get_lambda_client():
+    """Get the Lambda client used to continue long ingests, creating it on first use."""
+    global _lambda_client
+    if _lambda_client is None:
+        _lambda_client = boto3.client('lambda')
+    return _lambda_client
+
+def main(event, context):
+    """
+    Main handler for S3 object-created events.
+
+    Each uploaded workout CSV is streamed from S3 and inserted in batches. After every batch
+    the upload's byte offset is checkpointed with the rows, so if an invocation times out,
+    a retry resumes where it stopped. When an invocation is about to run out of time, it
+    hands the rest of the file to a new invocation itself.
+    """
+    try:
+        for record in event.get('Records', []):
+            bucket = record['s3']['bucket']['name']
+            key = unquote_plus(record['s3']['object']['key'])
+            if not ingest_object(bucket, key, context):
+                # Out of time; continue this object and the remaining ones in a new invocation
+                remaining = event['Records'][event['Records'].index(record):]
+                get_lambda_client().invoke(
+                    FunctionName=context.function_name,
+                    InvocationType='Event',
+                    Payload=json.dumps({'Records': remaining})
+                )
+                logger.info(f"Continuing ingest of s3://{bucket}/{key} in a new invocation")
+                return {'status': 'continued'}
+
+        return {'status': 'completed'}
+    finally:
+        remove_provider_session()
+
+def ingest_object(bucket, key, context):
+    """
+    Ingest one uploaded CSV object, resuming from its checkpoint if it was started before.
+
+    Returns:
+        bool: True if the object is done, False if time ran out before the end of the file
+    """
+    provider = get_provider()
+    upload = provider.get_upload_by_object_key(key)
+    if upload is None:
+        # Objects are stored under the uploading user's ID
+        upload = provider.create_object_upload(key.split('/', 1)[0], key, os.path.basename(key))
+    if upload.status in (WorkoutUpload.COMPLETED, WorkoutUpload.FAILED):
+        logger.info(f"Skipping s3://{bucket}/{key}: upload already {upload.status}")
+        return True
+
+    upload_id, user_id, checkpoint = upload.id, upload.user_id, upload.byte_offset
+    logger.info(f"Ingesting s3://{bucket}/{key} from byte {checkpoint}")
+
+    s3_object = get_s3_client().get_object(Bucket=bucket, Key=key)
+    body = s3_object['Body']
+    content_encoding = s3_object.get('ContentEncoding')
+    report = RowErrorReport()
+    fingerprinter = RowFingerprinter(user_id)
+    resume = {}
+    batch = []
+    try:
+        chunks = body.iter_chunks(STREAM_CHUNK_SIZE)
+        if checkpoint:
+            head = next(chunks, b'')
+            chunks = chain([head], chunks)
+            if detect_compression(head, content_encoding) is None:
+                # Plain text: read the header and the rows the date format was inferred
+                # from, then fetch only the rest of the file and carry on with the row
+                # number, error report and repeated-row counts stored with the checkpoint
+                header, date_format = _read_head(chunks)
+                body.close()
+                if checkpoint < s3_object['ContentLength']:
+                    body = get_s3_client().get_object(Bucket=bucket, Key=key, Range=f'bytes={checkpoint}-')['Body']
+                    chunks = body.iter_chunks(STREAM_CHUNK_SIZE)
+                else:
+                    chunks = iter(())
+                resume = {'header': header, 'byte_offset': checkpoint, 'row_num': upload.row_num,
+                          'date_format': date_format}
+                report = RowErrorReport(rows_failed=upload.rows_failed, errors=upload.errors)
+                fingerprinter = RowFingerprinter(user_id, provider.get_upload_fingerprint_counts(upload_id))
+
+        # A compressed object cannot be read from an offset, so rows before the checkpoint
+        # are parsed again without touching the database, and row numbers, the error report
+        # and the numbering of repeated rows carry on exactly as in the first run. Its
+        # offsets are positions in the uncompressed content.
+        chunks = iter_decompressed_chunks(chunks, content_encoding)
+        for row_num, end_offset, workout_data in iter_rows_with_offsets(chunks, report=report, **resume):
+            if end_offset <= checkpoint:
+                fingerprinter.fingerprint(workout_data)
+                continue
+
+            batch.append(workout_data)
+            if len(batch) >= INGEST_BATCH_SIZE:
+                provider.ingest_upload_chunk(upload_id, user_id, batch, fingerprinter, end_offset, report, row_num)
+                batch = []
+                if context is not None and context.get_remaining_time_in_millis() < TIME_MARGIN_MS:
+                    return False
+        if batch:
+            provider.ingest_upload_chunk(upload_id, user_id, batch, fingerprinter, end_offset, report, row_num)
+    except ValueError as e:
+        # Invalid rows are only reported, so this is a file that cannot be read at all,
+        # such as one with a bad header or ambiguous dates
+        report.add_fields(1, [(None, str(e))])
+        provider.set_upload_status(upload_id, WorkoutUpload.FAILED, report)
+        logger.error(f"Rejected s3://{bucket}/{key}: {str(e)}")
+        return True
+    finally:
+        body.close()
+
+    provider.set_upload_status(upload_id, WorkoutUpload.COMPLETED, report)
+    logger.info(f"Finished s3://{bucket}/{key}: {report.rows_failed} invalid rows")
+    return True
+
+def _read_head(chunks):
+    """
+    Read the header of a plain-text CSV object and infer its date format from the first rows.
+
+    Returns:
+        Tuple[bytes, str]: The header record and the name of the date format
+    """
+    records = (record for record, _ in iter_csv_records(chunks))
+    header = next(records, b'')
+    return header, infer_date_format(record.decode('utf-8') for record in chain([header], records))
@@ -1,68 +1,242 @@
 import json
+import math
 import os
+import re
 import boto3
-import base64
 import uuid
 from datetime import datetime
+from botocore.config import Config
+from botocore.exceptions import ClientError
 from ...common.utils import create_response, verify_token, get_user_from_token
+from ...db.providers import get_provider, remove_provider_session
 
-# Initialize S3 client
-s3_client = boto3.client('s3')
+# Files at least this large are uploaded in parts
+MULTIPART_THRESHOLD = 100 * 1024 * 1024
+
+# Size of each part of a multipart upload; S3 requires at least 5 MB per part
+MULTIPART_PART_SIZE = 64 * 1024 * 1024
+
+# S3 allows at most this many parts per upload
+MAX_MULTIPART_PARTS = 10000
+
+# Largest file a client may upload
+DEFAULT_MAX_UPLOAD_SIZE = 5 * 1024 * 1024 * 1024
+
+# How long presigned URLs stay valid, in seconds
+DEFAULT_URL_EXPIRY = 900
+
+# Compressed uploads the ingest function can read
+CONTENT_ENCODINGS = ('gzip', 'zstd')
+
+# Signature Version 4 signs the Content-Length of presigned PUTs, so S3 rejects a body of
+# any other size
+S3_CONFIG = Config(signature_version='s3v4')
+
+_s3_client = None
+
+def get_s3_client():
+    """
+    Get the S3 client, creating it on first use.
+    Set S3_ENDPOINT_URL to use a local S3 such as LocalStack.
+    """
+    global _s3_client
+    if _s3_client is None:
+        _s3_client = boto3.client('s3', endpoint_url=os.environ.get('S3_ENDPOINT_URL'), config=S3_CONFIG)
+    return _s3_client
 
 def main(event, context):
     """
-    Main handler for file uploads
+    Main handler for file uploads.
+
+    Files are not sent through this function. It authorizes the user, records the object
+    key the file will be stored under and returns presigned URLs, so the client streams the
+    file straight to S3.
     """
     try:
         # Parse the incoming event
-        body = json.loads(event.get('body', '{}'))
-        
+        body = json.loads(event.get('body') or '{}')
+
         # Verify authentication token
-        auth_header = event.get('headers', {}).get('Authorization')
+        auth_header = (event.get('headers') or {}).get('Authorization')
         if not auth_header or not auth_header.startswith('Bearer '):
             return create_response(401, {'error': 'Unauthorized: Missing or invalid token'})
-        
+
         token = auth_header.split(' ')[1]
         if not verify_token(token):
             return create_response(401, {'error': 'Unauthorized: Invalid token'})
-        
+
         # Get user information from token
         user = get_user_from_token(token)
         if not user:
             return create_response(401, {'error': 'Unauthorized: Could not extract user information'})
-        
-        # Get file content and name
-        file_content = body.get('file_content')
-        file_name = body.get('file_name')
-        
-        if not file_content or not file_name:
-            return create_response(400, {'error': 'File content and name are required'})
-        
-        # Decode base64 file content
-        try:
-            file_data = base64.b64decode(file_content)
-        except Exception as e:
-            return create_response(400, {'error': 'Invalid file content encoding'})
-        
-        # Generate a unique file key
-        file_key = f"{user['user_id']}/{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4()}_{file_name}"
-        
+
         # Get the S3 bucket name from environment variable
         bucket_name = os.environ.get('UPLOAD_BUCKET_NAME')
         if not bucket_name:
             return create_response(500, {'error': 'Upload bucket not configured'})
-        
-        # Upload file to S3
-        s3_client.put_object(
+
+        action = body.get('action', 'presign')
+        if action == 'presign':
+            return handle_presign(body, user, bucket_name)
+        elif action == 'complete':
+            return handle_complete(body, user, bucket_name)
+        elif action == 'abort':
+            return handle_abort(body, user, bucket_name)
+        else:
+            return create_response(400, {'error': 'Invalid action'})
+    except Exception as e:
+        return create_response(500, {'error': str(e)})
+    finally:
+        remove_provider_session()
+
+def handle_presign(body, user, bucket_name):
+    """
+    Record a new upload and return presigned URLs for it.
+
+    Files smaller than MULTIPART_THRESHOLD get a single presigned PUT URL, or a presigned
+    POST form when ``method`` is ``post``. Larger files get a multipart upload with a
+    presigned URL per part, to be finished with the ``complete`` action. Compressed files
+    declare a ``content_encoding``, which is stored with the object.
+
+    PUT URLs are signed for exactly ``file_size`` bytes, so a client cannot send more than
+    it declared; POST forms are limited to MAX_UPLOAD_SIZE by their policy.
+    """
+    file_name = body.get('file_name')
+    file_size = body.get('file_size')
+    content_type = body.get('content_type', 'text/csv')
+    method = body.get('method', 'put').lower()
+    content_encoding = body.get('content_encoding')
+
+    if not file_name:
+        return create_response(400, {'error': 'File name is required'})
+    if file_size is not None and (not isinstance(file_size, int) or file_size <= 0):
+        return create_response(400, {'error': 'File size must be a positive integer'})
+
+    max_size = int(os.environ.get('MAX_UPLOAD_SIZE', DEFAULT_MAX_UPLOAD_SIZE))
+    if file_size and file_size > max_size:
+        return create_response(413, {'error': f'File is larger than the {max_size} byte limit'})
+    if method not in ('put', 'post'):
+        return create_response(400, {'error': 'Method must be put or post'})
+    if method == 'put' and file_size is None:
+        return create_response(400, {'error': 'File size is required'})
+    if content_encoding is not None and content_encoding not in CONTENT_ENCODINGS:
+        return create_response(400, {'error': f"Content encoding must be one of: {', '.join(CONTENT_ENCODINGS)}"})
+
+    # Generate a unique file key
+    safe_name = re.sub(r'[^A-Za-z0-9._-]', '_', os.path.basename(file_name))
+    file_key = f"{user['user_id']}/{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4()}_{safe_name}"
+
+    upload = get_provider().create_object_upload(user['user_id'], file_key, file_name)
+
+    s3_client = get_s3_client()
+    expiry = int(os.environ.get('UPLOAD_URL_EXPIRY', DEFAULT_URL_EXPIRY))
+    response = {
+        'message': 'Upload URL created',
+        'upload_id': upload.id,
+        'file_key': file_key,
+        'expires_in': expiry
+    }
+
+    # Headers the client must send with the file, which S3 stores with the object
+    object_headers = {'ContentType': content_type}
+    if content_encoding:
+        object_headers['ContentEncoding'] = content_encoding
+
+    if file_size and file_size >= MULTIPART_THRESHOLD:
+        part_size = max(MULTIPART_PART_SIZE, math.ceil(file_size / MAX_MULTIPART_PARTS))
+        multipart = s3_client.create_multipart_upload(Bucket=bucket_name, Key=file_key, **object_headers)
+        response['multipart'] = {
+            's3_upload_id': multipart['UploadId'],
+            'part_size': part_size,
+            'parts': [
+                {
+                    'part_number': part_number,
+                    'url': s3_client.generate_presigned_url(
+                        'upload_part',
+                        Params={
+                            'Bucket': bucket_name,
+                            'Key': file_key,
+                            'UploadId': multipart['UploadId'],
+                            'PartNumber': part_number,
+                            'ContentLength': min(part_size, file_size - (part_number - 1) * part_size)
+                        },
+                        ExpiresIn=expiry
+                    )
+                }
+                for part_number in range(1, math.ceil(file_size / part_size) + 1)
+            ]
+        }
+    elif method == 'post':
+        fields = {'Content-Type': content_type}
+        if content_encoding:
+            fields['Content-Encoding'] = content_encoding
+        response['post'] = s3_client.generate_presigned_post(
             Bucket=bucket_name,
             Key=file_key,
-            Body=file_data,
-            ContentType='text/csv'
+            Fields=fields,
+            Conditions=[{name: value} for name, value in fields.items()] + [['content-length-range', 1, max_size]],
+            ExpiresIn=expiry
         )
-        
-        return create_response(200, {
-            'message': 'File uploaded successfully',
-            'file_key': file_key
-        })
-    except Exception as e:
-        return create_response(500, {'error': str(e)}) 
\ No newline at end of file
+    else:
+        response['url'] = s3_client.generate_presigned_url(
+            'put_object',
+            Params={'Bucket': bucket_name, 'Key': file_key, 'ContentLength': file_size, **object_headers},
+            ExpiresIn=expiry
+        )
+
+    return create_response(200, response)
+
+def _owns_key(user, file_key):
+    """Check that an object key belongs to the user."""
+    return bool(file_key) and file_key.startswith(f"{user['user_id']}/")
+
+def handle_complete(body, user, bucket_name):
+    """
+    Finish a multipart upload once the client has uploaded every part.
+    """
+    file_key = body.get('file_key')
+    s3_upload_id = body.get('s3_upload_id')
+    parts = body.get('parts')
+
+    if not s3_upload_id or not parts:
+        return create_response(400, {'error': 'Upload ID and parts are required'})
+    if not _owns_key(user, file_key):
+        return create_response(403, {'error': 'Forbidden'})
+
+    try:
+        get_s3_client().complete_multipart_upload(
+            Bucket=bucket_name,
+            Key=file_key,
+            UploadId=s3_upload_id,
+            MultipartUpload={
+                'Parts': [{'PartNumber': part['part_number'], 'ETag': part['etag']} for part in parts]
+            }
+        )
+    except (KeyError, TypeError):
+        return create_response(400, {'error': 'Each part needs a part_number and etag'})
+    except ClientError as e:
+        return create_response(400, {'error': e.response['Error']['Message']})
+
+    return create_response(200, {
+        'message': 'File uploaded successfully',
+        'file_key': file_key
+    })
+
+def handle_abort(body, user, bucket_name):
+    """
+    Cancel a multipart upload and discard the parts uploaded so far.
+    """
+    file_key = body.get('file_key')
+    s3_upload_id = body.get('s3_upload_id')
+
+    if not s3_upload_id:
+        return create_response(400, {'error': 'Upload ID is required'})
+    if not _owns_key(user, file_key):
+        return create_response(403, {'error': 'Forbidden'})
+
+    try:
+        get_s3_client().abort_multipart_upload(Bucket=bucket_name, Key=file_key, UploadId=s3_upload_id)
+    except ClientError as e:
+        return create_response(400, {'error': e.response['Error']['Message']})
+
+    return create_response(200, {'message': 'Upload aborted'})
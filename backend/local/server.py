@@ -8,7 +8,12 @@ from pathlib import Path
 from datetime import datetime, timedelta
 import jwt
 from db.providers import get_provider
-from db.setup import setup_database
+from db.ingest.compression import open_decompressed
+from db.ingest.jobs import get_job_queue, IngestQueueFullError
+from db.ingest.workout_csv import read_header
+from db.models import WorkoutDailySummary, WorkoutHistory
+from db.pagination import decode_workout_cursor, encode_workout_cursor
+from db.setup import is_database_current, setup_database
 from common.env import load_environment
 import boto3
 import openai
@@ -19,6 +24,7 @@ import time
 from requests.exceptions import RequestException
 import random
 import csv
+import tempfile
 from io import StringIO
 
 # Ensure log directory exists and is writable
@@ -68,18 +74,26 @@ app = Flask(__name__)
 CORS(app, supports_credentials=True, resources={
     r"/*": {
         "origins": ["http://localhost:3000"],
-        "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+        "methods": ["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
         "allow_headers": ["Content-Type", "Authorization"],
-        "expose_headers": ["Content-Type", "Authorization"],
+        "expose_headers": ["Content-Type", "Authorization", "X-Next-Cursor"],
         "supports_credentials": True
     }
 })
 
 def verify_db_ready():
-    """Verify that the database is ready and initialized."""
+    """
+    Verify that the database is ready and initialized.
+
+    The database is set up and migrated at boot unless DATABASE_MIGRATE_ON_START=false, as
+    for workers that are scaled out. Those only check that the schema is at head, and
+    migrations are run once beforehand with `python -m db.setup`.
+    """
     try:
-        # Initialize database
-        setup_database()
+        if os.getenv('DATABASE_MIGRATE_ON_START', 'true').lower() == 'true':
+            setup_database()
+        elif not is_database_current():
+            raise RuntimeError("Database schema is not up to date; run `python -m db.setup` first")
         
         # Test connection
         db = get_provider()
@@ -94,6 +108,11 @@ def verify_db_ready():
 # Verify database is ready before starting
 verify_db_ready()
 
+@app.teardown_appcontext
+def remove_db_session(exception=None):
+    """End the request's database session, returning its connection to the pool."""
+    get_provider().remove_session()
+
 # Configure LocalStack S3 client
 s3 = boto3.client(
     's3',
@@ -160,66 +179,290 @@ def upload_file():
 
         logger.info(f"Processing file: {file.filename}")
         
-        # Read the CSV content
-        csv_content = file.read().decode('utf-8')
-        logger.info(f"Read {len(csv_content)} bytes from CSV file")
+        options = {
+            # Optional date format (e.g. DD/MM/YYYY) for files whose dates are ambiguous
+            'date_format': request.args.get('date_format'),
+            # Parse the file on several cores
+            'parallel': request.args.get('parallel', 'false').lower() == 'true',
+            # Insert the valid rows even if some rows are invalid, instead of rejecting the file
+            'partial': request.args.get('partial', 'false').lower() == 'true',
+            # gzip or zstd compressed files; also detected from the file's magic bytes
+            'content_encoding': file.headers.get('Content-Encoding') or file.mimetype
+        }
         
-        # Process the CSV using the provider
-        db = get_provider()
-        logger.info("Processing CSV content...")
-        processed_records = db.process_workout_csv(user_id, csv_content)
-        logger.info(f"Successfully processed {len(processed_records)} records")
+        # Spool the upload to disk and hand it to the ingest workers, so the request
+        # returns immediately regardless of file size
+        with tempfile.NamedTemporaryFile(suffix='.csv', dir=os.getenv('INGEST_SPOOL_DIR'), delete=False) as tmp:
+            upload_path = tmp.name
+        file.save(upload_path)
+        
+        # A file with a bad header is rejected now, rather than by the job
+        try:
+            with open(upload_path, 'rb') as f:
+                read_header(open_decompressed(f, options['content_encoding']))
+        except (ValueError, OSError) as e:
+            os.remove(upload_path)
+            logger.error(f"Rejected upload: {str(e)}")
+            return jsonify({'error': str(e)}), 400
+        
+        try:
+            job = get_job_queue().submit(user_id, upload_path, file.filename, options)
+        except IngestQueueFullError as e:
+            os.remove(upload_path)
+            logger.error(f"Rejected upload: {str(e)}")
+            return jsonify({'error': str(e)}), 503
+        logger.info(f"Queued ingest job {job.job_id}")
         
         return jsonify({
-            'message': 'File processed successfully',
-            'records_processed': len(processed_records),
-            'records': processed_records
-        })
+            'message': 'File accepted for processing',
+            'job_id': job.job_id,
+            'status_url': f"/upload/{job.job_id}",
+            'status': job.status
+        }), 202
 
     except Exception as e:
         logger.error(f"Error processing upload: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/upload/<job_id>', methods=['GET'])
+@require_auth
+def get_upload_status(job_id):
+    try:
+        user_id = request.user['sub']
+        job = get_job_queue().get(job_id)
+        if job is None or job.user_id != user_id:
+            return jsonify({'error': 'Upload job not found'}), 404
+        
+        response = job.to_dict()
+        
+        # Inserted records are only returned when asked for, one page at a time. When there
+        # are more, next_cursor is passed back as the cursor parameter for the next page.
+        if request.args.get('include_records', 'false').lower() == 'true' and job.upload_id is not None:
+            page_size = min(max(request.args.get('page_size', 100, type=int), 1), 1000)
+            try:
+                after_id = int(request.args['cursor']) if request.args.get('cursor') else None
+            except ValueError:
+                return jsonify({'error': 'Invalid cursor'}), 400
+            records = get_provider().get_upload_records(user_id, job.upload_id,
+                                                        after_id=after_id, limit=page_size + 1)
+            response['records'] = [workout_to_dict(record) for record in records[:page_size]]
+            response['page_size'] = page_size
+            response['next_cursor'] = str(records[page_size - 1].id) if len(records) > page_size else None
+        
+        return jsonify(response)
+        
+    except Exception as e:
+        logger.error(f"Error getting upload status: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+def workout_to_dict(workout, fields=WorkoutHistory.FIELDS):
+    """
+    Convert a workout record, a row from get_workout_rows or a daily summary to a
+    dictionary for JSON serialization, keeping only the given fields.
+    """
+    data = {}
+    for field in fields:
+        value = getattr(workout, field)
+        data[field] = value.isoformat() if field in ('date', 'created_at') else value
+    return data
+
+def parse_date_arg(name):
+    """Parse an optional YYYY-MM-DD query parameter, raising ValueError if it is malformed."""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f"{name} must be a date in YYYY-MM-DD format")
+
 @app.route('/workout-history', methods=['GET'])
 @require_auth
 def get_workout_history():
+    """
+    Get the user's workout history, newest first, one page at a time.
+
+    Query parameters start_date, end_date (YYYY-MM-DD), exercise and category filter the
+    records; without either date the last 90 days are returned, and with only an end_date
+    every record up to it is. At most limit records are returned per page (default 500, up
+    to 1000). When there are more, the X-Next-Cursor response header holds a cursor to pass
+    back as the cursor parameter for the next page.
+    A comma-separated fields parameter (e.g. date,exercise,weight) limits the fields
+    returned for each record. Records are read from a replica when there is one; pass
+    consistent=true to read from the primary, e.g. right after an upload.
+    """
     try:
         user_id = request.user['sub']
         db = get_provider()
+        limit = min(max(request.args.get('limit', 500, type=int), 1), 1000)
         
-        # Calculate date 3 months ago
-        three_months_ago = datetime.now() - timedelta(days=90)
-        
-        # Fetch workout history using the provider
-        workouts = db.get_workout_records(user_id, start_date=three_months_ago)
-        logger.info(f"Found {len(workouts)} workout records for user {user_id}")
+        try:
+            start_date = parse_date_arg('start_date')
+            end_date = parse_date_arg('end_date')
+            after = decode_workout_cursor(request.args['cursor']) if request.args.get('cursor') else None
+            fields = WorkoutHistory.FIELDS
+            if request.args.get('fields'):
+                fields = [field.strip() for field in request.args['fields'].split(',') if field.strip()]
+            
+            if start_date is None and end_date is None:
+                # Calculate date 3 months ago
+                start_date = (datetime.now() - timedelta(days=90)).date()
+            
+            # Only the requested columns are loaded, as plain rows. One more record than the
+            # page holds is fetched to tell whether another page follows.
+            workouts = db.get_workout_rows(user_id, fields, start_date=start_date, end_date=end_date,
+                                           exercise=request.args.get('exercise'),
+                                           category=request.args.get('category'),
+                                           limit=limit + 1, after=after,
+                                           use_primary=request.args.get('consistent') == 'true')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        has_more = len(workouts) > limit
+        workouts = workouts[:limit]
         
         # Convert to list of dictionaries for JSON serialization
-        workout_list = []
-        for workout in workouts:
-            workout_dict = {
-                'id': workout.id,
-                'date': workout.date.isoformat(),
-                'exercise': workout.exercise,
-                'category': workout.category,
-                'weight': workout.weight,
-                'weight_unit': workout.weight_unit,
-                'reps': workout.reps,
-                'distance': workout.distance,
-                'distance_unit': workout.distance_unit,
-                'time': workout.time,
-                'comment': workout.comment,
-                'created_at': workout.created_at.isoformat()
-            }
-            workout_list.append(workout_dict)
+        workout_list = [workout_to_dict(workout, fields) for workout in workouts]
         
-        logger.info(f"Returning {len(workout_list)} workout records")
-        return jsonify(workout_list)
+        logger.info(f"Returning {len(workout_list)} workout records for user {user_id}")
+        response = jsonify(workout_list)
+        if has_more:
+            response.headers['X-Next-Cursor'] = encode_workout_cursor(workouts[-1])
+        return response
         
     except Exception as e:
         logger.error(f"Error getting workout history: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+def parse_date_value(name, value):
+    """Parse an optional YYYY-MM-DD value from a JSON body, raising ValueError if it is malformed."""
+    if value is None:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a date in YYYY-MM-DD format")
+
+def parse_workout_selection(body):
+    """
+    Get the records picked by a bulk request body: a list of record ids and/or the filters
+    start_date, end_date (YYYY-MM-DD), exercise, category and upload_id.
+    """
+    ids = body.get('ids')
+    if ids is not None and (not isinstance(ids, list) or
+                            not all(isinstance(i, int) and not isinstance(i, bool) for i in ids)):
+        raise ValueError("ids must be a list of record ids")
+    upload_id = body.get('upload_id')
+    if upload_id is not None and (not isinstance(upload_id, int) or isinstance(upload_id, bool)):
+        raise ValueError("upload_id must be an upload id")
+    for name in ('exercise', 'category'):
+        if body.get(name) is not None and not isinstance(body[name], str):
+            raise ValueError(f"{name} must be a string")
+    return {
+        'ids': ids,
+        'start_date': parse_date_value('start_date', body.get('start_date')),
+        'end_date': parse_date_value('end_date', body.get('end_date')),
+        'exercise': body.get('exercise'),
+        'category': body.get('category'),
+        'upload_id': upload_id,
+    }
+
+@app.route('/workout-history', methods=['PATCH'])
+@require_auth
+def update_workout_history():
+    """
+    Make the same changes to many of the user's workout records at once.
+
+    The JSON body picks records as parse_workout_selection describes and holds the new
+    values in changes, e.g. {"ids": [1, 2], "changes": {"weight": 60}}. Only the user's own
+    records are changed. Returns the number of records changed.
+    """
+    try:
+        user_id = request.user['sub']
+        db = get_provider()
+        body = request.get_json(silent=True) or {}
+        
+        try:
+            selection = parse_workout_selection(body)
+            changes = body.get('changes')
+            if not isinstance(changes, dict):
+                raise ValueError("changes must be an object of field values")
+            if 'date' in changes:
+                changes = {**changes, 'date': parse_date_value('date', changes['date'])}
+            updated = db.update_workout_records(user_id, changes, **selection)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        logger.info(f"Updated {updated} workout records for user {user_id}")
+        return jsonify({'updated': updated})
+        
+    except Exception as e:
+        logger.error(f"Error updating workout history: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/workout-history', methods=['DELETE'])
+@require_auth
+def delete_workout_history():
+    """
+    Delete many of the user's workout records at once.
+
+    The JSON body picks records as parse_workout_selection describes, e.g.
+    {"upload_id": 12} or {"exercise": "Squat", "end_date": "2023-12-31"}. Only the user's
+    own records are deleted. Returns the number of records deleted.
+    """
+    try:
+        user_id = request.user['sub']
+        db = get_provider()
+        body = request.get_json(silent=True) or {}
+        
+        try:
+            deleted = db.delete_workout_records(user_id, **parse_workout_selection(body))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        logger.info(f"Deleted {deleted} workout records for user {user_id}")
+        return jsonify({'deleted': deleted})
+        
+    except Exception as e:
+        logger.error(f"Error deleting workout history: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/workout-summary', methods=['GET'])
+@require_auth
+def get_workout_summary():
+    """
+    Get the user's workout totals per day and exercise, newest first: the number of sets,
+    total reps, total volume (weight x reps) and heaviest weight.
+
+    Query parameters start_date, end_date (YYYY-MM-DD), exercise and category filter the
+    summaries; without either date the last 90 days are returned, and with only an end_date
+    every day up to it is. Pass consistent=true to read from the primary database rather
+    than a replica.
+    """
+    try:
+        user_id = request.user['sub']
+        db = get_provider()
+        
+        try:
+            start_date = parse_date_arg('start_date')
+            end_date = parse_date_arg('end_date')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if start_date is None and end_date is None:
+            start_date = (datetime.now() - timedelta(days=90)).date()
+        
+        summaries = db.get_daily_summaries(user_id, start_date=start_date, end_date=end_date,
+                                           exercise=request.args.get('exercise'),
+                                           category=request.args.get('category'),
+                                           use_primary=request.args.get('consistent') == 'true')
+        summary_list = [workout_to_dict(summary, WorkoutDailySummary.FIELDS) for summary in summaries]
+        
+        logger.info(f"Returning {len(summary_list)} workout summaries for user {user_id}")
+        return jsonify(summary_list)
+        
+    except Exception as e:
+        logger.error(f"Error getting workout summary: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/analyze-workouts', methods=['POST'])
 @require_auth
 def analyze_workouts():
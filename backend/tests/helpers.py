@@ -0,0 +1,36 @@
+"""
+Database providers shared by the tests.
+They stand in for the deployed database: a SQLite file, or the Postgres database at
+TEST_DATABASE_URL when one is available.
+"""
+import os
+import sys
+
+# Add the parent directory to the path to import the db package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from db.models import Base
+from db.providers.local_database_provider import LocalDatabaseProvider
+
+class SqliteDatabaseProvider(LocalDatabaseProvider):
+    """Local provider backed by a SQLite file, standing in for Postgres."""
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+
+    def get_connection_url(self):
+        return f"sqlite:///{self.path}"
+
+    def connect(self):
+        super().connect()
+        Base.metadata.create_all(self._engine)
+
+class UrlDatabaseProvider(LocalDatabaseProvider):
+    """Local provider for the database at TEST_DATABASE_URL."""
+
+    def get_connection_url(self):
+        return os.environ['TEST_DATABASE_URL']
+
+    def connect(self):
+        super().connect()
+        Base.metadata.create_all(self._engine)
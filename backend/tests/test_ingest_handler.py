@@ -0,0 +1,138 @@
+import gzip
+import os
+import sys
+import pytest
+from unittest.mock import patch, MagicMock
+
+moto = pytest.importorskip('moto')
+import boto3
+
+# Add the repository root to the path; the handler uses package-relative imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from backend.functions.ingest import handler
+from helpers import SqliteDatabaseProvider
+from db.models import WorkoutHistory, WorkoutUpload
+
+BUCKET = 'test-upload-bucket'
+
+class MockContext:
+    def __init__(self, remaining_ms=300000):
+        self.function_name = 'ingest-function'
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_ms
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    with moto.mock_aws():
+        client = boto3.client('s3', region_name='us-east-1')
+        client.create_bucket(Bucket=BUCKET)
+        monkeypatch.setattr(handler, '_s3_client', client)
+        yield client
+
+@pytest.fixture
+def provider(tmp_path):
+    db_provider = SqliteDatabaseProvider(tmp_path / 'ingest.db')
+    db_provider.connect()
+    user = db_provider.create_user('testuser', 'test@example.com', 'hash')
+    db_provider.user_id = user.user_id
+    with patch.object(handler, 'get_provider', return_value=db_provider):
+        yield db_provider
+    db_provider.disconnect()
+
+def create_event(key):
+    return {'Records': [{'s3': {'bucket': {'name': BUCKET}, 'object': {'key': key}}}]}
+
+@pytest.mark.upload
+def test_ingest_streams_object_into_database(s3, provider):
+    # Setup
+    key = f"{provider.user_id}/workouts.csv"
+    s3.put_object(Bucket=BUCKET, Key=key, Body=(
+        b"date,exercise,category,reps\n"
+        b"2024-03-14,Squat,Strength,5\n"
+        b"2024-03-14,Squat,Strength,x\n"
+        b"2024-03-15,Bench Press,Strength,8\n"
+    ))
+
+    # Execute
+    result = handler.main(create_event(key), MockContext())
+
+    # Verify
+    upload = provider.get_upload_by_object_key(key)
+    assert result == {'status': 'completed'}
+    assert upload.status == WorkoutUpload.COMPLETED
+    assert upload.records_inserted == 2
+    assert upload.rows_failed == 1
+    assert upload.errors[0]['row'] == 3
+    assert provider._session.query(WorkoutHistory).filter(WorkoutHistory.upload_id == upload.id).count() == 2
+
+@pytest.mark.upload
+def test_ingest_resumes_from_checkpoint(s3, provider, monkeypatch):
+    # Setup: identical sets on both sides of the checkpoint must all be kept, and invalid
+    # rows on both sides must be reported with their row numbers
+    monkeypatch.setattr(handler, 'INGEST_BATCH_SIZE', 3)
+    key = f"{provider.user_id}/sets.csv"
+    header, row = b"date,exercise,category,reps\n", b"2024-03-14,Squat,Strength,5\n"
+    s3.put_object(Bucket=BUCKET, Key=key, Body=header + row + b"2024-03-14,Squat,Strength,x\n" + row * 3
+                  + b"2024-03-14,Squat,Strength,y\n" + row)
+    lambda_client = MagicMock()
+    monkeypatch.setattr(handler, '_lambda_client', lambda_client)
+    get_object = MagicMock(wraps=s3.get_object)
+    monkeypatch.setattr(s3, 'get_object', get_object)
+
+    # Execute: the first invocation runs out of time after one batch
+    first = handler.main(create_event(key), MockContext(remaining_ms=1000))
+    checkpoint = provider.get_upload_by_object_key(key).byte_offset
+    second = handler.main(create_event(key), MockContext())
+
+    # Verify
+    upload = provider.get_upload_by_object_key(key)
+    assert first == {'status': 'continued'}
+    lambda_client.invoke.assert_called_once()
+    assert checkpoint == len(header) + 3 * len(row) + len(b"2024-03-14,Squat,Strength,x\n")
+    assert get_object.call_args.kwargs['Range'] == f'bytes={checkpoint}-'
+    assert second == {'status': 'completed'}
+    assert upload.records_inserted == 5
+    assert upload.records_skipped == 0
+    assert upload.rows_failed == 2
+    assert [error['row'] for error in upload.errors] == [3, 7]
+    assert provider._session.query(WorkoutHistory).count() == 5
+    assert provider.get_upload_fingerprint_counts(upload.id) == {}
+
+@pytest.mark.upload
+def test_ingest_resumes_compressed_object_from_start(s3, provider, monkeypatch):
+    # Setup
+    monkeypatch.setattr(handler, 'INGEST_BATCH_SIZE', 3)
+    key = f"{provider.user_id}/sets.csv.gz"
+    s3.put_object(Bucket=BUCKET, Key=key, ContentEncoding='gzip', Body=gzip.compress(
+        b"date,exercise,category,reps\n" + b"2024-03-14,Squat,Strength,5\n" * 5
+    ))
+    monkeypatch.setattr(handler, '_lambda_client', MagicMock())
+
+    # Execute
+    handler.main(create_event(key), MockContext(remaining_ms=1000))
+    result = handler.main(create_event(key), MockContext())
+
+    # Verify
+    upload = provider.get_upload_by_object_key(key)
+    assert result == {'status': 'completed'}
+    assert upload.records_inserted == 5
+    assert provider._session.query(WorkoutHistory).count() == 5
+
+@pytest.mark.upload
+def test_ingest_rejects_unreadable_header(s3, provider):
+    # Setup
+    key = f"{provider.user_id}/bad.csv"
+    s3.put_object(Bucket=BUCKET, Key=key, Body=b"when,what\n2024-03-14,Squat\n")
+
+    # Execute
+    handler.main(create_event(key), MockContext())
+
+    # Verify
+    upload = provider.get_upload_by_object_key(key)
+    assert upload.status == WorkoutUpload.FAILED
+    assert 'Missing required columns' in upload.errors[0]['reason']
@@ -0,0 +1,143 @@
+import os
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+import pytest
+from alembic.config import Config
+from alembic.runtime.environment import EnvironmentContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import create_engine, inspect, text
+
+# Add the parent directory to the path to import the db package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from db.maintenance import detach_workout_partition, ensure_workout_partitions, get_partition_years
+from db.models import Base
+
+MIGRATIONS = Path(__file__).parent.parent / 'db' / 'migrations'
+
+# The revision before workout history was partitioned, and the one that partitions it
+UNPARTITIONED_REVISION = '3366a70d7110'
+PARTITIONED_REVISION = '96db0e579870'
+
+def migrate(engine, revision):
+    """Upgrade the database to a revision, as `alembic upgrade` does."""
+    config = Config()
+    config.set_main_option('script_location', str(MIGRATIONS))
+    script = ScriptDirectory.from_config(config)
+    with engine.connect() as conn:
+        with EnvironmentContext(config, script, fn=lambda rev, context: script._upgrade_revs(revision, rev)) as env:
+            env.configure(connection=conn)
+            with env.begin_transaction():
+                env.run_migrations()
+        conn.commit()
+
+def add_workouts(engine, dates):
+    """Add workouts to a database at UNPARTITIONED_REVISION."""
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO users (user_id, username, email, password_hash, given_name, family_name) "
+            "VALUES ('u1', 'alice', 'alice@example.com', 'hash', 'Alice', '') ON CONFLICT DO NOTHING"
+        ))
+        for workout_date in dates:
+            conn.execute(text(
+                "INSERT INTO workout_history (user_id, date, exercise, category) "
+                "VALUES ('u1', :date, 'Squat', 'Strength')"
+            ), {'date': workout_date})
+
+@pytest.fixture
+def engine():
+    url = os.environ.get('TEST_DATABASE_URL', '')
+    if not url.startswith('postgresql'):
+        pytest.skip('TEST_DATABASE_URL does not point at a Postgres database')
+    db_engine = create_engine(url)
+    migrate(db_engine, UNPARTITIONED_REVISION)
+    yield db_engine
+    with db_engine.begin() as conn:
+        # Partitions go with their table; detached ones are dropped on their own
+        for table in inspect(conn).get_table_names():
+            conn.execute(text(f'DROP TABLE IF EXISTS "{table}" CASCADE'))
+    db_engine.dispose()
+
+@pytest.mark.db
+def test_migration_partitions_existing_workouts_by_year(engine):
+    # Setup
+    add_workouts(engine, [date(2019, 5, 1), date(2023, 5, 1), date(2023, 6, 1)])
+    this_year = date.today().year
+
+    # Execute
+    migrate(engine, PARTITIONED_REVISION)
+
+    # Verify
+    with engine.connect() as conn:
+        assert get_partition_years(conn) == [2019, 2023, this_year, this_year + 1]
+        counts = dict(conn.execute(text(
+            "SELECT tableoid::regclass::text, count(*) FROM workout_history GROUP BY 1"
+        )).all())
+    assert counts == {'workout_history_y2019': 1, 'workout_history_y2023': 2}
+
+@pytest.mark.db
+def test_recent_history_query_scans_only_recent_partitions(engine):
+    # Setup
+    add_workouts(engine, [date(2019, 5, 1), date(2023, 5, 1)])
+    migrate(engine, 'head')
+    start = date.today() - timedelta(days=90)
+
+    # Execute
+    with engine.connect() as conn:
+        plan = '\n'.join(conn.execute(text(
+            "EXPLAIN SELECT * FROM workout_history WHERE user_id = 'u1' AND date >= :start"
+        ), {'start': start}).scalars())
+
+    # Verify
+    assert 'workout_history_y2019' not in plan
+    assert 'workout_history_y2023' not in plan
+    assert f'workout_history_y{date.today().year}' in plan
+
+@pytest.mark.db
+def test_maintenance_moves_default_rows_into_new_partitions(engine):
+    # Setup
+    add_workouts(engine, [date(2023, 5, 1)])
+    migrate(engine, 'head')
+    this_year = date.today().year
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO workout_history (user_id, date, exercise_id, category_id) "
+            "SELECT user_id, '2021-03-01', exercise_id, category_id FROM workout_history"
+        ))
+
+    # Execute
+    created = ensure_workout_partitions(engine, years_ahead=2)
+
+    # Verify
+    assert created == ['workout_history_y2021', f'workout_history_y{this_year + 2}']
+    assert ensure_workout_partitions(engine, years_ahead=2) == []
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM workout_history_default")).scalar() == 0
+        assert conn.execute(text("SELECT count(*) FROM workout_history_y2021")).scalar() == 1
+
+@pytest.mark.db
+def test_detached_partition_keeps_its_workouts(engine):
+    # Setup
+    add_workouts(engine, [date(2019, 5, 1), date(2023, 5, 1)])
+    migrate(engine, 'head')
+
+    # Execute
+    detach_workout_partition(engine, 2019)
+
+    # Verify
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM workout_history")).scalar() == 1
+        assert conn.execute(text("SELECT count(*) FROM workout_history_y2019")).scalar() == 1
+    with pytest.raises(ValueError):
+        detach_workout_partition(engine, 2019)
+
+@pytest.mark.db
+def test_maintenance_skips_unpartitioned_tables(tmp_path):
+    # Setup
+    engine = create_engine(f"sqlite:///{tmp_path / 'maintenance.db'}")
+    Base.metadata.create_all(engine)
+
+    # Execute / Verify
+    assert ensure_workout_partitions(engine) == []
+    with pytest.raises(ValueError):
+        detach_workout_partition(engine, 2019)
@@ -0,0 +1,224 @@
+import importlib
+import os
+import sys
+import time
+from io import BytesIO
+import pytest
+
+# Add the parent directory to the path to import the local server
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from helpers import SqliteDatabaseProvider
+import common.env
+import db.providers
+import db.setup
+from db.ingest import jobs
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    """The local server, with its database and ingest queue replaced by test ones."""
+    provider = SqliteDatabaseProvider(tmp_path / 'server.db')
+    provider.connect()
+    monkeypatch.setattr(common.env, '_environment_loaded', True)
+    monkeypatch.setenv('JWT_SECRET', 'test-secret')
+    monkeypatch.setenv('OPENAI_API_KEY', 'sk-test')
+    monkeypatch.setenv('DATABASE_MIGRATE_ON_START', 'false')
+    monkeypatch.setattr(db.providers, 'get_provider', lambda: provider)
+    monkeypatch.setattr(db.setup, 'is_database_current', lambda engine=None: True)
+
+    module = importlib.import_module('local.server')
+    monkeypatch.setattr(module, 'get_provider', lambda: provider)
+    monkeypatch.setattr(jobs, 'get_provider', lambda: provider)
+    monkeypatch.setattr(jobs, '_queue_instance', jobs.LocalIngestJobQueue(workers=1))
+    yield module, provider
+    provider.disconnect()
+
+def auth_headers(user_id):
+    from local.auth import generate_token
+    return {'Authorization': f"Bearer {generate_token(user_id, f'{user_id}@example.com')}"}
+
+def upload(client, headers, content, **query):
+    return client.post('/upload', query_string=query, headers=headers,
+                       data={'file': (BytesIO(content), 'workouts.csv')},
+                       content_type='multipart/form-data')
+
+def wait_for_job(client, headers, job_id):
+    for _ in range(100):
+        response = client.get(f'/upload/{job_id}', headers=headers)
+        if response.get_json()['status'] in ('succeeded', 'failed'):
+            return response
+        time.sleep(0.05)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+@pytest.mark.upload
+def test_upload_is_queued_and_its_status_polled(server):
+    # Setup
+    module, provider = server
+    user_id = provider.create_user('alice', 'alice@example.com', 'hash').user_id
+    headers = auth_headers(user_id)
+    client = module.app.test_client()
+
+    # Execute
+    response = upload(client, headers, b"date,exercise,category,reps\n2024-03-14,Squat,Strength,5\n")
+    status = wait_for_job(client, headers, response.get_json()['job_id'])
+
+    # Verify
+    assert response.status_code == 202
+    assert response.get_json()['status_url'] == f"/upload/{response.get_json()['job_id']}"
+    assert status.status_code == 200
+    assert status.get_json()['status'] == 'succeeded'
+    assert status.get_json()['records_inserted'] == 1
+
+@pytest.mark.upload
+def test_upload_with_bad_header_is_rejected_before_queueing(server):
+    # Setup
+    module, provider = server
+    user_id = provider.create_user('alice', 'alice@example.com', 'hash').user_id
+    client = module.app.test_client()
+
+    # Execute
+    response = upload(client, auth_headers(user_id), b"date,exercise\n2024-03-14,Squat\n")
+
+    # Verify
+    assert response.status_code == 400
+    assert 'Missing required columns' in response.get_json()['error']
+
+@pytest.mark.upload
+def test_upload_with_bad_rows_fails_with_row_errors(server):
+    # Setup
+    module, provider = server
+    user_id = provider.create_user('alice', 'alice@example.com', 'hash').user_id
+    headers = auth_headers(user_id)
+    client = module.app.test_client()
+
+    # Execute
+    response = upload(client, headers, b"date,exercise,category,reps\n2024-03-14,Squat,Strength,five\n")
+    status = wait_for_job(client, headers, response.get_json()['job_id']).get_json()
+
+    # Verify
+    assert response.status_code == 202
+    assert status['status'] == 'failed'
+    assert status['rows_failed'] == 1
+    assert [(error['row'], error['column']) for error in status['errors']] == [(2, 'reps')]
+
+@pytest.mark.upload
+def test_job_counts_failed_rows_as_each_batch_is_parsed(server, tmp_path, monkeypatch):
+    # Setup
+    module, provider = server
+    monkeypatch.setenv('CSV_PARSER_BACKEND', 'csv')
+    user_id = provider.create_user('alice', 'alice@example.com', 'hash').user_id
+    path = tmp_path / 'workouts.csv'
+    path.write_bytes(b"date,exercise,category,reps\n2024-03-01,Squat,Strength,5\n2024-03-02,Squat,Strength,x\n"
+                     b"2024-03-03,Squat,Strength,5\n2024-03-04,Squat,Strength,5\n"
+                     b"2024-03-05,Squat,Strength,x\n2024-03-06,Squat,Strength,5\n")
+    job = jobs.IngestJob(user_id, str(path), 'workouts.csv', {'partial': True})
+    seen = []
+    stream_csv = provider.process_workout_csv_stream
+
+    def stream_in_small_chunks(user_id, stream, progress=None, **options):
+        def observe(rows_done, rows_failed):
+            progress(rows_done, rows_failed)
+            seen.append((job.rows_done, job.rows_failed))
+        return stream_csv(user_id, stream, chunk_size=2, progress=observe, **options)
+
+    monkeypatch.setattr(provider, 'process_workout_csv_stream', stream_in_small_chunks)
+
+    # Execute
+    jobs.run_ingest_job(job, provider)
+
+    # Verify
+    assert seen == [(2, 1), (4, 2)]
+    assert (job.status, job.rows_done, job.rows_failed) == (jobs.IngestJob.SUCCEEDED, 4, 2)
+
+@pytest.mark.upload
+def test_upload_status_is_only_shown_to_its_owner(server):
+    # Setup
+    module, provider = server
+    alice = provider.create_user('alice', 'alice@example.com', 'hash').user_id
+    bob = provider.create_user('bob', 'bob@example.com', 'hash').user_id
+    client = module.app.test_client()
+    response = upload(client, auth_headers(alice), b"date,exercise,category\n2024-03-14,Squat,Strength\n")
+    job_id = response.get_json()['job_id']
+    wait_for_job(client, auth_headers(alice), job_id)
+
+    # Execute / Verify
+    assert client.get(f'/upload/{job_id}', headers=auth_headers(bob)).status_code == 404
+    assert client.get('/upload/unknown', headers=auth_headers(alice)).status_code == 404
+    assert client.post('/upload', data={}).status_code == 401
+
+@pytest.mark.upload
+def test_upload_status_summarizes_the_file_without_its_records(server):
+    # Setup
+    module, provider = server
+    user_id = provider.create_user('alice', 'alice@example.com', 'hash').user_id
+    headers = auth_headers(user_id)
+    client = module.app.test_client()
+    first = upload(client, headers, b"date,exercise,category,reps\n2024-03-14,Squat,Strength,5\n"
+                                    b"2024-03-15,Bench,Strength,8\n")
+    wait_for_job(client, headers, first.get_json()['job_id'])
+
+    # Execute
+    response = upload(client, headers, b"date,exercise,category,reps\n2024-03-14,Squat,Strength,5\n"
+                                       b"2024-03-15,Bench,Strength,8\n2024-03-17,Run,Cardio,1\n")
+    status = wait_for_job(client, headers, response.get_json()['job_id']).get_json()
+
+    # Verify
+    assert status['status'] == 'succeeded'
+    assert (status['records_inserted'], status['records_skipped']) == (1, 2)
+    assert status['summary'] == {
+        'count': 3, 'inserted': 1, 'skipped': 2, 'failed': 0,
+        'first_date': '2024-03-14', 'last_date': '2024-03-17',
+        'exercises': ['Bench', 'Run', 'Squat']
+    }
+    assert 'records' not in status
+
+@pytest.mark.upload
+def test_upload_records_are_paged_with_a_cursor(server):
+    # Setup
+    module, provider = server
+    user_id = provider.create_user('alice', 'alice@example.com', 'hash').user_id
+    headers = auth_headers(user_id)
+    client = module.app.test_client()
+    content = b"date,exercise,category,reps\n" + b"".join(
+        f"2024-03-{day:02d},Squat,Strength,5\n".encode() for day in range(1, 6))
+    job_id = upload(client, headers, content).get_json()['job_id']
+    wait_for_job(client, headers, job_id)
+
+    # Execute
+    first = client.get(f'/upload/{job_id}?include_records=true&page_size=2', headers=headers).get_json()
+    # Records deleted between pages do not shift the pages after them
+    client.delete('/workout-history', json={'ids': [first['records'][0]['id']]}, headers=headers)
+    pages, cursor = [first], first['next_cursor']
+    while cursor:
+        page = client.get(f'/upload/{job_id}?include_records=true&page_size=2&cursor={cursor}',
+                          headers=headers).get_json()
+        pages.append(page)
+        cursor = page['next_cursor']
+    invalid = client.get(f'/upload/{job_id}?include_records=true&cursor=last', headers=headers)
+
+    # Verify
+    assert [[record['date'] for record in page['records']] for page in pages] == [
+        ['2024-03-01', '2024-03-02'], ['2024-03-03', '2024-03-04'], ['2024-03-05']
+    ]
+    assert invalid.status_code == 400
+
+@pytest.mark.db
+@pytest.mark.parametrize('method, body', [
+    ('patch', {'ids': [1], 'changes': {'weight': 'heavy'}}),
+    ('patch', {'ids': [1], 'changes': {'weight_unit': 'kilograms!!'}}),
+    ('patch', {'upload_id': 'latest', 'changes': {'reps': 5}}),
+    ('delete', {'upload_id': '12'}),
+    ('delete', {'exercise': ['Squat']}),
+    ('delete', {'category': 5}),
+])
+def test_invalid_bulk_requests_are_rejected(server, method, body):
+    # Setup
+    module, provider = server
+    user_id = provider.create_user('alice', 'alice@example.com', 'hash').user_id
+    client = module.app.test_client()
+
+    # Execute
+    response = getattr(client, method)('/workout-history', json=body, headers=auth_headers(user_id))
+
+    # Verify
+    assert response.status_code == 400
+
@@ -0,0 +1,80 @@
+import os
+import sys
+import pytest
+from datetime import date
+from sqlalchemy import create_engine, inspect, text
+
+# Add the parent directory to the path to import the db package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db.setup
+from db.maintenance import get_partition_years, partition_name
+from db.setup import get_head_revision, is_database_current, setup_database
+from helpers import UrlDatabaseProvider
+from test_maintenance import UNPARTITIONED_REVISION, migrate
+
+@pytest.fixture
+def engine():
+    url = os.environ.get('TEST_DATABASE_URL', '')
+    if not url.startswith('postgresql'):
+        pytest.skip('TEST_DATABASE_URL does not point at a Postgres database')
+    db_engine = create_engine(url)
+    yield db_engine
+    with db_engine.begin() as conn:
+        for table in inspect(conn).get_table_names():
+            conn.execute(text(f'DROP TABLE IF EXISTS "{table}" CASCADE'))
+    db_engine.dispose()
+
+@pytest.mark.db
+def test_database_is_current_only_at_head(engine):
+    # Setup
+    assert not is_database_current(engine)
+    migrate(engine, UNPARTITIONED_REVISION)
+    behind = is_database_current(engine)
+
+    # Execute
+    migrate(engine, 'head')
+
+    # Verify
+    assert not behind
+    assert is_database_current(engine)
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT version_num FROM alembic_version")).scalar() == get_head_revision()
+
+@pytest.mark.db
+def test_setup_skips_migrations_when_schema_is_at_head(engine, monkeypatch):
+    # Setup
+    migrate(engine, 'head')
+    monkeypatch.setattr(db.setup, 'get_provider', UrlDatabaseProvider)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("migrations should not run")
+    monkeypatch.setattr(db.setup.command, 'upgrade', fail)
+
+    # Execute / Verify
+    assert setup_database()
+
+@pytest.mark.db
+def test_setup_creates_partitions_when_schema_is_at_head(engine, monkeypatch):
+    # Setup: the schema is current but the partition for next year is missing
+    migrate(engine, 'head')
+    next_year = date.today().year + 1
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE workout_history DETACH PARTITION {partition_name(next_year)}"))
+        conn.execute(text(f"DROP TABLE {partition_name(next_year)}"))
+    monkeypatch.setattr(db.setup, 'get_provider', UrlDatabaseProvider)
+
+    # Execute
+    result = setup_database()
+
+    # Verify
+    assert result
+    with engine.connect() as conn:
+        assert next_year in get_partition_years(conn)
+
+@pytest.mark.db
+def test_unmigrated_database_is_not_current(tmp_path):
+    # Setup
+    engine = create_engine(f"sqlite:///{tmp_path / 'empty.db'}")
+
+    # Execute / Verify
+    assert not is_database_current(engine)
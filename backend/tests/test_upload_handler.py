@@ -0,0 +1,124 @@
+import os
+import sys
+import json
+import pytest
+from unittest.mock import patch, MagicMock
+
+moto = pytest.importorskip('moto')
+import boto3
+import requests
+from urllib.parse import urlparse, parse_qs
+
+# Add the repository root to the path; the handler uses package-relative imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from backend.functions.upload import handler
+
+BUCKET = 'test-upload-bucket'
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    monkeypatch.setenv('UPLOAD_BUCKET_NAME', BUCKET)
+    with moto.mock_aws():
+        client = boto3.client('s3', region_name='us-east-1', config=handler.S3_CONFIG)
+        client.create_bucket(Bucket=BUCKET)
+        monkeypatch.setattr(handler, '_s3_client', client)
+        yield client
+
+@pytest.fixture
+def provider():
+    mock_provider = MagicMock()
+    mock_provider.create_object_upload.return_value = MagicMock(id=7)
+    with patch.object(handler, 'get_provider', return_value=mock_provider), \
+         patch.object(handler, 'verify_token', return_value=True), \
+         patch.object(handler, 'get_user_from_token', return_value={'user_id': 'test-user-id'}):
+        yield mock_provider
+
+def create_event(body):
+    return {'body': json.dumps(body), 'headers': {'Authorization': 'Bearer mock-token'}}
+
+@pytest.mark.upload
+def test_presign_put_streams_file_to_s3(s3, provider):
+    # Setup
+    data = b'date,exercise,category\n'
+    event = create_event({'file_name': 'my workouts.csv', 'file_size': len(data)})
+
+    # Execute
+    response = handler.main(event, None)
+    body = json.loads(response['body'])
+    put = requests.put(body['url'], data=data, headers={'Content-Type': 'text/csv'})
+
+    # Verify
+    assert response['statusCode'] == 200
+    assert body['upload_id'] == 7
+    assert body['file_key'].startswith('test-user-id/')
+    assert body['file_key'].endswith('_my_workouts.csv')
+    provider.create_object_upload.assert_called_once_with('test-user-id', body['file_key'], 'my workouts.csv')
+    assert put.status_code == 200
+    assert s3.get_object(Bucket=BUCKET, Key=body['file_key'])['Body'].read() == data
+
+@pytest.mark.upload
+def test_presign_put_signs_file_size(s3, provider):
+    # Execute
+    response = handler.main(create_event({'file_name': 'workouts.csv', 'file_size': 40}), None)
+    missing = handler.main(create_event({'file_name': 'workouts.csv'}), None)
+
+    # Verify
+    query = parse_qs(urlparse(json.loads(response['body'])['url']).query)
+    assert 'content-length' in query['X-Amz-SignedHeaders'][0].split(';')
+    assert missing['statusCode'] == 400
+    provider.create_object_upload.assert_called_once()
+
+@pytest.mark.upload
+def test_presign_post_returns_form_fields(s3, provider):
+    # Setup
+    event = create_event({'file_name': 'workouts.csv', 'method': 'post'})
+
+    # Execute
+    response = handler.main(event, None)
+    body = json.loads(response['body'])
+
+    # Verify
+    assert response['statusCode'] == 200
+    assert body['post']['fields']['key'] == body['file_key']
+    assert 'url' in body['post']
+
+@pytest.mark.upload
+def test_multipart_upload_for_large_files(s3, provider):
+    # Setup
+    file_size = handler.MULTIPART_THRESHOLD + 1
+    presign = handler.main(create_event({'file_name': 'big.csv', 'file_size': file_size}), None)
+    multipart = json.loads(presign['body'])['multipart']
+    file_key = json.loads(presign['body'])['file_key']
+
+    # Execute: upload a single small part, then complete the upload
+    part = requests.put(multipart['parts'][0]['url'], data=b'date,exercise,category\n')
+    response = handler.main(create_event({
+        'action': 'complete',
+        'file_key': file_key,
+        's3_upload_id': multipart['s3_upload_id'],
+        'parts': [{'part_number': 1, 'etag': part.headers['ETag']}]
+    }), None)
+
+    # Verify
+    assert len(multipart['parts']) == 2
+    assert response['statusCode'] == 200
+    assert s3.get_object(Bucket=BUCKET, Key=file_key)['Body'].read() == b'date,exercise,category\n'
+
+@pytest.mark.upload
+def test_complete_rejects_other_users_keys(s3, provider):
+    # Setup
+    event = create_event({
+        'action': 'complete',
+        'file_key': 'other-user/file.csv',
+        's3_upload_id': 'upload-id',
+        'parts': [{'part_number': 1, 'etag': 'etag'}]
+    })
+
+    # Execute
+    response = handler.main(event, None)
+
+    # Verify
+    assert response['statusCode'] == 403
@@ -0,0 +1,361 @@
+import gzip
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from io import BytesIO, StringIO
+import pytest
+
+# Add the parent directory to the path to import the ingest package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from db.ingest.compression import iter_decompressed_chunks, open_decompressed
+from db.ingest.dates import AmbiguousDateFormatError
+from db.ingest.fingerprints import RowFingerprinter, file_fingerprint, workout_fingerprint
+from db.ingest import parallel
+from db.ingest.parallel import iter_parallel_batches
+from db.ingest.parsers import get_parser
+from db.ingest.workout_csv import RowErrorReport, iter_workout_rows
+
+@pytest.mark.ingest
+def test_iter_workout_rows_parses_all_rows():
+    # Setup
+    csv_file = StringIO(
+        "Date,Exercise,Category,Weight,Reps\n"
+        "2024-03-14,Squat,Strength,100,5\n"
+        "03/15/2024,Bench Press,Strength,,8\n"
+    )
+
+    # Execute
+    rows = list(iter_workout_rows(csv_file))
+
+    # Verify
+    assert [row_num for row_num, _ in rows] == [2, 3]
+    assert rows[0][1] == {
+        'date': date(2024, 3, 14),
+        'exercise': 'Squat',
+        'category': 'Strength',
+        'weight': 100.0,
+        'reps': 5
+    }
+    assert 'weight' not in rows[1][1]
+    assert rows[1][1]['reps'] == 8
+
+@pytest.mark.ingest
+def test_iter_workout_rows_missing_columns():
+    # Setup
+    csv_file = StringIO("Date,Exercise\n2024-03-14,Squat\n")
+
+    # Execute / Verify
+    with pytest.raises(ValueError, match='Missing required columns: category'):
+        list(iter_workout_rows(csv_file))
+
+@pytest.mark.ingest
+def test_iter_workout_rows_reports_row_number():
+    # Setup
+    csv_file = StringIO(
+        "date,exercise,category,reps\n"
+        "2024-03-14,Squat,Strength,5\n"
+        "2024-03-15,Squat,Strength,five\n"
+    )
+
+    # Execute / Verify
+    with pytest.raises(ValueError, match='Error in row 3'):
+        list(iter_workout_rows(csv_file))
+
+@pytest.mark.ingest
+def test_date_format_inferred_per_file():
+    # Setup
+    csv_file = StringIO(
+        "date,exercise,category\n"
+        "01/02/2024,Squat,Strength\n"
+        "25/02/2024,Squat,Strength\n"
+    )
+
+    # Execute
+    rows = list(iter_workout_rows(csv_file))
+
+    # Verify: 25/02 is only valid as DD/MM, so 01/02 is read the same way
+    assert rows[0][1]['date'] == date(2024, 2, 1)
+    assert rows[1][1]['date'] == date(2024, 2, 25)
+
+@pytest.mark.ingest
+def test_ambiguous_date_format_is_reported():
+    # Setup
+    csv_file = StringIO(
+        "date,exercise,category\n"
+        "01/02/2024,Squat,Strength\n"
+        "03/04/2024,Squat,Strength\n"
+    )
+
+    # Execute / Verify
+    with pytest.raises(AmbiguousDateFormatError):
+        list(iter_workout_rows(csv_file))
+
+@pytest.mark.ingest
+def test_explicit_date_format_resolves_ambiguity():
+    # Setup
+    csv_file = StringIO(
+        "date,exercise,category\n"
+        "01/02/2024,Squat,Strength\n"
+    )
+
+    # Execute
+    rows = list(iter_workout_rows(csv_file, date_format='MM/DD/YYYY'))
+
+    # Verify
+    assert rows[0][1]['date'] == date(2024, 1, 2)
+
+@pytest.mark.ingest
+@pytest.mark.parametrize('backend', ['csv', 'arrow'])
+def test_parser_backends_yield_batches(backend):
+    # Setup
+    if backend == 'arrow':
+        pytest.importorskip('pyarrow')
+    stream = BytesIO(
+        b"Date,Exercise,Category,Weight,Reps\n"
+        b"2024-03-14,Squat,Strength,100,5\n"
+        b"2024-03-15,Bench Press,Strength,,8\n"
+        b"2024-03-16,Deadlift,Strength,140,3\n"
+    )
+
+    # Execute
+    batches = list(get_parser(backend).iter_batches(stream, batch_size=2))
+
+    # Verify
+    assert [len(batch) for batch in batches] == [2, 1]
+    assert batches[0][0]['date'] == date(2024, 3, 14)
+    assert batches[0][0]['weight'] == 100.0
+    assert batches[0][1].get('weight') is None
+    assert batches[1][0]['reps'] == 3
+
+@pytest.mark.ingest
+@pytest.mark.parametrize('backend', ['csv', 'arrow'])
+def test_parser_backends_report_row_number(backend):
+    # Setup
+    if backend == 'arrow':
+        pytest.importorskip('pyarrow')
+    stream = BytesIO(
+        b"date,exercise,category,reps\n"
+        b"2024-03-14,Squat,Strength,5\n"
+        b"2024-03-15,Squat,Strength,five\n"
+    )
+
+    # Execute / Verify
+    with pytest.raises(ValueError, match='Error in row 3'):
+        list(get_parser(backend).iter_batches(stream))
+
+@pytest.mark.ingest
+@pytest.mark.parametrize('backend', ['csv', 'arrow'])
+def test_parser_backends_collect_every_row_error(backend):
+    # Setup
+    if backend == 'arrow':
+        pytest.importorskip('pyarrow')
+    stream = BytesIO(
+        b"date,exercise,category,reps\n"
+        b"2024-03-14,Squat,Strength,5\n"
+        b"2024-13-45,,Strength,5\n"
+        b"2024-03-16,Squat,Strength,five\n"
+        b"2024-03-17,Squat,Strength,3\n"
+    )
+    report = RowErrorReport()
+
+    # Execute
+    rows = [row for batch in get_parser(backend).iter_batches(stream, report=report) for row in batch]
+
+    # Verify
+    assert [row['reps'] for row in rows] == [5, 3]
+    assert report.rows_failed == 2
+    assert [(error['row'], error['column']) for error in report.errors] == [
+        (3, 'date'), (3, 'exercise'), (4, 'reps')
+    ]
+
+@pytest.mark.ingest
+@pytest.mark.parametrize('backend', ['csv', 'arrow'])
+def test_parser_backends_skip_rows_with_wrong_column_count(backend):
+    # Setup
+    if backend == 'arrow':
+        pytest.importorskip('pyarrow')
+    content = (
+        b"date,exercise,category,reps\n"
+        b"2024-03-14,Squat,Strength,5\n"
+        b"2024-03-15,Squat\n"
+        b"2024-03-16,Squat,Strength,5,extra\n"
+        b"2024-03-17,Squat,Strength,five\n"
+        b"2024-03-18,Squat,Strength,3\n"
+    )
+    report = RowErrorReport()
+
+    # Execute
+    rows = [row for batch in get_parser(backend).iter_batches(BytesIO(content), report=report) for row in batch]
+
+    # Verify
+    assert [row['reps'] for row in rows] == [5, 3]
+    assert report.rows_failed == 3
+    assert report.errors == [
+        {'row': 3, 'column': None, 'reason': 'Expected 4 columns, got 2'},
+        {'row': 4, 'column': None, 'reason': 'Expected 4 columns, got 5'},
+        {'row': 5, 'column': 'reps', 'reason': "invalid literal for int() with base 10: 'five'"},
+    ]
+    with pytest.raises(ValueError, match='Error in row 3'):
+        list(get_parser(backend).iter_batches(BytesIO(content)))
+
+@pytest.mark.ingest
+def test_parallel_batches_match_single_process(tmp_path):
+    # Setup: comments with embedded newlines must not be split across shards
+    path = tmp_path / 'workouts.csv'
+    path.write_text(
+        "date,exercise,category,reps,comment\n"
+        + "".join(f'2024-03-{i % 28 + 1:02d},Squat,Strength,{i},"set\n{i}"\n' for i in range(200))
+    )
+
+    # Execute
+    with open(path, 'rb') as f:
+        expected = [row for batch in get_parser('csv').iter_batches(f) for row in batch]
+    rows = [row for batch in iter_parallel_batches(str(path), workers=2) for row in batch]
+
+    # Verify
+    assert rows == expected
+
+@pytest.mark.ingest
+def test_parallel_batches_keep_few_shards_in_flight(tmp_path, monkeypatch):
+    # Setup: tiny shards, parsed in threads so submissions can be counted
+    path = tmp_path / 'workouts.csv'
+    path.write_text(
+        "date,exercise,category,reps\n"
+        + "".join(f"2024-03-{i % 28 + 1:02d},Squat,Strength,{i}\n" for i in range(400))
+    )
+    submitted = []
+
+    class CountingExecutor(ThreadPoolExecutor):
+        def submit(self, *args, **kwargs):
+            submitted.append(args)
+            return super().submit(*args, **kwargs)
+
+    monkeypatch.setattr(parallel, 'MAX_SHARD_BYTES', 256)
+    monkeypatch.setattr(parallel, 'ProcessPoolExecutor', CountingExecutor)
+
+    # Execute
+    batches = iter_parallel_batches(str(path), workers=2, batch_size=1000)
+    first = next(batches)
+    submitted_before_rest = len(submitted)
+    rows = first + [row for batch in batches for row in batch]
+
+    # Verify
+    assert submitted_before_rest == 2 * parallel.SHARDS_IN_FLIGHT_PER_WORKER
+    assert len(submitted) > submitted_before_rest
+    assert [row['reps'] for row in rows] == list(range(400))
+
+@pytest.mark.ingest
+def test_parallel_batches_report_original_row_number(tmp_path):
+    # Setup
+    path = tmp_path / 'workouts.csv'
+    lines = [f"2024-03-14,Squat,Strength,{i}\n" for i in range(200)]
+    lines[150] = "2024-03-14,Squat,Strength,many\n"
+    path.write_text("date,exercise,category,reps\n" + "".join(lines))
+
+    # Execute / Verify
+    with pytest.raises(ValueError, match='Error in row 152'):
+        list(iter_parallel_batches(str(path), workers=2))
+
+@pytest.mark.ingest
+def test_row_fingerprints_number_repeated_rows():
+    # Setup
+    workout_data = {'date': date(2024, 3, 14), 'exercise': 'Squat', 'category': 'Strength', 'weight': 100.0, 'reps': 5}
+
+    # Execute
+    first = RowFingerprinter('user-1').fingerprint_all([workout_data, dict(workout_data), dict(workout_data, comment='PR')])
+    second = RowFingerprinter('user-1').fingerprint_all([dict(workout_data)])
+
+    # Verify
+    assert len(set(first[:2])) == 2
+    assert first[2] == workout_fingerprint('user-1', workout_data, occurrence=2)
+    assert second == first[:1]
+    assert workout_fingerprint('user-2', workout_data) != first[0]
+
+@pytest.mark.ingest
+def test_file_fingerprint_rewinds_stream():
+    # Setup
+    stream = BytesIO(b"date,exercise,category\n2024-03-14,Squat,Strength\n")
+
+    # Execute
+    file_hash = file_fingerprint(stream)
+
+    # Verify
+    assert file_hash == file_fingerprint(BytesIO(stream.getvalue()))
+    assert stream.tell() == 0
+
+@pytest.mark.ingest
+def test_parallel_batches_collect_every_row_error(tmp_path):
+    # Setup
+    path = tmp_path / 'workouts.csv'
+    lines = [f"2024-03-14,Squat,Strength,{i}\n" for i in range(200)]
+    lines[10] = "2024-03-14,Squat,Strength,many\n"
+    lines[150] = "2024-03-14,,Strength,1\n"
+    path.write_text("date,exercise,category,reps\n" + "".join(lines))
+    report = RowErrorReport()
+
+    # Execute
+    rows = [row for batch in iter_parallel_batches(str(path), workers=2, report=report) for row in batch]
+
+    # Verify
+    assert len(rows) == 198
+    assert [error['row'] for error in report.errors] == [12, 152]
+
+@pytest.mark.ingest
+@pytest.mark.parametrize('backend', ['csv', 'arrow'])
+def test_gzip_upload_is_parsed(backend):
+    if backend == 'arrow':
+        pytest.importorskip('pyarrow')
+    # Setup
+    content = b"date,exercise,category,reps\n" + b"2024-03-14,Squat,Strength,5\n" * 50
+
+    # Execute
+    stream = open_decompressed(BytesIO(gzip.compress(content)))
+    rows = [row for batch in get_parser(backend).iter_batches(stream, batch_size=20) for row in batch]
+
+    # Verify
+    assert len(rows) == 50
+    assert rows[0]['exercise'] == 'Squat'
+
+@pytest.mark.ingest
+def test_decompressed_chunks_join_gzip_members():
+    # Setup
+    first, second = b"date,exercise\n2024-03-14,Squat\n", b"2024-03-15,Bench\n"
+    data = gzip.compress(first) + gzip.compress(second)
+
+    # Execute
+    content = b"".join(iter_decompressed_chunks(data[i:i + 7] for i in range(0, len(data), 7)))
+
+    # Verify
+    assert content == first + second
+
+@pytest.mark.ingest
+def test_zstd_upload_is_decompressed():
+    zstandard = pytest.importorskip('zstandard')
+    # Setup
+    content = b"date,exercise,category,reps\n2024-03-14,Squat,Strength,5\n"
+    data = zstandard.ZstdCompressor().compress(content)
+
+    # Execute
+    streamed = open_decompressed(BytesIO(data), 'zstd').read()
+    chunked = b"".join(iter_decompressed_chunks([data[:3], data[3:]]))
+
+    # Verify
+    assert streamed == content
+    assert chunked == content
+
+@pytest.mark.ingest
+def test_decompressed_chunks_join_zstd_frames():
+    zstandard = pytest.importorskip('zstandard')
+    # Setup
+    first, second = b"date,exercise\n2024-03-14,Squat\n", b"2024-03-15,Bench\n"
+    compressor = zstandard.ZstdCompressor()
+    data = compressor.compress(first) + compressor.compress(second)
+
+    # Execute
+    whole = b"".join(iter_decompressed_chunks([data]))
+    chunked = b"".join(iter_decompressed_chunks(data[i:i + 7] for i in range(0, len(data), 7)))
+
+    # Verify
+    assert whole == first + second
+    assert chunked == first + second
@@ -7,6 +7,7 @@ import HistoryIcon from '@mui/icons-material/History';
 import LogoutIcon from '@mui/icons-material/Logout';
 import FitnessCenterIcon from '@mui/icons-material/FitnessCenter';
 import { getToken, clearToken } from '../services/auth';
+import { UploadJob, waitForUpload } from '../services/workout';
 import { AuthContext } from '../App';
 import '../styles/Sidebar.css';
 
@@ -18,13 +19,38 @@ const Sidebar: React.FC = () => {
   const [notification, setNotification] = useState<{
     open: boolean;
     message: string;
-    severity: 'success' | 'error';
+    severity: 'success' | 'warning' | 'error';
   }>({
     open: false,
     message: '',
     severity: 'success',
   });
 
+  // Describe a finished upload job: what was stored, and why any rows were not
+  const describeUpload = (job: UploadJob): { message: string; severity: 'success' | 'warning' | 'error' } => {
+    const rowErrors = job.errors
+      .slice(0, 3)
+      .map(error => `row ${error.row}${error.column ? ` (${error.column})` : ''}: ${error.reason}`)
+      .join('; ');
+
+    if (job.status === 'failed') {
+      const details = rowErrors ? ` ${rowErrors}` : '';
+      return { message: `Upload failed: ${job.error || 'the file could not be processed'}.${details}`, severity: 'error' };
+    }
+    if (job.duplicate_file) {
+      return { message: 'This file was already uploaded; no new workouts were added.', severity: 'warning' };
+    }
+
+    let message = `Imported ${job.records_inserted} workout(s)`;
+    if (job.records_skipped > 0) {
+      message += `, skipped ${job.records_skipped} already imported`;
+    }
+    if (job.rows_failed > 0) {
+      return { message: `${message}. ${job.rows_failed} invalid row(s) were left out: ${rowErrors}`, severity: 'warning' };
+    }
+    return { message: `${message}.`, severity: 'success' };
+  };
+
   const handleFileSelect = async (event: React.ChangeEvent<HTMLInputElement>) => {
     const file = event.target.files?.[0];
     if (!file) return;
@@ -68,11 +94,9 @@ const Sidebar: React.FC = () => {
         throw new Error(data.error || 'Failed to upload file');
       }
 
-      setNotification({
-        open: true,
-        message: 'File uploaded successfully!',
-        severity: 'success',
-      });
+      // The file is processed in the background; wait for the outcome
+      const job = await waitForUpload(data.job_id);
+      setNotification({ open: true, ...describeUpload(job) });
     } catch (err) {
       const errorMessage = err instanceof Error ? err.message : 'Failed to upload file';
       setNotification({
@@ -113,7 +137,7 @@ const Sidebar: React.FC = () => {
               ref={fileInputRef}
             />
             <CloudUploadIcon />
-            <span>{uploading ? 'Uploading...' : 'Upload Workout'}</span>
+            <span>{uploading ? 'Processing upload...' : 'Upload Workout'}</span>
           </div>
           <Link to="/workout-history" className="nav-item">
             <HistoryIcon />
@@ -12,19 +12,24 @@ import {
   Paper,
   CircularProgress,
   Alert,
+  Button,
 } from '@mui/material';
 import { WorkoutRecord, fetchWorkoutHistory } from '../services/workout';
 
 const WorkoutHistory: React.FC = () => {
   const [workouts, setWorkouts] = useState<WorkoutRecord[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState<string | null>(null);
+  const [loadMoreError, setLoadMoreError] = useState<string | null>(null);
 
   useEffect(() => {
     const loadWorkoutHistory = async () => {
       try {
-        const data = await fetchWorkoutHistory();
-        setWorkouts(data);
+        const page = await fetchWorkoutHistory();
+        setWorkouts(page.records);
+        setNextCursor(page.nextCursor);
         setError(null);
       } catch (err) {
         setError(err instanceof Error ? err.message : 'Failed to load workout history');
@@ -36,6 +41,22 @@ const WorkoutHistory: React.FC = () => {
     loadWorkoutHistory();
   }, []);
 
+  // Later pages are only fetched when asked for, so a long history is not loaded up front
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const page = await fetchWorkoutHistory(nextCursor);
+      setWorkouts(current => [...current, ...page.records]);
+      setNextCursor(page.nextCursor);
+      setLoadMoreError(null);
+    } catch (err) {
+      setLoadMoreError(err instanceof Error ? err.message : 'Failed to load more workouts');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const formatDate = (dateString: string) => {
     return new Date(dateString).toLocaleDateString();
   };
@@ -107,6 +128,18 @@ const WorkoutHistory: React.FC = () => {
             </TableBody>
           </Table>
         </TableContainer>
+
+        {loadMoreError && (
+          <Alert severity="error" sx={{ mt: 2 }}>{loadMoreError}</Alert>
+        )}
+
+        {nextCursor && (
+          <Box display="flex" justifyContent="center" sx={{ mt: 2 }}>
+            <Button variant="outlined" onClick={loadMore} disabled={loadingMore}>
+              {loadingMore ? <CircularProgress size={24} /> : 'Load more'}
+            </Button>
+          </Box>
+        )}
       </Box>
     </Container>
   );
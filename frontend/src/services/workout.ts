@@ -17,10 +17,18 @@ export interface WorkoutRecord {
   created_at: string;
 }
 
-export const fetchWorkoutHistory = async (): Promise<WorkoutRecord[]> => {
+export interface WorkoutHistoryPage {
+  records: WorkoutRecord[];
+  // Cursor of the next page, or null on the last page
+  nextCursor: string | null;
+}
+
+// The history is returned a page at a time; each page's X-Next-Cursor header
+// points at the next one, which is fetched by passing it back as the cursor
+export const fetchWorkoutHistory = async (cursor: string | null = null): Promise<WorkoutHistoryPage> => {
   const token = await getToken();
-  
-  const response = await fetch(`${API_URL}/workout-history`, {
+  const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+  const response = await fetch(`${API_URL}/workout-history${query}`, {
     method: 'GET',
     headers: {
       'Authorization': `Bearer ${token}`,
@@ -33,5 +41,60 @@ export const fetchWorkoutHistory = async (): Promise<WorkoutRecord[]> => {
     throw new Error(error.error || 'Failed to fetch workout history');
   }
 
-  return await response.json();
-}; 
\ No newline at end of file
+  return {
+    records: await response.json(),
+    nextCursor: response.headers.get('X-Next-Cursor'),
+  };
+};
+
+export interface UploadRowError {
+  row: number | null;
+  column: string | null;
+  reason: string;
+}
+
+// Status of an uploaded file, which is processed in the background after /upload
+// accepts it
+export interface UploadJob {
+  job_id: string;
+  status: 'queued' | 'running' | 'succeeded' | 'failed';
+  file_name: string;
+  rows_done: number;
+  rows_failed: number;
+  records_inserted: number;
+  records_skipped: number;
+  duplicate_file: boolean;
+  error: string | null;
+  errors: UploadRowError[];
+}
+
+const UPLOAD_POLL_INTERVAL_MS = 1000;
+
+export const fetchUploadStatus = async (jobId: string): Promise<UploadJob> => {
+  const token = await getToken();
+  const response = await fetch(`${API_URL}/upload/${encodeURIComponent(jobId)}`, {
+    method: 'GET',
+    headers: {
+      'Authorization': `Bearer ${token}`,
+      'Content-Type': 'application/json',
+    },
+  });
+
+  if (!response.ok) {
+    const error = await response.json();
+    throw new Error(error.error || 'Failed to fetch upload status');
+  }
+
+  return response.json();
+};
+
+// Poll an upload job until it has succeeded or failed
+export const waitForUpload = async (jobId: string): Promise<UploadJob> => {
+  for (;;) {
+    const job = await fetchUploadStatus(jobId);
+    if (job.status === 'succeeded' || job.status === 'failed') {
+      return job;
+    }
+    await new Promise(resolve => setTimeout(resolve, UPLOAD_POLL_INTERVAL_MS));
+  }
+};